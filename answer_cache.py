@@ -0,0 +1,199 @@
+# answer_cache.py
+"""RAG 답변 의미 캐시 (SQLite).
+
+같은 사례 목록(RetrievedCase.id, 순위 순서)이 검색되었고 질의의 TF-IDF 코사인 유사도가 threshold 이상이면
+이전 LLM 답변을 재사용한다. 답변의 [n] 인용과 context_ranks는 순위 기준이므로 순서가 다른 목록은 다른 항목이다.
+질의 벡터의 열 번호는 색인 어휘에 따라 달라지므로 항목마다 벡터 공간(searcher.version)을 함께 저장하고,
+같은 공간의 항목끼리만 비교한다. 항목은 로컬 SQLite 파일에 저장되고, 전체 크기가 max_bytes를 넘으면
+가장 오래 사용되지 않은 항목부터 지운다.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag_answer import DISCLAIMER, RetrievedCase
+
+DEFAULT_PATH = "answer_cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_key TEXT NOT NULL,
+    space TEXT NOT NULL DEFAULT '',
+    backend TEXT NOT NULL,
+    model TEXT NOT NULL,
+    query TEXT NOT NULL,
+    q_idx BLOB NOT NULL,
+    q_val BLOB NOT NULL,
+    answer TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_lookup ON answers(case_key, space, backend, model);
+CREATE INDEX IF NOT EXISTS answers_lru ON answers(last_used);
+"""
+
+
+def _case_id(c: RetrievedCase) -> str:
+    cid = c.id
+    if isinstance(cid, str) and cid.strip():
+        return cid.strip()
+    # 사례ID가 비어 있는 데이터는 내용으로 식별
+    return "h:" + hashlib.sha1(f"{c.law}|{c.article}|{c.fact}".encode("utf-8")).hexdigest()[:16]
+
+
+def case_key(cases: List[RetrievedCase], context: str = "") -> str:
+    """검색된 사례 ID를 순위 순서대로 이은 키. context: 프롬프트 구성 설정 (토큰 예산 등)."""
+    return hashlib.sha1("\n".join([_case_id(c) for c in cases] + [context]).encode("utf-8")).hexdigest()
+
+
+def _sparse(vec) -> Tuple[np.ndarray, np.ndarray]:
+    row = vec.tocsr()
+    return row.indices.astype(np.int32), row.data.astype(np.float64)
+
+
+def _cosine(a_idx, a_val, b_idx, b_val) -> float:
+    # 두 벡터 모두 L2 정규화된 TF-IDF이므로 공통 열의 내적 = 코사인
+    common, ia, ib = np.intersect1d(a_idx, b_idx, assume_unique=True, return_indices=True)
+    if not len(common):
+        return 0.0
+    return float(np.dot(a_val[ia], b_val[ib]))
+
+
+Vector = Tuple[np.ndarray, np.ndarray]
+
+
+class AnswerCache:
+    def __init__(self, embed: Optional[Callable] = None, path: str = DEFAULT_PATH, threshold: float = 0.9,
+                 max_bytes: int = 64 * 1024 * 1024, space: str = ""):
+        """embed: 텍스트 리스트 → L2 정규화된 희소 행렬 (searcher.transform), space: 그 벡터 공간의 이름
+        (searcher.version). 색인을 교체하는 앱은 둘 다 비워 두고 호출마다 vector/space를 넘긴다 (CachedAnswerer)."""
+        self.embed = embed
+        self.space = space
+        self.path = path
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def vector(self, query: str, embed: Optional[Callable] = None) -> Vector:
+        """질의 → (열 번호, 값). embed를 주면 그것으로 (호출한 쪽이 빌린 색인 버전)."""
+        return _sparse((embed or self.embed)([query]))
+
+    def lookup(self, query: str, cases: List[RetrievedCase], backend: str, model: str = "",
+               threshold: Optional[float] = None, vector: Optional[Vector] = None,
+               space: Optional[str] = None, context: str = "") -> Optional[Dict[str, Any]]:
+        """유사 질의의 캐시된 답변 (없으면 None). 반환 dict에는 cached/similarity가 추가된다.
+        threshold/vector/space를 주지 않으면 캐시에 설정된 값과 embed를 쓴다."""
+        q_idx, q_val = vector if vector is not None else self.vector(query)
+        space = self.space if space is None else space
+        threshold = self.threshold if threshold is None else threshold
+        key = case_key(cases, context)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, q_idx, q_val, answer FROM answers WHERE case_key=? AND space=? AND backend=? AND model=?",
+                (key, space, backend, model)).fetchall()
+            best, best_sim = None, -1.0
+            for rid, b_idx, b_val, ans in rows:
+                sim = _cosine(q_idx, q_val, np.frombuffer(b_idx, np.int32), np.frombuffer(b_val, np.float64))
+                if sim > best_sim:
+                    best, best_sim = (rid, ans), sim
+            if best is None or best_sim < threshold:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE answers SET last_used=?, hits=hits+1 WHERE id=?", (time.time(), best[0]))
+            self._db.commit()
+            self.hits += 1
+        out = json.loads(best[1])
+        out["disclaimer"] = DISCLAIMER  # 캐시 적중에도 디스클레이머는 항상 현재 문구로
+        out["cached"] = True
+        out["similarity"] = round(best_sim, 3)
+        return out
+
+    def store(self, query: str, cases: List[RetrievedCase], backend: str, model: str, answer: Dict[str, Any],
+              vector: Optional[Vector] = None, space: Optional[str] = None, context: str = ""):
+        q_idx, q_val = vector if vector is not None else self.vector(query)
+        space = self.space if space is None else space
+        payload = json.dumps({k: v for k, v in answer.items() if k not in ("cached", "similarity")},
+                             ensure_ascii=False)
+        now = time.time()
+        size = len(payload.encode("utf-8")) + q_idx.nbytes + q_val.nbytes + len(query.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers(case_key, space, backend, model, query, q_idx, q_val, answer, size, created,"
+                " last_used) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                (case_key(cases, context), space, backend, model, query, q_idx.tobytes(), q_val.tobytes(),
+                 payload, size, now, now))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for rid, size in self._db.execute("SELECT id, size FROM answers ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM answers WHERE id=?", (rid,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": n, "bytes": total}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class CachedAnswerer:
+    """RAGAnswerer 앞단의 의미 캐시. LLM을 쓰지 않는 템플릿 모드는 캐시하지 않는다.
+    threshold: 이 호출자의 유사도 기준 (공유 캐시의 설정을 바꾸지 않음),
+    searcher: 질의 벡터를 계산할 색인 (벡터 공간 = searcher.version). 없으면 캐시의 embed/space.
+    답변기의 컨텍스트 패커 설정(토큰 예산, 중복 기준)이 다르면 프롬프트가 다르므로 키에 넣는다."""
+    def __init__(self, answerer, cache: AnswerCache, threshold: Optional[float] = None, searcher=None):
+        self.answerer = answerer
+        self.cache = cache
+        self.threshold = threshold
+        self.searcher = searcher
+        self._vectors: Dict[str, Vector] = {}
+
+    def _key(self, user_query: str) -> Dict[str, Any]:
+        packer = getattr(self.answerer, "packer", None)
+        key = {"context": f"budget={packer.budget};dup={packer.threshold}" if packer is not None else ""}
+        if self.searcher is None:
+            return key
+        if user_query not in self._vectors:
+            self._vectors[user_query] = self.cache.vector(user_query, self.searcher.transform)
+        return {**key, "vector": self._vectors[user_query], "space": str(getattr(self.searcher, "version", ""))}
+
+    def lookup(self, user_query: str, cases: List[RetrievedCase]) -> Optional[Dict[str, Any]]:
+        if not self.answerer.uses_llm:
+            return None
+        return self.cache.lookup(user_query, cases, self.answerer.backend, self.answerer.model,
+                                 threshold=self.threshold, **self._key(user_query))
+
+    def store(self, user_query: str, cases: List[RetrievedCase], out: Dict[str, Any]):
+        if self.answerer.uses_llm and out.get("answer"):
+            self.cache.store(user_query, cases, self.answerer.backend, self.answerer.model, out,
+                             **self._key(user_query))
+
+    def answer(self, user_query: str, cases: List[RetrievedCase]) -> Dict[str, Any]:
+        hit = self.lookup(user_query, cases)
+        if hit is not None:
+            return hit
+        out = self.answerer.answer(user_query, cases)
+        self.store(user_query, cases, out)
+        return out
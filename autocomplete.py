@@ -0,0 +1,173 @@
+# autocomplete.py
+"""검색어 자동 완성 (정렬 배열 접두사 검색).
+
+후보는 TF-IDF 어휘, 소분류 값, 정규화된 법조항(facets.normalize_clause)이고, 가중치는 그 후보가
+나오는 사례 수(문서 빈도)다. 후보를 자모 키(fuzzy_index.to_jamo) 순으로 정렬한 배열 하나로 두면
+접두사가 같은 후보는 연속 구간이 되므로, 이진 탐색 두 번으로 구간을 찾고 그 안에서 가중치 상위 k개를 고른다.
+
+- 자모 키이므로 입력 중인 음절도 맞는다: "서"·"선"·"선ㄱ" 모두 "선거"의 접두사.
+- 법조항은 법률명 없이도 찾도록 "§93" 키를 하나 더 두고, 질의의 "제93" 은 "§93" 으로 읽는다.
+- 구간이 SCAN_LIMIT보다 큰 짧은 접두사(한두 자모)는 생성할 때 구간 전체를 정렬해 상위 목록을 만들어 둔다.
+  그 밖의 구간은 가중치를 안정 정렬해 자르므로 키 입력마다 수십 µs 수준이다.
+
+순위는 가중치 내림차순, 같으면 자모 키 순(짧은 후보 먼저)이다.
+"""
+from __future__ import annotations
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from facets import normalize_clause
+from fuzzy_index import to_jamo
+from term_stats import STOP_WORDS, words
+
+DEFAULT_COMPLETIONS = 10
+SCAN_LIMIT = 4096  # 이보다 큰 구간은 접두사별 상위 목록을 기억
+TOP_CACHE_SIZE = 64  # 기억해 둘 상위 목록 길이 (k ≤ 이 값이면 잘라서 씀)
+
+# 후보 종류 (artifacts rows 필드 이름)
+TERM, SUB_CATEGORY, CLAUSE = "term", "sub_category", "clause"
+_KINDS = (TERM, SUB_CATEGORY, CLAUSE)
+
+_ARTICLE = re.compile(r"§\d")
+_JE = re.compile(r"^제\s*(?=\d)")
+_END = chr(0x10FFFF)
+
+
+class Completion(NamedTuple):
+    text: str    # 입력창에 넣을 표기
+    kind: str    # term / sub_category / clause
+    weight: int  # 사례 수
+
+
+def _key(text: str) -> str:
+    return to_jamo(" ".join(text.split()))
+
+
+def _query_key(prefix: str) -> str:
+    # 앞 공백은 무시하고 뒤 공백은 남긴다 ("선거 " → "선거 운동"만)
+    p = prefix.lstrip()
+    tail = " " if p[-1:].isspace() else ""
+    return _key(_JE.sub("§", p)) + tail
+
+
+class Completer:
+    def __init__(self, entries: Iterable[Tuple[str, str, int]]):
+        """entries: (표기, 종류, 가중치). 같은 표기는 하나로 합친다 (큰 가중치, 단어보다 소분류/법조항)."""
+        best: Dict[str, Tuple[int, int]] = {}
+        for text, kind, weight in entries:
+            text = " ".join(str(text).split())
+            if not text or weight <= 0:
+                continue
+            w, c = best.get(text, (0, 0))
+            best[text] = (max(w, int(weight)), max(c, _KINDS.index(kind)))
+        keyed = []
+        for text, (weight, c) in best.items():
+            kind = _KINDS[c]
+            keyed.append((_key(text), text, kind, weight))
+            if kind == CLAUSE:
+                # 법률명을 뺀 "§93" 으로도 찾도록
+                m = _ARTICLE.search(text)
+                if m and m.start() > 0:
+                    keyed.append((_key(text[m.start():]), text, kind, weight))
+        keyed.sort(key=lambda e: e[0])
+        self.keys: List[str] = [e[0] for e in keyed]
+        self.texts: List[str] = [e[1] for e in keyed]
+        self.kinds = np.asarray([_KINDS.index(e[2]) for e in keyed], dtype=np.int8)
+        self.weights = np.asarray([e[3] for e in keyed], dtype=np.int64)
+        self._top: Dict[str, np.ndarray] = {}
+        self._warm()
+
+    def _warm(self, depth: int = 2):
+        """구간이 SCAN_LIMIT보다 큰 짧은 접두사(depth 자모까지)의 상위 목록을 미리 만든다."""
+        for n in range(1, depth + 1):
+            lo = 0
+            while lo < len(self.keys):
+                p = self.keys[lo][:n]
+                hi = bisect_left(self.keys, p + _END, lo)
+                if hi - lo > SCAN_LIMIT:
+                    self._ranked(p, lo, hi, TOP_CACHE_SIZE)
+                lo = hi
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _range(self, key: str) -> Tuple[int, int]:
+        return bisect_left(self.keys, key), bisect_left(self.keys, key + _END)
+
+    def _ranked(self, key: str, lo: int, hi: int, k: int) -> np.ndarray:
+        """구간 [lo, hi)에서 가중치 상위 k개의 위치 (같은 가중치는 앞 위치 먼저)."""
+        if hi - lo > SCAN_LIMIT and k <= TOP_CACHE_SIZE:
+            top = self._top.get(key)
+            if top is None:
+                top = self._top[key] = lo + np.argsort(-self.weights[lo:hi], kind="stable")[:TOP_CACHE_SIZE]
+            return top[:k]
+        return lo + np.argsort(-self.weights[lo:hi], kind="stable")[:k]
+
+    def complete(self, prefix: str, k: int = DEFAULT_COMPLETIONS,
+                 kinds: Optional[Sequence[str]] = None) -> List[Completion]:
+        """prefix로 시작하는 후보 상위 k개. kinds를 주면 그 종류만."""
+        key = _query_key(prefix or "")
+        if not key or k <= 0:
+            return []
+        lo, hi = self._range(key)
+        if lo >= hi:
+            return []
+        want = None if kinds is None else {_KINDS.index(x) for x in kinds}
+        out: List[Completion] = []
+        seen = set()
+        n = k
+        while True:
+            # 같은 표기가 두 키(§93 / 공직선거법 §93)로 걸리거나 종류를 거르면 모자랄 수 있어 넉넉히 뽑는다
+            for i in self._ranked(key, lo, hi, n + (n >> 1)).tolist():
+                if (want is not None and self.kinds[i] not in want) or self.texts[i] in seen:
+                    continue
+                seen.add(self.texts[i])
+                out.append(Completion(self.texts[i], _KINDS[self.kinds[i]], int(self.weights[i])))
+                if len(out) == k:
+                    return out
+            if n + (n >> 1) >= hi - lo:
+                return out
+            out, seen, n = [], set(), max(n, 1) * 4
+
+    # ----- 생성 -----
+    @classmethod
+    def from_columns(cls, terms: Sequence[str], df: Sequence[int], sub_categories: Iterable,
+                     clauses: Iterable) -> "Completer":
+        """어휘와 어휘별 문서 빈도, 행별 소분류/법조항 칸으로 생성."""
+        subs = Counter(v.strip() for v in sub_categories if isinstance(v, str) and v.strip())
+        arts: Counter = Counter()
+        for v in clauses:
+            arts.update(set(normalize_clause(v)))
+        entries = [(t, TERM, int(n)) for t, n in zip(terms, df) if t not in STOP_WORDS]
+        entries += [(v, SUB_CATEGORY, n) for v, n in subs.items()]
+        entries += [(v, CLAUSE, n) for v, n in arts.items()]
+        return cls(entries)
+
+    @classmethod
+    def from_rows(cls, rows, terms: Sequence[str], df: Sequence[int]) -> "Completer":
+        """색인 rows(dict 목록 또는 RowStore/ShardRows)와 어휘/문서 빈도."""
+        field = getattr(rows, "field", None)
+        n = len(rows)
+        if field is not None:
+            col = lambda name: (field(i, name) for i in range(n))
+        else:
+            col = lambda name: (rows[i].get(name) for i in range(n))
+        return cls.from_columns(terms, df, col(SUB_CATEGORY), col(CLAUSE))
+
+    @classmethod
+    def from_frame(cls, df, text_columns=("대분류", "소분류", "사실관계", "해설")) -> "Completer":
+        """CSV 컬럼 그대로의 DataFrame (V1.2 앱). 어휘는 2글자 이상 한글 단어, 가중치는 단어가 나오는 사례 수."""
+        counts: Counter = Counter()
+        target = df[text_columns[0]].astype(str)
+        for col in text_columns[1:]:
+            target = target + " " + df[col].astype(str)
+        for t in target.tolist():
+            counts.update(set(words(t)))
+        terms = list(counts)
+        return cls.from_columns(terms, [counts[t] for t in terms],
+                                df["소분류"].tolist() if "소분류" in df.columns else [],
+                                df["법조항"].tolist() if "법조항" in df.columns else [])
@@ -0,0 +1,249 @@
+# benchmarks/bench_search.py
+"""합성 사례 코퍼스 벤치마크.
+
+CSV 스키마(대분류/소분류/사실관계/법조항/위반여부/해설)를 따르는 합성 한국어 사례를 만들어
+색인을 빌드한 뒤, 경로별로 별도 프로세스에서 cold start / p50·p99 지연 / 배치 처리량 / 최대 RSS를 잰다.
+결과는 JSONL(한 줄 = 크기×경로)로 덧붙여 저장하므로 버전 간 비교가 가능하다.
+
+    python benchmarks/bench_search.py --sizes 10000,100000 --out benchmarks/results.jsonl
+    python benchmarks/bench_search.py --compare old.jsonl new.jsonl
+"""
+import argparse, csv, json, platform, random, resource, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BASE_CSV = ROOT / "정치관계법_사례통합_요약테이블.csv"
+PATHS = ("tfidf", "mmap", "shards", "keyword", "fuzzy", "complete", "extract_keywords", "report")
+LAWS = ("공직선거법", "정치자금법", "정당법")
+SHARDS = 4  # shards 경로의 샤드 수
+
+
+# ---------- 합성 데이터 ----------
+def synthesize_csv(n_rows: int, path: Path, seed: int = 0):
+    """원본 CSV의 어휘·분류 분포를 섞어 n_rows행짜리 합성 CSV를 만든다."""
+    import pandas as pd
+    rng = random.Random(seed)
+    base = pd.read_csv(BASE_CSV, encoding="utf-8-sig")
+    words = sorted({w for col in ("사실관계", "해설") for t in base[col].astype(str) for w in t.split()})
+    cats = base["대분류"].astype(str).tolist()
+    subs = base["소분류"].astype(str).tolist()
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["대분류", "소분류", "사실관계", "법조항", "위반여부", "해설"])
+        for _ in range(n_rows):
+            fact = " ".join(rng.choices(words, k=rng.randint(4, 9)))
+            note = " ".join(rng.choices(words, k=rng.randint(5, 12)))
+            art = rng.randint(1, 280)
+            clause = f"{rng.choice(LAWS)} §{art}" + (f"의{rng.randint(2, 9)}" if rng.random() < 0.15 else "")
+            w.writerow([rng.choice(cats), rng.choice(subs), fact, clause, rng.choice("✅❌"), note])
+    return words
+
+
+def synth_queries(words, n: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(words, k=rng.randint(2, 4))) for _ in range(n)]
+
+
+# ---------- 측정 ----------
+def _typo(word: str) -> str:
+    """마지막 음절의 받침을 지우거나(있을 때) ㄴ 받침을 붙인 오타."""
+    c = word[-1]
+    if not "가" <= c <= "힣":
+        return word
+    jong = (ord(c) - 0xAC00) % 28
+    return word[:-1] + chr(ord(c) - jong if jong else ord(c) + 4)
+
+
+def _pct(samples, q):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def _latency(fn, items):
+    lat = []
+    for it in items:
+        t = time.perf_counter()
+        fn(it)
+        lat.append((time.perf_counter() - t) * 1000)
+    return {"p50_ms": round(_pct(lat, 0.5), 3), "p99_ms": round(_pct(lat, 0.99), 3)}
+
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_worker(path: str, workdir: Path, queries, batch: int):
+    """한 경로를 측정 (새 인터프리터에서 실행되어 cold start와 RSS가 서로 섞이지 않는다)."""
+    res = {}
+    t0 = time.perf_counter()
+    if path in ("tfidf", "mmap", "shards"):
+        if path == "tfidf":
+            from search_tfidf import TfidfSearcher
+            s = TfidfSearcher(str(workdir))
+        elif path == "mmap":
+            from mmap_index import MmapSearcher
+            s = MmapSearcher(workdir / "index_mmap")
+        else:
+            from shard_index import ShardedSearcher
+            s = ShardedSearcher(workdir / "index_shards")
+        res["cold_start_s"] = round(time.perf_counter() - t0, 4)
+        res.update(_latency(lambda q: s.query(q, topk=10), queries))
+        qs = queries[:batch]
+        t = time.perf_counter()
+        s.query_batch(qs, topk=10)
+        res["throughput_qps"] = round(len(qs) / (time.perf_counter() - t), 1)
+    elif path == "keyword":
+        import pandas as pd
+        from keyword_index import KeywordIndex
+        df = pd.read_csv(workdir / "cases.csv")
+        idx = KeywordIndex.from_frame(df)
+        res["cold_start_s"] = round(time.perf_counter() - t0, 4)
+        kws = [q.split()[:2] for q in queries]
+        res.update(_latency(idx.search, kws))
+        t = time.perf_counter()
+        for k in kws:
+            idx.search(k)
+        res["throughput_qps"] = round(len(kws) / (time.perf_counter() - t), 1)
+    elif path == "fuzzy":
+        import pandas as pd
+        from fuzzy_index import FuzzyIndex
+        df = pd.read_csv(workdir / "cases.csv")
+        idx = FuzzyIndex.from_frame(df)
+        res["cold_start_s"] = round(time.perf_counter() - t0, 4)
+        kws = [[_typo(q.split()[0])] for q in queries[:200]]
+        res.update(_latency(idx.search, kws))
+        t = time.perf_counter()
+        for k in kws:
+            idx.search(k)
+        res["throughput_qps"] = round(len(kws) / (time.perf_counter() - t), 1)
+    elif path == "complete":
+        from mmap_index import MmapSearcher
+        s = MmapSearcher(workdir / "index_mmap")
+        c = s.completer
+        res["cold_start_s"] = round(time.perf_counter() - t0, 4)
+        # 키 입력마다 한 번씩: 질의 첫 단어의 앞 1..n 글자
+        prefixes = [w[:i] for q in queries[:200] for w in q.split()[:1] for i in range(1, len(w) + 1)]
+        res.update(_latency(c.complete, prefixes))
+        t = time.perf_counter()
+        for p in prefixes:
+            c.complete(p)
+        res["throughput_qps"] = round(len(prefixes) / (time.perf_counter() - t), 1)
+    elif path == "extract_keywords":
+        import pandas as pd
+        from keyword_index import build_target_text, extract_keywords
+        text = build_target_text(pd.read_csv(workdir / "cases.csv"))
+        res["cold_start_s"] = round(time.perf_counter() - t0, 4)
+        res.update(_latency(lambda _: extract_keywords(text), range(3)))
+    elif path == "report":
+        from datetime import datetime
+        from search_tfidf import TfidfSearcher
+        from rag_answer import Retriever
+        from report_html import build_html
+        r = Retriever(TfidfSearcher(str(workdir)))
+        res["cold_start_s"] = round(time.perf_counter() - t0, 4)
+        reps = [{"query": q, "advice": "가이드\n" * 3, "cases": r.retrieve(q, topk=10),
+                 "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M")} for q in queries[:200]]
+        res.update(_latency(build_html, reps))
+        t = time.perf_counter()
+        for rep in reps:
+            build_html(rep)
+        res["throughput_qps"] = round(len(reps) / (time.perf_counter() - t), 1)
+    else:
+        raise SystemExit(f"unknown path: {path}")
+    res["peak_rss_mb"] = _peak_rss_mb()
+    return res
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_size(n: int, paths, n_queries: int, batch: int, out):
+    from build_index import build_full
+    from mmap_index import convert_artifacts
+    from shard_index import convert_artifacts as convert_shards
+    with tempfile.TemporaryDirectory(prefix=f"bench{n}_") as tmp:
+        workdir = Path(tmp)
+        words = synthesize_csv(n, workdir / "cases.csv")
+        t = time.perf_counter()
+        build_full([workdir / "cases.csv"], workdir)
+        build_s = time.perf_counter() - t
+        t = time.perf_counter()
+        convert_artifacts(str(workdir))
+        export_s = time.perf_counter() - t
+        t = time.perf_counter()
+        convert_shards(str(workdir), SHARDS)
+        shard_s = time.perf_counter() - t
+        (workdir / "queries.json").write_text(json.dumps(synth_queries(words, n_queries), ensure_ascii=False))
+        meta = {"rev": _git_rev(), "python": platform.python_version(),
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "size": n}
+        for path in paths:
+            proc = subprocess.run([sys.executable, __file__, "--worker", path, "--workdir", str(workdir),
+                                   "--batch", str(batch)], capture_output=True, text=True)
+            if proc.returncode != 0:
+                rec = {**meta, "path": path, "error": proc.stderr.strip().splitlines()[-1:]}
+            else:
+                rec = {**meta, "path": path, **json.loads(proc.stdout.strip().splitlines()[-1])}
+            if path == "tfidf":
+                rec["build_s"] = round(build_s, 3)
+            elif path == "mmap":
+                rec["build_s"] = round(export_s, 3)
+            elif path == "shards":
+                rec["build_s"] = round(shard_s, 3)
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            out.flush()
+            print(json.dumps(rec, ensure_ascii=False), file=sys.stderr)
+
+
+def compare(old_path, new_path):
+    """두 결과 파일의 (크기, 경로)별 지표를 new/old 비율로 출력 (>1.0 이면 느려짐/커짐)."""
+    def load(p):
+        recs = {}
+        for line in open(p, encoding="utf-8"):
+            r = json.loads(line)
+            recs[(r["size"], r["path"])] = r  # 같은 키는 마지막 측정값 사용
+        return recs
+    old, new = load(old_path), load(new_path)
+    metrics = ("cold_start_s", "p50_ms", "p99_ms", "peak_rss_mb", "throughput_qps")
+    for key in sorted(set(old) & set(new)):
+        cells = []
+        for m in metrics:
+            a, b = old[key].get(m), new[key].get(m)
+            if a and b:
+                cells.append(f"{m}={b / a:.2f}x")
+        print(f"{key[0]:>8} {key[1]:<17} " + " ".join(cells))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000")
+    ap.add_argument("--paths", default=",".join(PATHS))
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--batch", type=int, default=500, help="배치 처리량 측정용 질의 수")
+    ap.add_argument("--out", default=str(ROOT / "benchmarks" / "results.jsonl"))
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    ap.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        wd = Path(args.workdir)
+        queries = json.loads((wd / "queries.json").read_text())
+        print(json.dumps(run_worker(args.worker, wd, queries, args.batch)))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    with open(args.out, "a", encoding="utf-8") as out:
+        for n in (int(x) for x in args.sizes.split(",") if x.strip()):
+            run_size(n, paths, args.queries, args.batch, out)
+
+if __name__ == "__main__":
+    main()
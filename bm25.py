@@ -0,0 +1,111 @@
+# bm25.py
+"""BM25 순위화 (term posting list + MaxScore 동적 가지치기).
+
+색인 시 posting 단위 BM25 기여도(impact)와 term별 최대 기여도(상한)를 미리 계산해 두고,
+질의 때는 MaxScore(term-at-a-time)로 top-k에 들 수 없는 문서를 건너뛴다. 상한 합이 현재
+k번째 점수(θ) 이하인 "비필수" term만 가진 문서는 후보가 되지 않으므로, 흔한 term의 긴
+posting은 후보 수 × log(길이)만큼만 조회한다.
+
+artifacts.pkl 의 backend="bm25" 로 선택한다 (build_index.py --backend bm25).
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class BM25Index:
+    def __init__(self, counts, k1: float = 1.2, b: float = 0.75):
+        """counts: (문서 수, 어휘 수) 희소 term 빈도 행렬 (CountVectorizer 출력)."""
+        import scipy.sparse as sp
+        X = sp.csr_matrix(counts, dtype=np.float64)
+        self.k1, self.b = k1, b
+        self.n_docs, self.n_terms = X.shape
+        doc_len = np.asarray(X.sum(axis=1)).ravel()
+        self.avgdl = float(doc_len.mean()) if self.n_docs else 0.0
+
+        C = X.tocsc()
+        C.sort_indices()
+        df = np.diff(C.indptr)
+        self.idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+        # posting 단위 BM25 기여도
+        tf = C.data
+        dl = doc_len[C.indices]
+        norm = self.k1 * (1.0 - self.b + self.b * dl / (self.avgdl or 1.0))
+        term_of = np.repeat(np.arange(self.n_terms), df)
+        impact = self.idf[term_of] * tf * (self.k1 + 1.0) / (tf + norm)
+
+        self.ptr = C.indptr.astype(np.int64)
+        self.docs = C.indices.astype(np.int32)
+        self.impact = impact.astype(np.float64)
+        # term별 상한 = posting 최대 기여도
+        self.upper = np.zeros(self.n_terms, dtype=np.float64)
+        nz = df > 0
+        self.upper[nz] = np.maximum.reduceat(self.impact, self.ptr[:-1][nz])
+
+    def search(self, term_weights: Dict[int, float], topk: int = 10,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """term_weights(열 번호 → 질의 내 빈도)로 MaxScore top-k. [(문서, 점수)] 점수 내림차순.
+        allowed(문서 수 길이 bool)가 있으면 그 문서만 후보로 삼는다 (facet 사전 필터).
+
+        상한이 큰(희귀한) term부터 누적한다. 아직 안 본 문서가 얻을 수 있는 최대 점수
+        (남은 term 상한 합)가 현재 k번째 점수 θ 이하가 되면 새 후보를 더 받지 않고,
+        남은(흔한) term의 posting은 후보 문서만 이진 탐색으로 조회한다.
+        남은 상한을 다 더해도 θ에 못 미치는 후보는 그때그때 버린다.
+        """
+        terms = []
+        for t, w in term_weights.items():
+            s, e = int(self.ptr[t]), int(self.ptr[t + 1])
+            if s < e and w > 0:
+                terms.append((float(self.upper[t]) * w, s, e, w))
+        if not terms or topk <= 0:
+            return []
+        terms.sort(key=lambda x: -x[0])  # 상한 내림차순
+        # rests[i] = i번째 이후 term 상한 합 (뒤에서부터 더해 마지막은 정확히 0)
+        rests = [0.0] * len(terms)
+        for i in range(len(terms) - 2, -1, -1):
+            rests[i] = rests[i + 1] + terms[i + 1][0]
+        cand = np.empty(0, dtype=np.int32)
+        acc = np.empty(0, dtype=np.float64)
+        theta = 0.0
+        for (ub, s, e, w), rest in zip(terms, rests):
+            docs, imp = self.docs[s:e], self.impact[s:e] * w
+            if len(cand) < topk or ub + rest > theta:
+                # 새 문서도 top-k에 들 수 있음 → posting 전체 병합
+                if allowed is not None:
+                    keep = allowed[docs]
+                    docs, imp = docs[keep], imp[keep]
+                cand, inv = np.unique(np.concatenate([cand, docs]), return_inverse=True)
+                acc = np.bincount(inv, weights=np.concatenate([acc, imp]), minlength=len(cand))
+            else:
+                # 후보 문서만 조회
+                pos = np.searchsorted(docs, cand)
+                pos[pos == len(docs)] = 0
+                hit = docs[pos] == cand
+                acc[hit] += imp[pos[hit]]
+            if len(cand) >= topk:
+                theta = float(np.partition(acc, len(acc) - topk)[len(acc) - topk])
+                keep = acc + rest >= theta
+                cand, acc = cand[keep], acc[keep]
+        order = np.lexsort((cand, -acc))[:topk]
+        return [(int(cand[i]), float(acc[i])) for i in order]
+
+    def score_all(self, term_weights: Dict[int, float]) -> np.ndarray:
+        """전체 문서 점수 (가지치기 없음, 검증용)."""
+        out = np.zeros(self.n_docs, dtype=np.float64)
+        for t, w in term_weights.items():
+            s, e = int(self.ptr[t]), int(self.ptr[t + 1])
+            out[self.docs[s:e]] += self.impact[s:e] * w
+        return out
+
+
+def query_terms(vectorizer, text: str, analyzer=None) -> Dict[int, float]:
+    """CountVectorizer의 analyzer/어휘로 질의를 {열 번호: 빈도}로 변환.
+    analyzer: 색인을 열 때 한 번 만든 vectorizer.build_analyzer() (없으면 이 호출에서 만든다)."""
+    vocab = vectorizer.vocabulary_
+    out: Dict[int, float] = {}
+    for term in (analyzer or vectorizer.build_analyzer())(text):
+        j = vocab.get(term)
+        if j is not None:
+            out[j] = out.get(j, 0.0) + 1.0
+    return out
@@ -0,0 +1,276 @@
+# build_index.py
+"""사례 CSV → artifacts.pkl 생성 CLI.
+
+전체 빌드:
+    python build_index.py --csv 정치관계법_사례통합_요약테이블.csv --outdir .
+증분(세그먼트) 추가 — 기존 어휘/IDF로 새 사례만 벡터화해 segments/에 저장:
+    python build_index.py --csv 신규사례.csv --outdir . --append
+형태소 분석 색인 (konlpy, 없으면 정규식) — 토큰은 tokens.jsonl에 캐시:
+    python build_index.py --csv 정치관계법_사례통합_요약테이블.csv --tokenizer auto --processes 8
+BM25 순위화 (posting list + MaxScore 가지치기, 증분 추가는 지원하지 않음):
+    python build_index.py --csv 정치관계법_사례통합_요약테이블.csv --backend bm25
+임베딩 색인 (int8/float16 mmap, 선택적으로 IVF) — 로컬 sbert 모델 또는 미리 계산한 .npy:
+    python build_index.py --csv 정치관계법_사례통합_요약테이블.csv --backend sbert --nlist 64
+    python build_index.py --csv 정치관계법_사례통합_요약테이블.csv --backend openai --embeddings emb.npy
+행렬만 pickle에 담긴 예전 임베딩 색인 → dense/ 레이아웃 (검색 쪽에서는 변환하지 않음):
+    python build_index.py --outdir . --convert-dense
+"""
+import argparse, hashlib, os, pickle
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.neighbors import NearestNeighbors
+from bm25 import BM25Index
+from dense_index import DENSE_DIR, DTYPES, embed_texts, export_dense, load_embeddings
+from search_tfidf import SEGMENT_DIR
+from term_stats import TERM_STATS_FILE, TermStats, file_sha1, load_stopwords
+from tokenizer import (KoreanTokenizer, TokenCache, TOKEN_CACHE_FILE,
+                       fit_transform_pretokenized, transform_pretokenized)
+
+# CSV(한글 컬럼) → rows 스키마
+CSV_COLUMN_MAP = {
+    "대분류": "category",
+    "소분류": "sub_category",
+    "사실관계": "fact",
+    "법조항": "clause",
+    "위반여부": "violation_label",
+    "해설": "rationale",
+}
+
+ROW_FIELDS = [
+    "id", "category", "sub_category", "law", "article", "clause", "fact",
+    "ruling_summary", "decision_body", "decision_date", "violation_label",
+    "rationale", "penalty", "region_level", "region", "tags", "confidence",
+    "source_url", "attachments", "notes", "year", "full_text",
+]
+
+# full_text에 이어 붙일 필드 (배포된 artifacts.pkl과 동일한 기본값)
+DEFAULT_TEXT_FIELDS = ("fact", "category")
+
+VECTORIZER_PARAMS = dict(ngram_range=(1, 2), max_features=100000)
+NN_NEIGHBORS = 20
+TOKENIZERS = ("word", "auto", "okt", "mecab", "regex")  # word = sklearn 기본 분석기
+BACKENDS = ("tfidf", "bm25", "sbert", "openai")  # sbert/openai = 임베딩 행렬 (dense/)
+DEFAULT_SBERT_MODEL = "jhgan/ko-sroberta-multitask"
+
+
+def iter_row_chunks(csv_paths, chunksize=5000, text_fields=DEFAULT_TEXT_FIELDS):
+    """CSV들을 chunk 단위로 읽어 rows 스키마 dict 리스트를 차례로 돌려준다."""
+    for path in csv_paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize, encoding="utf-8-sig"):
+            chunk = chunk.rename(columns=CSV_COLUMN_MAP).reindex(columns=ROW_FIELDS)
+            _fill_derived(chunk)
+            parts = chunk[list(text_fields)]
+            chunk["full_text"] = [
+                " | ".join(str(v) for v in vals if isinstance(v, str) and v.strip())
+                for vals in parts.itertuples(index=False, name=None)
+            ]
+            yield chunk.to_dict("records")
+
+
+def _split_clause(clause):
+    """'공직선거법 §58, §254' → ('공직선거법', '§58, §254'). 법률명이 없으면 ('', 법조항)."""
+    if not isinstance(clause, str) or not clause.strip():
+        return None, None
+    head, _, rest = clause.strip().partition(" ")
+    return (head, rest.strip()) if head.endswith("법") else ("", clause.strip())
+
+
+def _fill_derived(chunk: pd.DataFrame):
+    """CSV에 없는 law/article은 법조항에서, id는 내용 해시로 채운다 (같은 사례는 빌드마다 같은 ID)."""
+    split = [_split_clause(c) for c in chunk["clause"]]
+    for k, col in enumerate(("law", "article")):
+        chunk[col] = chunk[col].where(chunk[col].notna(), [v[k] for v in split])
+    keys = chunk[["category", "sub_category", "fact", "clause"]].astype(str).agg("|".join, axis=1)
+    hashed = ["C-" + hashlib.sha1(k.encode("utf-8")).hexdigest()[:10] for k in keys]
+    chunk["id"] = chunk["id"].where(chunk["id"].notna(), hashed)
+
+
+def _row_id(row) -> str:
+    v = row.get("id")
+    return v if isinstance(v, str) else ""
+
+
+def _dump(obj, path: Path):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _morph_terms(texts, tok: KoreanTokenizer, cache: TokenCache, processes=None):
+    """tokens.jsonl 캐시를 거쳐 (없는 것만 병렬 분석) 색인어 목록을 만든다. 새 레코드만 파일에 덧붙임."""
+    tokens = cache.tokenize_all(texts, tok, processes)
+    cache.save()
+    return [tok.terms(t) for t in tokens]
+
+
+def _update_term_stats(outdir: Path, rows, sources, base_rows=(), stopwords=None):
+    """추천 키워드 통계(term_stats.json)에 새 사례를 더한다. 파일이 없으면 base_rows부터 센다.
+    sources: 새 사례 CSV들의 sha1 (기존 입력 해시를 아는 통계에만 이어 붙임)."""
+    path = outdir / TERM_STATS_FILE
+    if path.exists():
+        stats = TermStats.load(path, stopwords)
+    else:
+        stats = TermStats.from_rows(list(base_rows), stopwords)
+    if stats.sources:
+        stats.sources += sources
+    stats.add_rows(rows).save(path)
+
+
+def build_full(csv_paths, outdir, chunksize=5000, text_fields=DEFAULT_TEXT_FIELDS,
+               tokenizer="word", processes=None, backend="tfidf", embeddings=None,
+               model=DEFAULT_SBERT_MODEL, quantize="int8", nlist=0, stopwords=None):
+    """전체 재색인: vectorizer/NearestNeighbors(또는 BM25 posting list, 임베딩 색인)를 새로 만들고
+    기존 세그먼트는 비운다."""
+    rows = []
+    for chunk in iter_row_chunks(csv_paths, chunksize, text_fields):
+        rows.extend(chunk)
+    if not rows:
+        raise SystemExit("No rows found in input CSV.")
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    texts = [r["full_text"] for r in rows]
+    stats = TermStats.from_rows(rows, stopwords)
+    stats.sources = [file_sha1(p) for p in csv_paths]
+    stats.save(outdir / TERM_STATS_FILE)
+    if backend in ("sbert", "openai"):
+        if embeddings is not None:
+            E = load_embeddings(embeddings)
+            if len(E) != len(rows):
+                raise SystemExit(f"{embeddings}: {len(E)} embeddings for {len(rows)} rows")
+        elif backend == "sbert":
+            E = embed_texts(texts, model)
+        else:
+            raise SystemExit("--backend openai needs precomputed --embeddings (.npy)")
+        export_dense(E, outdir / DENSE_DIR, quantize, nlist, model if embeddings is None else "")
+        _dump({"backend": backend, "model": model if embeddings is None else "", "dense_dir": DENSE_DIR,
+               "ids": [_row_id(r) for r in rows], "rows": rows}, outdir / "artifacts.pkl")
+        _clear_segments(outdir)
+        return len(rows)
+    vec = (CountVectorizer if backend == "bm25" else TfidfVectorizer)(**VECTORIZER_PARAMS)
+    if tokenizer == "word":
+        X = vec.fit_transform(texts)
+    else:
+        tok = KoreanTokenizer(tokenizer, ngram_range=VECTORIZER_PARAMS["ngram_range"])
+        cache = TokenCache(outdir / TOKEN_CACHE_FILE, tok)
+        X = fit_transform_pretokenized(vec, _morph_terms(texts, tok, cache, processes), tok)
+    ids = [_row_id(r) for r in rows]
+    if backend == "bm25":
+        obj = {"backend": "bm25", "vectorizer": vec, "bm25": BM25Index(X), "ids": ids, "rows": rows}
+    else:
+        nn = NearestNeighbors(n_neighbors=min(NN_NEIGHBORS, len(rows)), metric="cosine").fit(X)
+        obj = {"backend": "tfidf", "vectorizer": vec, "nn": nn, "ids": ids, "rows": rows}
+    _dump(obj, outdir / "artifacts.pkl")
+    _clear_segments(outdir)
+    return len(rows)
+
+
+def _clear_segments(outdir: Path):
+    """전체 재색인 뒤 예전 색인의 증분 세그먼트를 지운다 (새 색인과 어휘/백엔드가 다름)."""
+    seg_dir = outdir / SEGMENT_DIR
+    if seg_dir.is_dir():
+        for p in seg_dir.glob("seg-*.pkl"):
+            p.unlink()
+
+
+def convert_dense(outdir, quantize="int8", nlist=0):
+    """임베딩 행렬("matrix")만 artifacts.pkl에 담긴 예전 색인을 dense/ mmap 레이아웃으로 변환하고
+    pickle에서는 행렬을 뺀다."""
+    outdir = Path(outdir)
+    with open(outdir / "artifacts.pkl", "rb") as f:
+        obj = pickle.load(f)
+    if obj.get("backend") in ("tfidf", "bm25"):
+        raise SystemExit("--convert-dense needs an embedding (sbert/openai) index.")
+    if "matrix" not in obj:
+        raise SystemExit("artifacts.pkl has no embedding matrix to convert.")
+    E = np.asarray(obj.pop("matrix"))
+    obj.setdefault("dense_dir", DENSE_DIR)
+    export_dense(E, outdir / obj["dense_dir"], quantize, nlist, obj.get("model", ""))
+    _dump(obj, outdir / "artifacts.pkl")
+    return len(E), outdir / obj["dense_dir"]
+
+
+def build_segment(csv_paths, outdir, chunksize=5000, text_fields=DEFAULT_TEXT_FIELDS, processes=None,
+                  stopwords=None):
+    """증분 추가: 기존 vectorizer로 새 사례만 transform 해 세그먼트 파일 하나로 저장."""
+    outdir = Path(outdir)
+    with open(outdir / "artifacts.pkl", "rb") as f:
+        obj = pickle.load(f)
+    if obj.get("backend") != "tfidf":
+        raise SystemExit("--append supports only the tfidf backend; rebuild the bm25 index instead.")
+    vec = obj["vectorizer"]
+    # 형태소 분석 캐시는 빌드 전체에서 한 번만 읽는다 (청크마다 새 레코드만 덧붙임)
+    cache = None
+    if isinstance(vec.analyzer, KoreanTokenizer):
+        cache = TokenCache(outdir / TOKEN_CACHE_FILE, vec.analyzer)
+    rows, mats = [], []
+    for chunk in iter_row_chunks(csv_paths, chunksize, text_fields):
+        rows.extend(chunk)
+        texts = [r["full_text"] for r in chunk]
+        if cache is not None:
+            mats.append(transform_pretokenized(vec, _morph_terms(texts, vec.analyzer, cache, processes)))
+        else:
+            mats.append(vec.transform(texts))
+    if not rows:
+        raise SystemExit("No rows found in input CSV.")
+    seg_dir = outdir / SEGMENT_DIR
+    seg_dir.mkdir(exist_ok=True)
+    # 번호는 있는 세그먼트의 최댓값 다음 (중간 파일이 지워졌어도 기존 세그먼트를 덮어쓰지 않게)
+    seq = max((int(p.stem[4:]) for p in seg_dir.glob("seg-*.pkl") if p.stem[4:].isdigit()), default=0) + 1
+    path = seg_dir / f"seg-{seq:05d}.pkl"
+    _dump({"backend": "tfidf", "matrix": sp.vstack(mats).tocsr().astype(np.float64),
+           "ids": [_row_id(r) for r in rows], "rows": rows}, path)
+    base = []
+    if not (outdir / TERM_STATS_FILE).exists():
+        # 통계 없이 만든 예전 색인: 기존 사례부터 센다
+        base = list(obj["rows"])
+        for p in sorted(seg_dir.glob("seg-*.pkl")):
+            if p != path:
+                with open(p, "rb") as f:
+                    base.extend(pickle.load(f)["rows"])
+    _update_term_stats(outdir, rows, [file_sha1(p) for p in csv_paths], base, stopwords)
+    return len(rows), path
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--csv", nargs="+", help="사례 CSV 파일(들)")
+    ap.add_argument("--outdir", default=".")
+    ap.add_argument("--append", action="store_true", help="기존 어휘로 새 세그먼트만 추가")
+    ap.add_argument("--convert-dense", action="store_true",
+                    help="행렬만 저장된 예전 임베딩 색인을 dense/ 레이아웃으로 변환 (--quantize/--nlist 적용)")
+    ap.add_argument("--chunksize", type=int, default=5000)
+    ap.add_argument("--text-fields", default=",".join(DEFAULT_TEXT_FIELDS),
+                    help="full_text로 이어 붙일 rows 필드 (쉼표 구분)")
+    ap.add_argument("--tokenizer", choices=TOKENIZERS, default="word",
+                    help="word=sklearn 기본, auto/okt/mecab=konlpy 형태소 분석, regex=정규식")
+    ap.add_argument("--processes", type=int, default=None, help="형태소 분석 프로세스 수 (기본: CPU 수)")
+    ap.add_argument("--backend", choices=BACKENDS, default="tfidf",
+                    help="tfidf=코사인, bm25=BM25 (MaxScore), sbert/openai=임베딩")
+    ap.add_argument("--embeddings", default=None, help="미리 계산한 (행 수, 차원) 임베딩 .npy")
+    ap.add_argument("--model", default=DEFAULT_SBERT_MODEL, help="로컬 sentence-transformers 모델 (sbert)")
+    ap.add_argument("--quantize", choices=DTYPES, default="int8")
+    ap.add_argument("--nlist", type=int, default=0, help="IVF 리스트 수 (0=전수 탐색)")
+    ap.add_argument("--stopwords", default=None, help="추천 키워드 불용어 파일 (한 줄에 하나)")
+    args = ap.parse_args()
+    fields = tuple(f.strip() for f in args.text_fields.split(",") if f.strip())
+    stopwords = load_stopwords(args.stopwords) if args.stopwords else None
+    if args.convert_dense:
+        n, path = convert_dense(args.outdir, args.quantize, args.nlist)
+        print(f"converted {n} embeddings -> {path}")
+        return
+    if not args.csv:
+        ap.error("--csv is required")
+    if args.append:
+        n, path = build_segment(args.csv, args.outdir, args.chunksize, fields, args.processes, stopwords)
+        print(f"appended {n} rows -> {path}")
+    else:
+        n = build_full(args.csv, args.outdir, args.chunksize, fields, args.tokenizer, args.processes,
+                       args.backend, args.embeddings, args.model, args.quantize, args.nlist, stopwords)
+        print(f"indexed {n} rows -> {Path(args.outdir) / 'artifacts.pkl'}")
+
+if __name__ == "__main__":
+    main()
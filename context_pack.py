@@ -0,0 +1,160 @@
+# context_pack.py
+"""LLM 프롬프트용 사례 컨텍스트 패킹.
+
+검색된 사례를 점수 순으로 보면서
+1) 이미 고른 사례와 MinHash 유사도(소분류·사실관계·해설의 문자 3-gram Jaccard 추정)가 기준 이상이면
+   중복으로 빼고 (텍스트가 비어 서명이 없는 사례는 중복으로 보지 않는다),
+2) 사례 블록의 토큰 수를 더해 예산을 넘는 사례는 건너뛴다(다음 사례는 계속 시도 — greedy).
+뺀 사례와 이유를 돌려주므로 답변/보고서의 인용 목록을 실제 프롬프트에 들어간 사례와 맞출 수 있다.
+
+MinHash 서명은 색인 로드 시 사례마다 한 번 계산해 두고(searcher.signatures, mmap 색인은 minhash.npy),
+서명이 없는 사례만 질의 시점에 텍스트로 계산한다.
+토큰 수는 tiktoken이 있으면 그것으로, 없으면 한글 1자≈1토큰·그 밖 4자≈1토큰으로 어림한다.
+"""
+from __future__ import annotations
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_TOKEN_BUDGET = 2000
+DUP_THRESHOLD = 0.8   # 추정 Jaccard 이상이면 중복
+MINHASH_K = 64
+SHINGLE = 3
+SEPARATOR = "\n---\n"
+
+_PRIME = np.uint64(4294967311)  # 2^32보다 큰 소수 (a·x + b가 uint64를 넘지 않음)
+_rng = np.random.RandomState(20240531)  # 저장된 서명과 질의 시 서명이 같도록 고정
+_A = _rng.randint(1, 2 ** 32 - 1, size=MINHASH_K, dtype=np.uint64)
+_B = _rng.randint(0, 2 ** 32 - 1, size=MINHASH_K, dtype=np.uint64)
+_EMPTY = np.full(MINHASH_K, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def case_text(fact, sub_category=None, rationale=None) -> str:
+    """중복 판정 대상 텍스트: 소분류 + 사실관계 + 해설 (빈 칸/NaN은 건너뜀).
+    색인에 저장하는 서명과 질의 시 계산하는 서명이 같은 텍스트를 쓰도록 여기 한 곳에서 만든다."""
+    return " ".join(v for v in (sub_category, fact, rationale) if isinstance(v, str) and v.strip())
+
+
+def row_text(row) -> str:
+    """색인 행(dict)의 case_text. 행별 서명 계산과 RetrievedCase.text가 같은 텍스트를 쓴다."""
+    return case_text(row.get("fact"), row.get("sub_category"), row.get("rationale"))
+
+
+def shingles(text: str) -> np.ndarray:
+    """공백을 뺀 소문자 텍스트의 문자 3-gram → crc32 (프로세스와 무관하게 같은 값)."""
+    t = "".join(str(text).lower().split())
+    grams = {t[i:i + SHINGLE] for i in range(max(1, len(t) - SHINGLE + 1))} if t else set()
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text: str) -> np.ndarray:
+    """텍스트 한 개의 MinHash 서명 (K,) uint32."""
+    x = shingles(text)
+    if not len(x):
+        return _EMPTY.copy()
+    return ((np.outer(x, _A) + _B) % _PRIME).min(axis=0).astype(np.uint32)
+
+
+def minhash_rows(texts: Sequence[str], chunk: int = 1 << 20) -> np.ndarray:
+    """여러 텍스트의 서명 (n, K). shingle을 모두 이어 붙여 K개 해시마다 reduceat 한 번으로 최솟값을 구한다."""
+    sig = np.tile(_EMPTY, (len(texts), 1))
+    start = 0
+    while start < len(texts):
+        # shingle 수 기준으로 chunk 크기만큼씩 (메모리 상한)
+        parts, total, end = [], 0, start
+        while end < len(texts) and (total < chunk or end == start):
+            parts.append(shingles(texts[end]))
+            total += len(parts[-1])
+            end += 1
+        lens = np.asarray([len(p) for p in parts])
+        rows = np.flatnonzero(lens)
+        if len(rows):
+            x = np.concatenate(parts)
+            offsets = np.concatenate([[0], np.cumsum(lens[rows])[:-1]])
+            for k in range(MINHASH_K):
+                h = (x * _A[k] + _B[k]) % _PRIME
+                sig[start + rows, k] = np.minimum.reduceat(h, offsets).astype(np.uint32)
+        start = end
+    return sig
+
+
+def is_empty(sig: np.ndarray) -> bool:
+    """shingle이 하나도 없는 텍스트의 서명 (모든 빈 사례가 같은 값이므로 중복 판정에 쓰지 않는다)."""
+    return bool(np.array_equal(sig, _EMPTY))
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """두 서명의 추정 Jaccard."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken  # type: ignore
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text))
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+@dataclass
+class PackedContext:
+    cases: List[Any]                                        # 프롬프트에 넣을 사례 (점수 순)
+    dropped: List[Dict[str, Any]] = field(default_factory=list)  # {"rank", "id", "clause", "reason", ...}
+    tokens: int = 0
+    ranks: List[int] = field(default_factory=list)          # cases 각각의 입력 목록 순위 (1부터)
+
+    @property
+    def used_ids(self) -> List[str]:
+        return [c.id for c in self.cases]
+
+
+class ContextPacker:
+    """signatures: 색인 행 번호(RetrievedCase.doc) → MinHash 서명 배열 (n, K). 없으면 사례 텍스트로 계산."""
+    def __init__(self, budget: int = DEFAULT_TOKEN_BUDGET, threshold: float = DUP_THRESHOLD,
+                 signatures: Optional[np.ndarray] = None, token_counter: Callable[[str], int] = count_tokens):
+        self.budget = budget
+        self.threshold = threshold
+        self.signatures = signatures
+        self.count = token_counter
+
+    def _signature(self, c) -> np.ndarray:
+        doc = getattr(c, "doc", -1)
+        if self.signatures is not None and 0 <= doc < len(self.signatures):
+            return np.asarray(self.signatures[doc])
+        # 색인 밖 사례: 검색기가 채운 전체 텍스트(RetrievedCase.text), 없으면 사실관계만
+        return minhash(getattr(c, "text", "") or case_text(c.fact))
+
+    def pack(self, cases: Sequence[Any], format_block: Callable[[Any], str]) -> PackedContext:
+        """점수 내림차순(같으면 원래 순서)으로 중복 제거 + 토큰 예산 채우기. 첫 사례는 예산과 무관하게 넣는다."""
+        out = PackedContext(cases=[])
+        kept_sigs: List[np.ndarray] = []
+        # 사례ID가 비거나 겹칠 수 있으므로 입력 순위(rank)로도 구분한다
+        for rank, c in sorted(enumerate(cases, start=1), key=lambda t: -t[1].score):
+            info = {"rank": rank, "id": c.id, "clause": c.clause or f"{c.law} {c.article}".strip()}
+            sig = self._signature(c)
+            dup = None if is_empty(sig) else next(
+                (r for r, s in zip(out.ranks, kept_sigs) if not is_empty(s) and similarity(sig, s) >= self.threshold),
+                None)
+            if dup is not None:
+                out.dropped.append({**info, "reason": "duplicate", "duplicate_of": dup})
+                continue
+            cost = self.count(format_block(c)) + (self.count(SEPARATOR) if out.cases else 0)
+            if out.cases and out.tokens + cost > self.budget:
+                out.dropped.append({**info, "reason": "budget", "tokens": cost})
+                continue
+            out.cases.append(c)
+            out.ranks.append(rank)
+            kept_sigs.append(sig)
+            out.tokens += cost
+        return out
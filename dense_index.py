@@ -0,0 +1,182 @@
+# dense_index.py
+"""임베딩(openai/sbert) 백엔드용 밀집 벡터 색인.
+
+디렉터리 레이아웃 (<outdir>/dense):
+    meta.json         dtype(int8|float16), dim, n, model, nlist
+    vectors.npy       (n, dim) 양자화 벡터 — np.load(mmap_mode="r")로 열어 필요한 블록만 읽는다
+    scales.npy        int8일 때 행별 배율 (float32). 점수 = (q · v_int8) × scale
+    perm.npy          저장 위치 → 원래 행 번호 (IVF 사용 시 리스트별로 재배열되어 있음)
+    centroids.npy, offsets.npy   IVF 코스 분할 (nlist > 0 일 때만)
+
+검색은 캐시 크기 블록 단위로 float32 변환·행렬곱 후 top-k를 병합하므로 메모리는 블록 하나 분량만 쓴다.
+IVF가 있으면 질의와 가까운 nprobe개 리스트만 훑는다.
+임베딩은 파일(.npy)에서 읽거나 로컬 sentence-transformers 모델로 계산하며, 질의 시 네트워크를 쓰지 않는다.
+"""
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DENSE_DIR = "dense"
+DTYPES = ("int8", "float16")
+CACHE_BYTES = 1 << 20   # 블록 하나(float32 변환 후)의 목표 크기 ≈ L2 캐시
+KMEANS_ITERS = 20
+KMEANS_SAMPLE = 100000
+
+
+def _l2(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    n = np.linalg.norm(X, axis=1, keepdims=True)
+    n[n == 0] = 1.0
+    return X / n
+
+
+def load_embeddings(path) -> np.ndarray:
+    """미리 계산한 (문서 수, 차원) 임베딩 .npy 파일."""
+    X = np.load(path)
+    if X.ndim != 2:
+        raise ValueError(f"{path}: expected a 2-D embedding matrix, got shape {X.shape}")
+    return X
+
+
+def embed_texts(texts: Sequence[str], model: str, batch_size: int = 64) -> np.ndarray:
+    """로컬 sentence-transformers 모델로 임베딩 (허브 접속 없이 캐시/경로에서만 로드)."""
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    try:
+        from sentence_transformers import SentenceTransformer  # type: ignore
+    except ImportError:
+        raise SystemExit("sentence-transformers is required to embed text locally; "
+                         "pass precomputed embeddings (.npy) instead.")
+    enc = SentenceTransformer(model)
+    return np.asarray(enc.encode(list(texts), batch_size=batch_size, show_progress_bar=False),
+                      dtype=np.float32)
+
+
+def quantize(X: np.ndarray, dtype: str = "int8") -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """L2 정규화된 벡터 → (양자화 벡터, int8 행별 배율 또는 None)."""
+    if dtype == "float16":
+        return X.astype(np.float16), None
+    if dtype != "int8":
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    scale = np.abs(X).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    Q = np.clip(np.rint(X / scale[:, None]), -127, 127).astype(np.int8)
+    return Q, scale.astype(np.float32)
+
+
+def kmeans(X: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """구면 k-means (코사인). 큰 코퍼스는 표본으로만 학습한다."""
+    rng = np.random.default_rng(seed)
+    sample = X if len(X) <= KMEANS_SAMPLE else X[rng.choice(len(X), KMEANS_SAMPLE, replace=False)]
+    C = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ C.T, axis=1)
+        for j in range(k):
+            members = sample[assign == j]
+            if len(members):
+                C[j] = members.sum(axis=0)
+        C = _l2(C)
+    return C
+
+
+def export_dense(X: np.ndarray, outdir, dtype: str = "int8", nlist: int = 0, model: str = "") -> Path:
+    """임베딩 행렬을 양자화해 mmap 레이아웃으로 저장. nlist > 0 이면 IVF 분할도 만든다."""
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    X = _l2(X)
+    n, dim = X.shape
+    perm = np.arange(n, dtype=np.int64)
+    nlist = min(nlist, n)
+    if nlist > 0:
+        C = kmeans(X, nlist)
+        assign = np.empty(n, dtype=np.int64)
+        for s in range(0, n, 65536):
+            assign[s:s + 65536] = np.argmax(X[s:s + 65536] @ C.T, axis=1)
+        perm = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[perm], np.arange(nlist + 1)).astype(np.int64)
+        X = X[perm]
+        np.save(outdir / "centroids.npy", C.astype(np.float32))
+        np.save(outdir / "offsets.npy", offsets)
+    Q, scale = quantize(X, dtype)
+    np.save(outdir / "vectors.npy", Q)
+    if scale is not None:
+        np.save(outdir / "scales.npy", scale)
+    np.save(outdir / "perm.npy", perm)
+    with open(outdir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"dtype": dtype, "dim": dim, "n": n, "model": model, "nlist": nlist},
+                  f, ensure_ascii=False)
+    return outdir
+
+
+def _empty(m):
+    return np.empty((m, 0), np.float32), np.empty((m, 0), np.int64)
+
+
+def _merge(best_s, best_i, s, i, topk):
+    """기존 top-k와 새 블록 후보를 합쳐 다시 top-k (행 = 질의)."""
+    S = np.concatenate([best_s, s], axis=1)
+    I = np.concatenate([best_i, i], axis=1)
+    k = min(topk, S.shape[1])
+    part = np.argpartition(-S, k - 1, axis=1)[:, :k] if k < S.shape[1] else np.argsort(-S, axis=1)
+    return np.take_along_axis(S, part, axis=1), np.take_along_axis(I, part, axis=1)
+
+
+class DenseIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.scales = (np.load(self.path / "scales.npy", mmap_mode="r")
+                       if self.meta["dtype"] == "int8" else None)
+        self.perm = np.load(self.path / "perm.npy", mmap_mode="r")
+        self.nlist = int(self.meta.get("nlist", 0))
+        if self.nlist:
+            self.centroids = np.load(self.path / "centroids.npy")
+            self.offsets = np.load(self.path / "offsets.npy")
+        self.block_rows = max(256, CACHE_BYTES // (4 * int(self.meta["dim"])))
+
+    def __len__(self):
+        return int(self.meta["n"])
+
+    def _score(self, Q, pos, topk, best_s, best_i):
+        """저장 위치들(slice 또는 위치 배열)의 블록 하나를 점수화해 top-k에 병합."""
+        blk = np.asarray(self.vectors[pos], dtype=np.float32)
+        scores = Q @ blk.T                                      # (질의 수, 블록 행 수)
+        if self.scales is not None:
+            scores *= self.scales[pos]
+        ids = np.arange(pos.start, pos.stop) if isinstance(pos, slice) else np.asarray(pos)
+        m = len(ids)
+        k = min(topk, m)
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < m else np.tile(np.arange(m), (len(Q), 1))
+        return _merge(best_s, best_i, np.take_along_axis(scores, part, axis=1), ids[part], topk)
+
+    def search(self, queries: np.ndarray, topk: int = 10, nprobe: int = 8) -> List[List[Tuple[int, float]]]:
+        """질의 임베딩 (질의 수, 차원) → 질의별 [(원래 행 번호, 코사인 점수)] 내림차순."""
+        Q = _l2(np.atleast_2d(queries))
+        if Q.shape[1] != int(self.meta["dim"]):
+            raise ValueError(f"query dim {Q.shape[1]} != index dim {self.meta['dim']}")
+        B = self.block_rows
+        if not self.nlist:
+            best_s, best_i = _empty(len(Q))
+            for s in range(0, len(self), B):
+                best_s, best_i = self._score(Q, slice(s, min(s + B, len(self))), topk, best_s, best_i)
+            parts = list(zip(best_s, best_i))
+        else:
+            # 질의별로 가까운 nprobe개 리스트의 저장 위치를 모아 블록 단위로 점수화
+            probe = np.argsort(-(Q @ self.centroids.T), axis=1)[:, :max(1, nprobe)]
+            parts = []
+            for qi, lists in enumerate(probe):
+                pos = np.concatenate([np.arange(self.offsets[j], self.offsets[j + 1]) for j in np.sort(lists)])
+                bs, bi = _empty(1)
+                for s in range(0, len(pos), B):
+                    bs, bi = self._score(Q[qi:qi + 1], pos[s:s + B], topk, bs, bi)
+                parts.append((bs[0], bi[0]))
+        out = []
+        for s, i in parts:
+            order = np.argsort(-s, kind="stable")
+            out.append([(int(self.perm[i[o]]), float(s[o])) for o in order])
+        return out
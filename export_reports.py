@@ -0,0 +1,132 @@
+# export_reports.py
+"""질의 목록 → RAG 안내 보고서 일괄 내보내기 (감사용).
+
+    python export_reports.py --queries queries.txt --outdir reports --topk 6
+    python export_reports.py --queries audit.jsonl --backend openai --model gpt-4o-mini --concurrency 8
+
+질의 파일은 한 줄에 질의 하나(.txt) 또는 {"query": "...", "id": "..."} 한 줄씩(.jsonl).
+파일을 --batch 개씩 읽어 한 번의 행렬곱으로 검색(Retriever.retrieve_batch)하고, 답변은 asyncio로
+최대 --concurrency 개만 동시에 만든다. 다음 배치 검색은 앞 배치 답변과 겹쳐서 돌린다.
+보고서는 끝나는 대로 <outdir>/<번호>[_id].html 로 쓰고 <outdir>/index.jsonl 에 한 줄씩 덧붙이므로
+(완료 순서, "n"이 입력 순번) 질의 수와 상관없이 메모리에는 최대 두 배치만 머문다.
+"""
+import argparse, asyncio, json, os, re, sys, time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+from mmap_index import open_searcher
+from rag_answer import Retriever, RAGAnswerer
+from context_pack import ContextPacker, DEFAULT_TOKEN_BUDGET
+from report_html import build_html, make_report
+from tracing import span
+
+INDEX_FILE = "index.jsonl"
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+def read_queries(path):
+    """질의 파일 → (입력 순번, 보고서 파일 이름, 질의) 생성기. 빈 질의는 건너뛴다."""
+    jsonl = str(path).endswith(".jsonl")
+    n = 0
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if jsonl:
+                obj = json.loads(line)
+                query, qid = str(obj.get("query") or "").strip(), str(obj.get("id") or "")
+            else:
+                query, qid = line, ""
+            if not query:
+                continue
+            n += 1
+            name = f"{n:06d}_{_UNSAFE.sub('_', qid)[:60]}" if qid else f"{n:06d}"
+            yield n, name, query
+
+
+def _write(path: Path, text: str):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+async def export(retriever, answerer, queries, outdir, topk=6, batch=256, concurrency=8, article=None):
+    """queries: (순번, 이름, 질의) 반복자. 반환: {"written", "failed"} 건수."""
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    stats = {"written": 0, "failed": 0}
+
+    with open(outdir / INDEX_FILE, "w", encoding="utf-8") as index:
+        async def one(n, name, query, cases):
+            async with slots:
+                t0 = time.perf_counter()
+                entry = {"n": n, "query": query}
+                try:
+                    out = await answerer.aanswer(query, cases)
+                    rep = make_report(query, out, cases, datetime.now().strftime("%Y-%m-%d %H:%M"))
+                    with span("export.write"):
+                        await loop.run_in_executor(None, _write, outdir / f"{name}.html", build_html(rep))
+                    entry.update(file=f"{name}.html", mode=out.get("mode"),
+                                 cases=[{"id": c.id, "clause": c.clause, "score": c.score} for c in cases],
+                                 context_ranks=out.get("context_ranks"), dropped=out.get("dropped"))
+                    stats["written"] += 1
+                except Exception as e:  # 한 건 실패로 전체를 멈추지 않는다
+                    entry["error"] = f"{type(e).__name__}: {e}"
+                    stats["failed"] += 1
+                entry["elapsed"] = round(time.perf_counter() - t0, 3)
+                index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        async def answer_all(chunk, results):
+            await asyncio.gather(*(one(n, name, q, cases) for (n, name, q), cases in zip(chunk, results)))
+            index.flush()
+
+        it = iter(queries)
+        pending = None
+        while True:
+            chunk = list(islice(it, batch))
+            if not chunk:
+                break
+            with span("export.retrieve"):
+                results = await loop.run_in_executor(
+                    None, retriever.retrieve_batch, [q for _, _, q in chunk], topk, article)
+            if pending is not None:
+                await pending
+            pending = asyncio.ensure_future(answer_all(chunk, results))
+        if pending is not None:
+            await pending
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", required=True, help="질의 파일 (.txt 한 줄에 하나 / .jsonl)")
+    ap.add_argument("--indexdir", default=".")
+    ap.add_argument("--outdir", default="reports")
+    ap.add_argument("--topk", type=int, default=6)
+    ap.add_argument("--article", default=None, help="조문 필터 (예: 공직선거법 §93)")
+    ap.add_argument("--backend", choices=["none", "openai"], default="none")
+    ap.add_argument("--model", default="gpt-4o-mini")
+    ap.add_argument("--batch", type=int, default=256, help="한 번에 검색할 질의 수")
+    ap.add_argument("--concurrency", type=int, default=8, help="동시에 생성할 답변 수")
+    ap.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="프롬프트에 넣을 사례 토큰 상한")
+    args = ap.parse_args()
+
+    # 질의마다 다르므로 검색 캐시는 두지 않는다 (메모리 고정)
+    searcher = open_searcher(args.indexdir)
+    retriever = Retriever(searcher)
+    answerer = RAGAnswerer(backend=args.backend, model=args.model, max_concurrency=args.concurrency,
+                           packer=ContextPacker(args.token_budget, signatures=searcher.signatures))
+    t0 = time.perf_counter()
+    stats = asyncio.run(export(retriever, answerer, read_queries(args.queries), args.outdir,
+                               args.topk, args.batch, args.concurrency, args.article))
+    print(f"{stats['written']} reports written, {stats['failed']} failed "
+          f"in {time.perf_counter() - t0:.1f}s → {args.outdir}/{INDEX_FILE}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# facets.py
+"""대분류/소분류/위반여부/법조항 facet 비트맵.
+
+데이터 로드 시 facet 값마다 행 비트맵(np.packbits와 같은 배치, 8행 = 1바이트)을 한 번 만든다.
+필터는 같은 facet 안에서는 OR, facet 사이에서는 AND로 비트 연산만 하고,
+현재 결과 집합의 facet별 건수는 (값 수 × 바이트 수) 비트맵에 결과 마스크를 AND 한 뒤
+popcount로 센다(값 여러 개씩 나눠 임시 배열 크기를 제한). 키워드 검색/TF-IDF 결과는 positions_mask()로 같은 마스크가 된다.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from statutes import format_key, parse_citations
+
+# 표시 이름(CSV 컬럼) → artifacts rows 필드
+FACET_FIELDS = {
+    "대분류": "category",
+    "소분류": "sub_category",
+    "위반여부": "violation_label",
+    "법조항": "clause",
+}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+COUNT_BLOCK = 1 << 24  # counts()에서 한 번에 AND/popcount 할 비트맵 바이트 수 (임시 배열 상한)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    """uint8 배열의 바이트별 1비트 수 (uint8, 같은 모양)."""
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(bits)
+    return _POPCOUNT[bits]
+
+
+def _pack(positions: np.ndarray, nbytes: int) -> np.ndarray:
+    """오름차순 행 번호 → packbits와 같은 비트 순서(상위 비트 먼저)의 uint8 마스크.
+    행 수 길이의 bool 배열을 만들지 않고 바이트마다 비트를 OR 한다."""
+    out = np.zeros(nbytes, dtype=np.uint8)
+    if len(positions):
+        byte = positions >> 3
+        bit = (np.uint8(0x80) >> (positions & 7).astype(np.uint8)).astype(np.uint8)
+        starts = np.flatnonzero(np.r_[True, byte[1:] != byte[:-1]])
+        out[byte[starts]] = np.bitwise_or.reduceat(bit, starts)
+    return out
+
+
+def normalize_clause(value) -> List[str]:
+    """법조항 칸 → 정규화된 조항 목록. 법률명이 생략된 조항은 앞 조항의 법률명을 따른다.
+
+    >>> normalize_clause("공직선거법 §58, 제254조")
+    ['공직선거법 §58', '공직선거법 §254']
+    """
+    if not isinstance(value, str) or not value.strip():
+        return []
+    return [format_key(k) for k in parse_citations(value)] or [" ".join(value.split())]
+
+
+def _facet_values(facet: str, value) -> List[str]:
+    if facet == "법조항":
+        return normalize_clause(value)
+    if isinstance(value, str) and value.strip():
+        return [value.strip()]
+    return []
+
+
+class FacetIndex:
+    def __init__(self, columns: Mapping[str, Sequence]):
+        """columns: facet 이름 → 행별 원래 값 (모든 facet의 길이가 같아야 함)."""
+        self.n = len(next(iter(columns.values()))) if columns else 0
+        self.nbytes = (self.n + 7) // 8
+        self.values: Dict[str, List[str]] = {}
+        self.bits: Dict[str, np.ndarray] = {}   # facet → (값 수, nbytes) uint8
+        self._pos: Dict[str, Dict[str, int]] = {}
+        for facet, col in columns.items():
+            rows: Dict[str, List[int]] = {}
+            for i, v in enumerate(col):
+                for fv in _facet_values(facet, v):
+                    rows.setdefault(fv, []).append(i)
+            # 건수 내림차순, 같으면 값 순
+            vals = sorted(rows, key=lambda v: (-len(rows[v]), v))
+            bits = np.zeros((len(vals), self.nbytes), dtype=np.uint8)
+            for j, v in enumerate(vals):
+                bits[j] = _pack(np.asarray(rows[v], dtype=np.int64), self.nbytes)
+            self.values[facet] = vals
+            self.bits[facet] = bits
+            self._pos[facet] = {v: j for j, v in enumerate(vals)}
+
+    @classmethod
+    def from_frame(cls, df, facets: Iterable[str] = FACET_FIELDS) -> "FacetIndex":
+        """CSV 컬럼 이름(대분류 등) 그대로인 DataFrame에서 생성."""
+        return cls({f: df[f].tolist() for f in facets if f in df.columns})
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[dict], facets: Mapping[str, str] = FACET_FIELDS) -> "FacetIndex":
+        """artifacts rows(dict, 영문 필드)에서 생성. facet 이름은 표시 이름을 쓴다."""
+        return cls({f: [r.get(field) for r in rows] for f, field in facets.items()})
+
+    # ----- 마스크 (packed uint8, 길이 nbytes) -----
+    def all_mask(self) -> np.ndarray:
+        return np.packbits(np.ones(self.n, dtype=bool))
+
+    def mask(self, selection: Optional[Mapping[str, Iterable[str]]] = None) -> np.ndarray:
+        """{facet: [값, ...]} → 같은 facet 안 OR, facet 간 AND. 선택이 빈 facet은 조건 없음."""
+        m = self.all_mask()
+        for facet, vals in (selection or {}).items():
+            vals = list(vals or ())
+            if not vals:
+                continue
+            idx = [self._pos[facet][v] for v in vals if v in self._pos.get(facet, {})]
+            if not idx:
+                return np.zeros(self.nbytes, dtype=np.uint8)
+            m &= np.bitwise_or.reduce(self.bits[facet][idx], axis=0)
+        return m
+
+    def positions_mask(self, positions) -> np.ndarray:
+        """행 번호 배열(키워드/TF-IDF 결과) → 마스크."""
+        return _pack(np.unique(np.asarray(positions, dtype=np.int64)), self.nbytes)
+
+    def to_bool(self, mask: np.ndarray) -> np.ndarray:
+        return np.unpackbits(mask, count=self.n).astype(bool)
+
+    def positions(self, mask: np.ndarray) -> np.ndarray:
+        """마스크 → 행 번호 (오름차순)."""
+        return np.flatnonzero(np.unpackbits(mask, count=self.n))
+
+    def count(self, mask: np.ndarray) -> int:
+        return int(_popcount(mask).sum(dtype=np.int64))
+
+    def counts(self, mask: Optional[np.ndarray] = None) -> Dict[str, Dict[str, int]]:
+        """결과 마스크 안의 facet 값별 건수 (0건 값 제외, 건수 내림차순)."""
+        if mask is None:
+            mask = self.all_mask()
+        out = {}
+        for facet, bits in self.bits.items():
+            # 값 여러 개씩 나눠 AND/popcount (임시 배열이 COUNT_BLOCK 바이트를 넘지 않게)
+            c = np.zeros(len(bits), dtype=np.int64)
+            step = max(1, COUNT_BLOCK // max(1, self.nbytes))
+            for a in range(0, len(bits), step):
+                c[a:a + step] = _popcount(bits[a:a + step] & mask).sum(axis=1, dtype=np.int64)
+            order = np.argsort(-c, kind="stable")
+            out[facet] = {self.values[facet][j]: int(c[j]) for j in order if c[j]}
+        return out
@@ -0,0 +1,326 @@
+# fuzzy_index.py
+"""오타 허용 키워드 검색 (자모 n-gram 색인 + 편집거리 검증).
+
+한글 음절을 두벌식 자판 입력 순서의 자모로 풀어(겹모음/겹받침도 두 글자로: 괜→ㄱㅗㅐㄴ, 닭→ㄷㅏㄹㄱ)
+자모 문자열 위에서 키워드와의 편집거리를 잰다. "현수멁"(ㅎㅕㄴㅅㅜㅁㅓㄹㄱ)은 "현수막"과 거리 2.
+
+- 색인: 행마다 자모 bigram → 행 번호 posting (데이터 로드 시 한 번).
+- 후보: 키워드 길이 m, 허용 거리 k, n-gram 길이 n일 때 일치 구간은 키워드 n-gram 위치 중
+  최소 m - n + 1 - k·n 개를 그대로 가진다(q-gram 보조정리). 해당 posting만 모아 세므로
+  말뭉치 전체가 아니라 posting 길이에 비례한다. 이 하한이 1 이상이 되도록 k를 제한한다.
+- 검증: 후보 행만 Myers 비트 병렬 근사 문자열 매칭으로 "부분 문자열과의 최소 편집거리 ≤ k"를 확인하고,
+  일치 구간을 원문 음절 단위로 되돌려 실제로 찾은 표기(변형)를 돌려준다 (강조용).
+"""
+from __future__ import annotations
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from keyword_index import TARGET_COLUMNS, build_target_text
+
+JAMO_NGRAM = 2
+MAX_EDIT_RATIO = 0.25  # 키워드 자모 수 대비 허용 편집거리 (현수막 8자모 → 2)
+VERIFY_BLOCK = 1 << 21  # 검증 한 묶음의 (행 수 × 최대 자모 길이) 상한 (메모리)
+VARIANT_ROWS = 100      # 찾은 표기(강조용)를 모을 상위 행 수
+
+_CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNG = ("ㅏ", "ㅐ", "ㅑ", "ㅒ", "ㅓ", "ㅔ", "ㅕ", "ㅖ", "ㅗ", "ㅗㅏ", "ㅗㅐ", "ㅗㅣ", "ㅛ", "ㅜ",
+         "ㅜㅓ", "ㅜㅔ", "ㅜㅣ", "ㅠ", "ㅡ", "ㅡㅣ", "ㅣ")
+_JONG = ("", "ㄱ", "ㄲ", "ㄱㅅ", "ㄴ", "ㄴㅈ", "ㄴㅎ", "ㄷ", "ㄹ", "ㄹㄱ", "ㄹㅁ", "ㄹㅂ", "ㄹㅅ", "ㄹㅌ",
+         "ㄹㅍ", "ㄹㅎ", "ㅁ", "ㅂ", "ㅂㅅ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ")
+_SYLLABLES = [c + v + t for c in _CHO for v in _JUNG for t in _JONG]  # 가(U+AC00)부터 순서대로
+# 호환 자모로 직접 입력한 겹모음/겹받침도 같은 자판 순서로 푼다
+_COMPOUND = {"ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+             "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ",
+             "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ"}
+_TABLE = {0xAC00 + i: s for i, s in enumerate(_SYLLABLES)}
+_TABLE.update((ord(k), v) for k, v in _COMPOUND.items())
+
+
+def to_jamo(text: str) -> str:
+    """소문자화 + 한글 음절을 자모로 (그 밖의 글자는 그대로)."""
+    return text.lower().translate(_TABLE)
+
+
+def _jamo_offsets(text: str) -> Tuple[str, List[int]]:
+    """to_jamo와 같은 문자열과, 자모 위치 → 원문 글자 위치."""
+    parts, offs = [], []
+    for i, ch in enumerate(text):
+        j = ch.lower()
+        j = "".join(_TABLE.get(ord(c), c) for c in j)
+        parts.append(j)
+        offs.extend([i] * len(j))
+    return "".join(parts), offs
+
+
+def _grams(text: str, n: int) -> List[str]:
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def max_distance(m: int, n: int = JAMO_NGRAM, ratio: float = MAX_EDIT_RATIO) -> int:
+    """자모 m자 키워드의 허용 편집거리. n-gram 후보 하한(m - n + 1 - k·n)이 1 이상이 되게 제한."""
+    return max(0, min(int(m * ratio), (m - n) // n))
+
+
+def _peq(pattern: str) -> Dict[str, int]:
+    peq: Dict[str, int] = {}
+    for i, c in enumerate(pattern):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    return peq
+
+
+def best_end(pattern: str, text: str, k: int, peq: Optional[Dict[str, int]] = None) -> Tuple[int, int]:
+    """text의 부분 문자열과 pattern의 최소 편집거리와 그 끝 위치 (Myers 1999, 비트 병렬).
+    거리 ≤ k인 곳이 없으면 (k + 1, -1). 거리 0을 찾으면 바로 멈춘다."""
+    m = len(pattern)
+    if m == 0:
+        return 0, 0
+    peq = peq if peq is not None else _peq(pattern)
+    full, high = (1 << m) - 1, 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    best, end = (m, 0) if m <= k else (k + 1, -1)  # 빈 구간과의 거리는 m
+    for j, c in enumerate(text):
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+        if score < best:
+            best, end = score, j + 1
+            if score == 0:
+                break
+    return best, end
+
+
+def _match_start(pattern: str, text: str, end: int, dist: int) -> int:
+    """끝 위치가 end인 거리 dist 일치의 시작 위치 (창 안에서만 DP 역추적)."""
+    m = len(pattern)
+    lo = max(0, end - m - dist)
+    w = text[lo:end]
+    # D[i][j]: pattern[:i]와 w[s:j]의 최소 거리 (시작 s는 자유)
+    D = [[0] * (len(w) + 1)]
+    for i in range(1, m + 1):
+        row = [i] + [0] * len(w)
+        prev = D[-1]
+        for j in range(1, len(w) + 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (pattern[i - 1] != w[j - 1]))
+        D.append(row)
+    i, j = m, len(w)
+    while i > 0:
+        if j > 0 and D[i][j] == D[i - 1][j - 1] + (pattern[i - 1] != w[j - 1]):
+            i, j = i - 1, j - 1
+        elif D[i][j] == D[i - 1][j] + 1:
+            i -= 1
+        else:
+            j -= 1
+    return lo + j
+
+
+@dataclass
+class FuzzyHits:
+    positions: np.ndarray                                   # 행 위치 (거리 합 오름차순, 같으면 행 순서)
+    distances: np.ndarray                                   # positions 각각의 키워드별 거리 합
+    variants: Dict[str, Counter] = field(default_factory=dict)  # 키워드 → 실제로 찾은 표기 빈도
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+class FuzzyIndex:
+    """대상 텍스트의 자모 n-gram posting list. KeywordIndex와 같은 대상 텍스트(TARGET_COLUMNS)를 쓴다.
+
+    자모 텍스트는 한 배열(알파벳 번호)로 이어 두고, n-gram posting도 CSR(ptr/rows)로 둔다.
+    검증은 후보 행을 길이순으로 묶어 행 방향으로 Myers 비트 벡터(uint64)를 한꺼번에 갱신한다.
+    """
+
+    def __init__(self, texts: Iterable[str], n: int = JAMO_NGRAM):
+        self.n = n
+        self.texts: List[str] = [str(t).lower() for t in texts]
+        jamo = [to_jamo(t) for t in self.texts]
+        lens = np.fromiter(map(len, jamo), dtype=np.int64, count=len(jamo))
+        self._start = np.zeros(len(jamo) + 1, dtype=np.int64)
+        np.cumsum(lens, out=self._start[1:])
+        codes = np.frombuffer("".join(jamo).encode("utf-32-le"), dtype=np.uint32)
+        self._alpha, ids = np.unique(codes, return_inverse=True)
+        self._ids = ids.astype(np.int32)
+        self._lens = lens
+
+        # n-gram 키 = 알파벳 번호를 A진법으로 이은 값. 행 경계를 넘는 n-gram은 뺀다
+        A = np.int64(len(self._alpha) + 1)
+        row = np.repeat(np.arange(len(jamo), dtype=np.int64), lens)
+        m = len(self._ids) - n + 1
+        if m > 0:
+            key = np.zeros(m, dtype=np.int64)
+            for j in range(n):
+                key = key * A + self._ids[j:j + m]
+            ok = row[:m] == row[n - 1:n - 1 + m]
+            # (키, 행) 쌍 중복 제거 → 키 순, 같은 키 안에서는 행 오름차순
+            pair = np.unique(key[ok] * len(jamo) + row[:m][ok])
+            gkey, grow = np.divmod(pair, max(len(jamo), 1))
+        else:
+            gkey = grow = np.empty(0, dtype=np.int64)
+        self._gram_keys, first = np.unique(gkey, return_index=True)
+        self._gram_ptr = np.append(first, len(gkey)).astype(np.int64)
+        self._gram_rows = grow.astype(np.int32)
+        self._A = A
+        self._all = np.arange(len(self.texts), dtype=np.int32)
+
+    @classmethod
+    def from_frame(cls, df, columns: Sequence[str] = TARGET_COLUMNS) -> "FuzzyIndex":
+        return cls(build_target_text(df, columns).tolist())
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _encode(self, pattern: str) -> np.ndarray:
+        """자모 키워드 → 알파벳 번호 (말뭉치에 없는 글자는 -1)."""
+        codes = np.frombuffer(pattern.encode("utf-32-le"), dtype=np.uint32)
+        pos = np.searchsorted(self._alpha, codes).clip(0, max(len(self._alpha) - 1, 0))
+        return np.where(self._alpha[pos] == codes, pos, -1) if len(self._alpha) else np.full(len(codes), -1)
+
+    def _posting(self, gram: np.ndarray) -> np.ndarray:
+        if (gram < 0).any():
+            return self._all[:0]
+        key = np.int64(0)
+        for g in gram.tolist():
+            key = key * self._A + g
+        i = np.searchsorted(self._gram_keys, key)
+        if i == len(self._gram_keys) or self._gram_keys[i] != key:
+            return self._all[:0]
+        return self._gram_rows[self._gram_ptr[i]:self._gram_ptr[i + 1]]
+
+    def candidates(self, pattern: str, k: int) -> np.ndarray:
+        """자모 키워드 pattern과 거리 ≤ k로 일치할 수 있는 행 (오름차순)."""
+        ids = self._encode(pattern)
+        need = len(ids) - self.n + 1 - k * self.n
+        if need <= 0:  # 키워드가 짧아 거를 수 없음
+            return self._all
+        hits = np.concatenate([self._posting(ids[i:i + self.n]) for i in range(len(ids) - self.n + 1)])
+        rows, counts = np.unique(hits, return_counts=True)
+        return rows[counts >= need].astype(np.int32)
+
+    def _text_jamo(self, i: int) -> str:
+        a, b = self._start[i], self._start[i + 1]
+        return self._alpha[self._ids[a:b]].astype("<u4").tobytes().decode("utf-32-le")
+
+    def verify(self, pattern: str, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """rows 각각에서 pattern과의 최소 부분 문자열 편집거리(k 초과는 k + 1)와 그 자모 끝 위치."""
+        rows = np.asarray(rows, dtype=np.int64)
+        m = len(pattern)
+        if m > 63:  # uint64 비트 벡터에 안 들어가면 행마다 파이썬 정수로
+            res = [best_end(pattern, self._text_jamo(i), k) for i in rows.tolist()]
+            return (np.asarray([d for d, _ in res], dtype=np.int32).reshape(-1),
+                    np.asarray([e for _, e in res], dtype=np.int64).reshape(-1))
+        ids = self._encode(pattern)
+        table = np.zeros(len(self._alpha) + 1, dtype=np.uint64)  # 마지막 칸: 패딩
+        for i, a in enumerate(ids.tolist()):
+            if a >= 0:
+                table[a] |= np.uint64(1 << i)
+        full, shift = np.uint64((1 << m) - 1), np.uint64(m - 1)
+        one = np.uint64(1)
+        dist = np.full(len(rows), k + 1, dtype=np.int32)
+        end = np.full(len(rows), -1, dtype=np.int64)
+        if m <= k:
+            dist[:], end[:] = m, 0
+        order = np.argsort(self._lens[rows], kind="stable")
+        pad = len(self._alpha)
+        total = len(self._ids)
+        s = 0
+        while s < len(order):
+            # 길이가 비슷한 행끼리 (행 수 × 최대 길이)가 VERIFY_BLOCK을 넘지 않게 묶는다
+            e = s + 1
+            while e < len(order) and (e - s + 1) * max(int(self._lens[rows[order[e]]]), 1) <= VERIFY_BLOCK:
+                e += 1
+            sel = order[s:e]
+            r = rows[sel]
+            lens = self._lens[r]
+            L = int(lens.max()) if len(lens) else 0
+            steps = np.arange(L)
+            idx = self._start[r][None, :] + steps[:, None]
+            M = np.where(steps[:, None] < lens[None, :], self._ids[np.minimum(idx, max(total - 1, 0))], pad)
+            # 행은 길이 오름차순이므로 j번째 글자가 있는 행은 뒤쪽 [act:]
+            C = len(r)
+            pv = np.full(C, full, dtype=np.uint64)
+            mv = np.zeros(C, dtype=np.uint64)
+            score = np.full(C, m, dtype=np.int32)
+            best = dist[sel].copy()
+            bend = end[sel].copy()
+            for j in range(L):
+                act = int(np.searchsorted(lens, j, side="right"))
+                eq = table[M[j, act:]]
+                Pv, Mv = pv[act:], mv[act:]
+                xv = eq | Mv
+                xh = (((eq & Pv) + Pv) ^ Pv) | eq
+                ph = (Mv | ~(xh | Pv)) & full
+                mh = Pv & xh
+                sc = score[act:]
+                sc += ((ph >> shift) & one).astype(np.int32)
+                sc -= ((mh >> shift) & one).astype(np.int32)
+                ph = (ph << one) & full
+                mh = (mh << one) & full
+                pv[act:] = (mh | ~(xv | ph)) & full
+                mv[act:] = ph & xv
+                better = sc < best[act:]
+                if better.any():
+                    b = np.flatnonzero(better) + act
+                    best[b] = sc[better]
+                    bend[b] = j + 1
+            dist[sel], end[sel] = best, bend
+            s = e
+        return dist, end
+
+    def search(self, keywords: Sequence[str], ratio: float = MAX_EDIT_RATIO,
+               variant_rows: int = VARIANT_ROWS) -> FuzzyHits:
+        """모든 키워드를 (오타 허용으로) 포함하는 행 (AND 조건). 정확히 일치하는 행(거리 0)이 앞에 온다.
+        실제로 찾은 표기(variants)는 가까운 순 상위 variant_rows 행에서만 모은다."""
+        pats = [(kw, to_jamo(kw)) for kw in dict.fromkeys(k.strip().lower() for k in keywords) if kw]
+        if not pats:
+            return FuzzyHits(self._all[:0], np.empty(0, dtype=np.int32))
+        limits = [max_distance(len(p), self.n, ratio) for _, p in pats]
+        cand = None
+        for (_, p), k in sorted(zip(pats, limits), key=lambda t: -len(t[0][1])):
+            c = self.candidates(p, k)
+            cand = c if cand is None else np.intersect1d(cand, c, assume_unique=True)
+            if not len(cand):
+                break
+
+        total = np.zeros(len(cand), dtype=np.int32)
+        ends: List[Tuple[np.ndarray, np.ndarray]] = []  # 키워드별 (거리, 자모 끝 위치)
+        for (_, p), k in zip(pats, limits):
+            d, e = self.verify(p, cand, k)
+            ok = d <= k
+            cand, total = cand[ok], total[ok] + d[ok]
+            ends = [(pd[ok], pe[ok]) for pd, pe in ends] + [(d[ok], e[ok])]
+        order = np.lexsort((cand, total))
+        cand, total = cand[order], total[order]
+        ends = [(d[order], e[order]) for d, e in ends]
+
+        variants: Dict[str, Counter] = {kw: Counter() for kw, _ in pats}
+        for r in range(min(len(cand), variant_rows)):
+            i = int(cand[r])
+            jamo = offs = None
+            for (kw, p), (d, e) in zip(pats, ends):
+                d, e = int(d[r]), int(e[r])
+                if d == 0:
+                    variants[kw][kw] += 1
+                    continue
+                if offs is None:
+                    jamo, offs = _jamo_offsets(self.texts[i])
+                s = _match_start(p, jamo, e, d)
+                variants[kw][self.texts[i][offs[s]:offs[e - 1] + 1]] += 1
+        return FuzzyHits(cand.astype(np.int32), total, variants)
+
+    def search_frame(self, df, keywords: Sequence[str], ratio: float = MAX_EDIT_RATIO):
+        """`search` 결과를 (DataFrame 부분집합, FuzzyHits)로 반환 (가까운 순)."""
+        hits = self.search(keywords, ratio)
+        return df.iloc[hits.positions], hits
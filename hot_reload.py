@@ -0,0 +1,225 @@
+# hot_reload.py
+"""색인/데이터 파일 핫 리로드 (재시작 없이 새 버전으로 교체).
+
+VersionedHandle은 loader()가 만든 객체(검색기, 사례 테이블 …)를 버전 단위로 들고 있다.
+
+- 감시 파일의 (크기, mtime)을 주기적으로 보고, 바뀐 파일만 내용 해시(sha1)를 다시 계산한다.
+  해시까지 같으면(touch, 같은 내용 재배포) 다시 읽지 않는다.
+- 바뀌었으면 백그라운드 스레드에서 새 버전을 읽는다. 읽는 동안 파일이 또 바뀌었으면 버리고 다음 확인 때
+  다시 시도한다. 읽기에 실패하면(쓰는 중인 pickle 등) 그 manifest를 기억해 두고, 파일이 다시 바뀌거나
+  재시도 간격(RETRY_MIN부터 두 배씩, RETRY_MAX까지)이 지나기 전에는 다시 읽지 않는다.
+  그동안 질의는 옛 버전이 처리한다. 해시 계산은 잠금 밖에서 하므로 acquire()를 막지 않는다.
+- 다 읽으면 잠금 안에서 현재 버전 포인터만 바꾼다. acquire()로 빌린 Lease가 옛 버전을 잡고 있는 동안은
+  그대로 두고, 마지막 Lease가 반납되면 옛 버전을 놓는다(close()가 있으면 호출).
+
+Lease는 with 블록이나 try/finally로 반납한다. 반납을 빠뜨린 Lease는 가비지 컬렉션될 때 반납된다(예비 장치).
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from term_stats import file_sha1
+
+log = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 5.0  # 감시 스레드가 없을 때 acquire()가 감시 파일을 확인하는 최소 간격 (초)
+RETRY_MIN = 30.0      # 읽기에 실패한 같은 파일 내용을 다시 시도하기까지의 첫 간격 (초)
+RETRY_MAX = 600.0
+
+Manifest = Dict[str, Tuple[int, int, str]]  # 경로 → (크기, mtime_ns, sha1)
+
+
+def file_manifest(paths: Iterable, previous: Optional[Manifest] = None) -> Manifest:
+    """감시 파일 manifest. previous와 (크기, mtime)이 같은 파일은 해시를 다시 계산하지 않는다."""
+    out: Manifest = {}
+    for p in paths:
+        p = Path(p)
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        key = str(p)
+        old = (previous or {}).get(key)
+        if old is not None and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            out[key] = old
+        else:
+            out[key] = (st.st_size, st.st_mtime_ns, file_sha1(p))
+    return out
+
+
+def _content(m: Manifest) -> Dict[str, Tuple[int, str]]:
+    return {k: (size, digest) for k, (size, _, digest) in m.items()}
+
+
+class _Version:
+    def __init__(self, number: int, obj: Any, manifest: Manifest):
+        self.number = number
+        self.obj = obj
+        self.manifest = manifest
+        self.loaded_at = time.time()
+        self.refs = 0
+        self.retired = False
+
+
+class Lease:
+    """빌린 버전. obj는 반납 전까지 유효하다."""
+    def __init__(self, handle: "VersionedHandle", version: _Version):
+        self.obj = version.obj
+        self.version = version.number
+        self._finalizer = weakref.finalize(self, handle._release, version)
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self.obj
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class VersionedHandle:
+    """loader: () → 객체, watch: () → 감시할 파일 경로들 (새로 생기는 세그먼트도 잡도록 매번 호출).
+    interval을 주면 데몬 스레드만 그 간격으로 확인하고, 아니면 acquire()가 CHECK_INTERVAL마다 확인한다."""
+    def __init__(self, loader: Callable[[], Any], watch: Callable[[], Iterable], interval: Optional[float] = None,
+                 on_swap: Optional[Callable[[Any, Any], None]] = None):
+        self.loader = loader
+        self.watch = watch
+        self.on_swap = on_swap
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._loading = False  # 확인/읽기 중 (한 번에 하나)
+        self._checked = time.monotonic()
+        self._interval = interval
+        self._failed: Optional[Dict[str, Tuple[int, str]]] = None  # 마지막으로 읽기에 실패한 파일 내용
+        self._retry_at = 0.0
+        self._retry_delay = RETRY_MIN
+        manifest = file_manifest(watch())
+        self._seen = manifest  # 마지막으로 본 manifest (해시 재계산 생략용)
+        self._current = _Version(1, loader(), manifest)
+        self._stop = threading.Event()
+        if interval:
+            t = threading.Thread(target=self._watch_loop, args=(interval,), name="hot-reload", daemon=True)
+            t.start()
+
+    # ----- 조회 -----
+    @property
+    def version(self) -> int:
+        return self._current.number
+
+    def acquire(self) -> Lease:
+        """현재 버전을 빌린다. 교체되더라도 반납 전까지 같은 객체가 유지된다."""
+        if self._interval is None and time.monotonic() - self._checked >= CHECK_INTERVAL:
+            self.check()
+        with self._lock:
+            v = self._current
+            v.refs += 1
+            return Lease(self, v)
+
+    def status(self) -> Dict[str, Any]:
+        v = self._current
+        return {"version": v.number, "loaded_at": v.loaded_at, "loading": self._loading,
+                "files": len(v.manifest), "error": self.error}
+
+    # ----- 교체 -----
+    def check(self, wait: bool = False) -> bool:
+        """감시 파일이 바뀌었으면 새 버전 읽기를 시작한다 (wait=True면 끝날 때까지 기다림). 시작했으면 True."""
+        self._checked = time.monotonic()
+        with self._lock:
+            if self._loading:
+                return False
+            self._loading = True
+        t = None
+        try:
+            # 바뀐 파일의 해시 계산은 잠금 밖에서 (_loading이 다른 확인을 막는다)
+            manifest = file_manifest(self.watch(), self._seen)
+            self._seen = manifest
+            content = _content(manifest)
+            if content == _content(self._current.manifest):
+                self.error, self._failed = None, None  # 실패한 배포가 되돌려짐
+                return False
+            if content == self._failed and time.monotonic() < self._retry_at:
+                return False
+            t = threading.Thread(target=self._load, args=(manifest,), name="hot-reload-load", daemon=True)
+            t.start()
+        finally:
+            if t is None:
+                self._loading = False
+        if wait:
+            t.join()
+        return True
+
+    def _load(self, manifest: Manifest):
+        try:
+            obj = self.loader()
+            after = file_manifest(self.watch(), manifest)
+            if _content(after) != _content(manifest):
+                # 읽는 중에 파일이 또 바뀜 → 다음 확인 때 다시
+                log.info("index files changed while loading; retrying later")
+                self._close(obj)
+                return
+            with self._lock:
+                old = self._current
+                self._current = _Version(old.number + 1, obj, after)
+                old.retired = True
+                drop = old.refs == 0
+            self.error = None
+            self._failed, self._retry_delay = None, RETRY_MIN
+            log.info("hot reload: version %d → %d", old.number, old.number + 1)
+            if self.on_swap is not None:
+                self.on_swap(old.obj, obj)
+            if drop:
+                self._drop(old)
+        except Exception as e:  # 옛 버전으로 계속 서비스
+            self.error = f"{type(e).__name__}: {e}"
+            content = _content(manifest)
+            if content == self._failed:
+                self._retry_delay = min(self._retry_delay * 2, RETRY_MAX)
+            else:
+                self._failed, self._retry_delay = content, RETRY_MIN
+            self._retry_at = time.monotonic() + self._retry_delay
+            log.warning("hot reload failed (retry in %.0fs): %s", self._retry_delay, self.error)
+        finally:
+            self._loading = False
+
+    def _release(self, v: _Version):
+        with self._lock:
+            v.refs -= 1
+            drop = v.retired and v.refs == 0
+        if drop:
+            self._drop(v)
+
+    def _drop(self, v: _Version):
+        obj, v.obj = v.obj, None
+        if obj is not None:
+            self._close(obj)
+
+    @staticmethod
+    def _close(obj):
+        close = getattr(obj, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                log.warning("closing old version failed: %s", e)
+
+    def _watch_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.warning("hot reload check failed: %s", e)
+
+    def close(self):
+        """감시를 멈추고 현재 버전을 놓는다."""
+        self._stop.set()
+        with self._lock:
+            v = self._current
+            v.retired = True
+            drop = v.refs == 0
+        if drop:
+            self._drop(v)
@@ -0,0 +1,113 @@
+# keyword_index.py
+"""사례 테이블용 키워드 역색인 (문자 n-gram posting list).
+
+V1.2 조회앱의 `str.lower().str.contains(...)` 부분문자열 검색과 같은 결과를 내되,
+데이터 로드 시 한 번만 색인하고 질의는 posting list 교집합 + 후보 검증으로 처리한다.
+"""
+from __future__ import annotations
+import re
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from term_stats import STOP_WORDS, TermStats  # noqa: F401 (STOP_WORDS 재노출)
+
+# V1.2 앱이 검색 대상으로 이어 붙이는 컬럼 (순서 유지)
+TARGET_COLUMNS = ("대분류", "소분류", "사실관계", "해설")
+
+# pandas str.contains(regex=True)에서 의미가 달라지는 문자
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def build_target_text(df, columns: Sequence[str] = TARGET_COLUMNS):
+    """검색 대상 텍스트 Series (기존 앱과 동일하게 astype(str) 후 공백으로 연결)."""
+    target = df[columns[0]].astype(str)
+    for col in columns[1:]:
+        target = target + " " + df[col].astype(str)
+    return target
+
+
+def extract_keywords(text_series, top_n=25, stopwords=None):
+    """대상 텍스트에서 빈도 상위 한글 단어(2글자 이상)를 추천 키워드로 추출.
+    색인과 함께 저장된 통계가 있으면 term_stats.TermStats.load(...).top()을 쓰는 편이 빠르다."""
+    return TermStats(stopwords).add(text_series.dropna().astype(str).tolist()).top(top_n)
+
+
+def split_keywords(keywords_string: str) -> List[str]:
+    """쉼표로 구분된 키워드 문자열을 리스트로 변환"""
+    return [k.strip() for k in keywords_string.split(",") if k.strip()]
+
+
+def _grams(text: str, n: int) -> set:
+    if len(text) < n:
+        return set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class KeywordIndex:
+    """소문자화한 대상 텍스트의 문자 1-gram/2-gram posting list.
+
+    - 1글자 키워드는 unigram posting, 2글자 이상은 bigram posting 교집합으로 후보를 좁힌다.
+    - bigram 포함이 곧 부분문자열 포함은 아니므로 후보는 `in` 연산으로 다시 검증한다.
+    - 정규식 메타문자가 든 키워드는 pandas와 같은 결과를 위해 `re.search` 전수 검사로 처리한다.
+    """
+
+    def __init__(self, texts: Iterable[str]):
+        self.texts: List[str] = [str(t).lower() for t in texts]
+        uni: Dict[str, List[int]] = {}
+        bi: Dict[str, List[int]] = {}
+        for i, t in enumerate(self.texts):
+            for g in set(t):
+                uni.setdefault(g, []).append(i)
+            for g in _grams(t, 2):
+                bi.setdefault(g, []).append(i)
+        # 문서 번호 순으로 추가했으므로 이미 정렬되어 있음
+        self._uni = {g: np.asarray(p, dtype=np.int32) for g, p in uni.items()}
+        self._bi = {g: np.asarray(p, dtype=np.int32) for g, p in bi.items()}
+        self._all = np.arange(len(self.texts), dtype=np.int32)
+
+    @classmethod
+    def from_frame(cls, df, columns: Sequence[str] = TARGET_COLUMNS) -> "KeywordIndex":
+        return cls(build_target_text(df, columns).tolist())
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _postings(self, keyword: str) -> List[np.ndarray]:
+        if len(keyword) == 1:
+            grams, table = {keyword}, self._uni
+        else:
+            grams, table = _grams(keyword, 2), self._bi
+        empty = np.empty(0, dtype=np.int32)
+        return [table.get(g, empty) for g in grams]
+
+    def search(self, keywords: Sequence[str]) -> np.ndarray:
+        """모든 키워드를 포함하는 행의 위치(오름차순)를 반환 (AND 조건)."""
+        kws = [k.lower() for k in keywords]
+        if not kws:
+            return self._all[:0]
+        literal = [k for k in kws if not (_REGEX_META & set(k))]
+        patterns = [re.compile(k) for k in kws if _REGEX_META & set(k)]
+
+        postings = [p for k in literal for p in self._postings(k)]
+        if postings:
+            postings.sort(key=len)
+            cand = postings[0]
+            for p in postings[1:]:
+                if not len(cand):
+                    break
+                cand = np.intersect1d(cand, p, assume_unique=True)
+        else:
+            cand = self._all
+
+        texts = self.texts
+        keep = [
+            i for i in cand.tolist()
+            if all(k in texts[i] for k in literal)
+            and all(p.search(texts[i]) for p in patterns)
+        ]
+        return np.asarray(keep, dtype=np.int32)
+
+    def search_frame(self, df, keywords: Sequence[str]):
+        """`search` 결과를 DataFrame 부분집합으로 반환 (원래 행 순서/인덱스 유지)."""
+        return df.iloc[self.search(keywords)]
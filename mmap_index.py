@@ -0,0 +1,465 @@
+# mmap_index.py
+"""pickle 없는 메모리 매핑 색인 포맷.
+
+레이아웃 (<outdir>/):
+    meta.json                     포맷 버전, 문서/어휘 수, 분석기 설정, 행 필드 목록
+    vocab.bin / vocab.off.npy     UTF-8 어휘를 바이트 순으로 정렬해 이어 붙인 blob + 오프셋
+                                  (meta.json의 vocab_dir이 있으면 vocab.*/idf.npy는 그 디렉터리에서 읽음)
+    vocab.col.npy                 정렬된 어휘 i번째의 열 번호
+    idf.npy                       열 번호 순 IDF
+    X.data.npy / X.indices.npy / X.indptr.npy   L2 정규화된 CSR 문서 행렬
+    XT.ptr.npy / XT.docs.npy / XT.data.npy      같은 행렬의 열(어휘)별 posting (없으면 열 때 계산)
+    rows/<field>.bin, rows/<field>.off.npy      사례 행의 컬럼별 UTF-8 blob + 오프셋
+    minhash.npy                   행별 MinHash 서명 (컨텍스트 패킹 중복 판정, 없으면 열 때 계산)
+
+모든 .npy는 np.load(mmap_mode="r")로 열기 때문에 여러 프로세스가 OS 페이지 캐시를 공유하고,
+어휘 사전을 dict로 복원하지 않고 이진 탐색하므로 시작 비용이 거의 없다.
+질의는 query_runtime.py(NumPy만 사용)로 변환·점수화하므로 sklearn/scipy를 불러오지 않는다.
+
+변환 / sklearn 경로와 비트 단위 일치 검증:
+    python mmap_index.py --indexdir . --outdir ./index_mmap
+    python mmap_index.py --indexdir . --verify
+"""
+import argparse, json, os
+from pathlib import Path
+import numpy as np
+from tracing import span
+from query_runtime import SparseRows, TermMatrix, build_analyzer, term_major, transform
+
+FORMAT = "tfidf-mmap"
+FORMAT_VERSION = 1
+DEFAULT_MMAP_DIR = "index_mmap"
+MINHASH_FILE = "minhash.npy"  # 컨텍스트 패킹용 행별 MinHash 서명
+TERM_CACHE_SIZE = 200_000  # MmapSearcher 질의어 → 열 번호 캐시 항목 수 상한
+
+# 배포된 TfidfVectorizer에서 질의 분석에 필요한 설정
+ANALYZER_PARAMS = (
+    "analyzer", "lowercase", "token_pattern", "ngram_range", "strip_accents",
+    "stop_words", "binary", "norm", "use_idf", "smooth_idf", "sublinear_tf",
+)
+
+
+def _check_idf(vec):
+    """구버전 sklearn으로 저장된 pickle은 IDF를 대각 행렬(_idf_diag)로만 가지고 있어, 새 sklearn에서 읽으면
+    transform()이 IDF를 곱하지 않는다 (질의 벡터가 색인을 만들 때와 다름). 변환/검증 전에 거부한다."""
+    tfidf = getattr(vec, "_tfidf", None)
+    if tfidf is None or not getattr(tfidf, "use_idf", False) or not hasattr(tfidf, "_idf_diag"):
+        return
+    try:
+        tfidf.idf_
+    except AttributeError:
+        import sklearn
+        raise ValueError(f"artifacts.pkl was pickled by an older scikit-learn (IDF stored only as _idf_diag), "
+                         f"which scikit-learn {sklearn.__version__} ignores in transform(); install the version "
+                         f"pinned in requirements.txt or rebuild the index with build_index.py") from None
+
+
+def _idf(vec) -> np.ndarray:
+    return np.asarray(vec.idf_, dtype=np.float64)
+
+
+def _write_strings(values, path_bin: Path, path_off: Path):
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    with open(path_bin, "wb") as f:
+        pos = 0
+        for i, v in enumerate(values):
+            b = v.encode("utf-8")
+            f.write(b)
+            pos += len(b)
+            offsets[i + 1] = pos
+    np.save(path_off, offsets)
+
+
+def _cell(v) -> str:
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    return str(v)
+
+
+def _row_signatures(rows):
+    from context_pack import minhash_rows, row_text
+    return minhash_rows([row_text(rows[i]) for i in range(len(rows))])
+
+
+def export_index(vec, X, rows, outdir, normalized=False):
+    """학습된 TfidfVectorizer, 문서 행렬, rows를 mmap 레이아웃으로 저장.
+    normalized=True면 이미 L2 정규화된 행렬로 보고 그대로 쓴다 (다시 정규화하면 마지막 비트가 달라짐)."""
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    cfg = export_vocab(vec, outdir)
+    return export_docs(X, rows, outdir, cfg, normalized=normalized)
+
+
+def export_vocab(vec, outdir) -> dict:
+    """분석기 설정 + 어휘/IDF 파일을 저장하고 meta.json에 넣을 analyzer 설정을 반환."""
+    from tokenizer import KoreanTokenizer
+    _check_idf(vec)
+    outdir = Path(outdir)
+    cfg = {k: getattr(vec, k) for k in ANALYZER_PARAMS}
+    if isinstance(cfg["analyzer"], KoreanTokenizer):
+        cfg["tokenizer"] = cfg["analyzer"].config()
+        cfg["analyzer"] = "korean"
+    elif callable(cfg["analyzer"]):
+        raise ValueError("callable analyzer cannot be exported to mmap format")
+    cfg["ngram_range"] = list(cfg["ngram_range"])
+    if cfg["stop_words"] is not None and not isinstance(cfg["stop_words"], str):
+        cfg["stop_words"] = sorted(cfg["stop_words"])
+
+    terms = sorted(vec.vocabulary_.items(), key=lambda kv: kv[0].encode("utf-8"))
+    _write_strings([t for t, _ in terms], outdir / "vocab.bin", outdir / "vocab.off.npy")
+    np.save(outdir / "vocab.col.npy", np.asarray([c for _, c in terms], dtype=np.int32))
+    np.save(outdir / "idf.npy", _idf(vec))
+    return cfg
+
+
+def export_docs(X, rows, outdir, cfg, normalized=False, vocab_dir=None):
+    """문서 행렬/행/서명과 meta.json 저장. vocab_dir을 주면 어휘·IDF는 그 디렉터리(상대 경로) 것을 쓴다
+    (샤드들이 전역 어휘/IDF 하나를 공유할 때)."""
+    import scipy.sparse as sp
+    from sklearn.preprocessing import normalize
+
+    outdir = Path(outdir)
+    (outdir / "rows").mkdir(parents=True, exist_ok=True)
+    X = sp.csr_matrix(X, dtype=np.float64, copy=True)
+    if not normalized:
+        X = normalize(X, norm="l2").tocsr()
+    X.sort_indices()
+    np.save(outdir / "X.data.npy", X.data)
+    np.save(outdir / "X.indices.npy", X.indices.astype(np.int32))
+    np.save(outdir / "X.indptr.npy", X.indptr.astype(np.int64))
+    ptr, docs, data = term_major(X.data, X.indices, X.indptr, X.shape[1])
+    np.save(outdir / "XT.ptr.npy", ptr)
+    np.save(outdir / "XT.docs.npy", docs)
+    np.save(outdir / "XT.data.npy", data)
+
+    np.save(outdir / MINHASH_FILE, _row_signatures(rows))
+
+    fields = []
+    for r in rows:
+        for k in r:
+            if k not in fields:
+                fields.append(k)
+    for k in fields:
+        _write_strings([_cell(r.get(k)) for r in rows],
+                       outdir / "rows" / f"{k}.bin", outdir / "rows" / f"{k}.off.npy")
+
+    meta = {
+        "format": FORMAT, "version": FORMAT_VERSION,
+        "n_docs": int(X.shape[0]), "n_terms": int(X.shape[1]),
+        "analyzer": cfg, "row_fields": fields,
+    }
+    if vocab_dir is not None:
+        meta["vocab_dir"] = str(vocab_dir)
+    write_json(outdir / "meta.json", meta)  # meta.json이 마지막에 생겨야 완성된 색인
+    return meta
+
+
+def write_json(path: Path, obj):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def convert_artifacts(index_dir=".", outdir=None):
+    """기존 artifacts.pkl (+ segments)을 mmap 레이아웃으로 변환."""
+    from search_tfidf import TfidfSearcher
+    s = TfidfSearcher(index_dir)
+    if s.backend != "tfidf":
+        raise ValueError("Only TF-IDF indexes can be converted to the mmap layout.")
+    # TfidfSearcher.X는 이미 정규화되어 있으므로 비트 그대로 저장 (검색 점수가 sklearn 경로와 같도록)
+    return export_index(s.vec, s.X, s.rows, outdir or Path(index_dir) / DEFAULT_MMAP_DIR, normalized=True)
+
+
+def vocab_completer(index: "MmapIndex", df, rows):
+    """mmap 어휘(바이트 순 정렬)와 열 번호 순 문서 빈도로 autocomplete.Completer 생성."""
+    from autocomplete import Completer
+    terms = [index.vocab[i] for i in range(len(index.vocab))]
+    return Completer.from_rows(rows, terms, np.asarray(df)[index.vocab_col])
+
+
+class StringColumn:
+    """blob + 오프셋으로 저장된 문자열 컬럼 (mmap)."""
+    def __init__(self, path_bin: Path, path_off: Path):
+        # np.memmap 서브클래스는 인덱싱마다 부가 비용이 있어 같은 매핑을 일반 ndarray 뷰로 쓴다
+        self.off = np.load(path_off, mmap_mode="r").view(np.ndarray)
+        size = int(self.off[-1]) if len(self.off) else 0
+        self.blob = np.memmap(path_bin, dtype=np.uint8, mode="r").view(np.ndarray) if size else np.empty(0, np.uint8)
+
+    def __len__(self):
+        return len(self.off) - 1
+
+    def raw(self, i: int) -> bytes:
+        return self.blob[int(self.off[i]):int(self.off[i + 1])].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode("utf-8")
+
+
+class RowStore:
+    """rows 리스트처럼 인덱싱되는 컬럼형 사례 저장소. row[i]는 dict로 복원된다."""
+    def __init__(self, root: Path, fields):
+        self.fields = list(fields)
+        self.cols = {k: StringColumn(root / f"{k}.bin", root / f"{k}.off.npy") for k in self.fields}
+
+    def __len__(self):
+        return len(self.cols[self.fields[0]]) if self.fields else 0
+
+    def __getitem__(self, i: int) -> dict:
+        return {k: c[i] for k, c in self.cols.items()}
+
+    def field(self, i: int, name: str, default=""):
+        col = self.cols.get(name)
+        return col[i] if col is not None else default
+
+
+class MmapIndex:
+    """mmap 레이아웃을 여는 읽기 전용 핸들."""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        if self.meta.get("format") != FORMAT:
+            raise ValueError(f"Not a {FORMAT} index: {self.path}")
+        if self.meta.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported index version: {self.meta.get('version')}")
+        self.config = self.meta["analyzer"]
+        self.n_docs = self.meta["n_docs"]
+        self.n_terms = self.meta["n_terms"]
+        # 샤드는 전역 어휘/IDF를 상위 디렉터리에서 공유한다 (meta["vocab_dir"])
+        vdir = self.path / self.meta.get("vocab_dir", ".")
+        self.vocab = StringColumn(vdir / "vocab.bin", vdir / "vocab.off.npy")
+        self.vocab_col = np.load(vdir / "vocab.col.npy", mmap_mode="r")
+        self.idf = np.load(vdir / "idf.npy", mmap_mode="r")
+        self.data = np.load(self.path / "X.data.npy", mmap_mode="r")
+        self.indices = np.load(self.path / "X.indices.npy", mmap_mode="r")
+        self.indptr = np.load(self.path / "X.indptr.npy", mmap_mode="r")
+        self.rows = RowStore(self.path / "rows", self.meta["row_fields"])
+
+    def term_id(self, term: str) -> int:
+        """어휘의 열 번호 (없으면 -1). 정렬된 blob에서 이진 탐색."""
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self.vocab)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.vocab.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.vocab) and self.vocab.raw(lo) == key:
+            return int(self.vocab_col[lo])
+        return -1
+
+    def matrix(self):
+        import scipy.sparse as sp
+        return sp.csr_matrix((self.data, self.indices, self.indptr),
+                             shape=(self.n_docs, self.n_terms), copy=False)
+
+    def term_matrix(self) -> TermMatrix:
+        """열별 posting. 예전에 변환된 색인(XT.* 없음)은 CSR에서 한 번 계산한다."""
+        if (self.path / "XT.ptr.npy").exists():
+            load = lambda name: np.load(self.path / name, mmap_mode="r")
+            return TermMatrix(load("XT.ptr.npy"), load("XT.docs.npy"), load("XT.data.npy"), self.n_docs)
+        ptr, docs, data = term_major(self.data, self.indices, self.indptr, self.n_terms)
+        return TermMatrix(ptr, docs, data, self.n_docs)
+
+
+class MmapSearcher:
+    """TfidfSearcher와 같은 query/query_batch 인터페이스를 mmap 색인 위에서 제공."""
+    def __init__(self, index_dir: str = DEFAULT_MMAP_DIR):
+        with span("searcher.load"):
+            self._load(index_dir)
+
+    def _load(self, index_dir):
+        self.index = MmapIndex(index_dir)
+        self._analyze = build_analyzer(self.index.config)
+        self.rows = self.index.rows
+        self.T = self.index.term_matrix()
+        self._terms = {}  # 질의어 → 열 번호 (이진 탐색 결과 캐시)
+        from search_tfidf import index_version
+        self.version = index_version([self.index.path / "meta.json", self.index.path / "X.data.npy"])
+
+    def transform(self, texts) -> SparseRows:
+        """질의 텍스트 → L2 정규화된 TF-IDF 행 (TfidfVectorizer.transform과 비트 단위로 같음)."""
+        with span("search.transform"):
+            return transform(list(texts), self._analyze, self._term_id, self.index.config,
+                             self.index.idf, self.index.n_terms)
+
+    def _term_id(self, term: str) -> int:
+        j = self._terms.get(term)
+        if j is None:
+            if len(self._terms) >= TERM_CACHE_SIZE:
+                self._terms.clear()
+            j = self._terms[term] = self.index.term_id(term)
+        return j
+
+    def format_row(self, rank: int, i: int, score: float, hl=None) -> dict:
+        """i번째 행의 결과 dict (TfidfSearcher.format_row와 같은 필드)."""
+        f = self.rows.field
+        out = {
+            "rank": rank,
+            "score": round(score, 3),
+            "id": f(i, "id"),
+            "law": f(i, "law"),
+            "article": f(i, "article"),
+            "penalty": f(i, "penalty"),
+            "fact": f(i, "fact")[:180],
+            "source_url": f(i, "source_url"),
+            "clause": f(i, "clause"),
+            "doc": int(i),
+        }
+        if hl is not None:
+            out["snippet"] = hl.best((f(i, "fact"), f(i, "rationale"))).plain()
+        return out
+
+    @property
+    def facets(self):
+        if getattr(self, "_facets", None) is None:
+            from facets import FacetIndex
+            self._facets = FacetIndex.from_rows(self.rows)
+        return self._facets
+
+    @property
+    def articles(self):
+        if getattr(self, "_articles", None) is None:
+            from statutes import ArticleIndex
+            self._articles = ArticleIndex.from_rows(self.rows)
+        return self._articles
+
+    @property
+    def signatures(self):
+        """행별 MinHash 서명. 변환 때 저장한 minhash.npy가 있으면 mmap으로 연다."""
+        if getattr(self, "_signatures", None) is None:
+            path = self.index.path / MINHASH_FILE
+            if path.exists():
+                self._signatures = np.load(path, mmap_mode="r")
+            else:
+                self._signatures = _row_signatures(self.rows)
+        return self._signatures
+
+    @property
+    def completer(self):
+        """검색어 자동 완성 (어휘 + 소분류/법조항, 문서 빈도 가중치, 첫 사용 때 한 번 생성)."""
+        if getattr(self, "_completer", None) is None:
+            self._completer = vocab_completer(self.index, np.diff(self.T.ptr), self.rows)
+        return self._completer
+
+    def _allowed(self, filters):
+        """TfidfSearcher._allowed와 같은 facet/조문 필터 마스크."""
+        if not filters or not any(filters.values()):
+            return None
+        with span("search.facets"):
+            filters = dict(filters)
+            article = filters.pop("article", None)
+            allowed = self.facets.to_bool(self.facets.mask(filters))
+            if article:
+                allowed &= self.articles.mask(article)
+            return allowed
+
+    def query(self, text: str, topk: int = 10, filters=None):
+        return self.query_batch([text], topk, filters)[0]
+
+    def query_batch(self, texts, topk: int = 10, filters=None):
+        from search_tfidf import topk_indices, BATCH_CHUNK
+        from snippets import Highlighter
+        texts = list(texts)
+        if not texts:
+            return []
+        pos = None
+        allowed = self._allowed(filters)
+        if allowed is not None:
+            pos = np.flatnonzero(allowed)
+            if not len(pos):
+                return [[] for _ in texts]
+        Q = self.transform(texts)
+        out = []
+        for s in range(0, len(texts), BATCH_CHUNK):
+            with span("search.score"):
+                scores = self.T.scores(Q[s:s + BATCH_CHUNK])
+                if pos is not None:
+                    scores = scores[:, pos]  # 허용된 행만 남긴 뒤 top-k
+                top = topk_indices(scores, topk)
+            for qi in range(top.shape[0]):
+                hl = Highlighter(texts[s + qi])
+                out.append([
+                    self.format_row(rank, i if pos is None else int(pos[i]), float(scores[qi, i]), hl)
+                    for rank, i in enumerate(top[qi], start=1)
+                ])
+        return out
+
+
+def open_searcher(index_dir: str = "."):
+    """<index_dir>/index_shards 가 있으면 ShardedSearcher, index_mmap 이 있으면 MmapSearcher,
+    둘 다 없으면 기존 TfidfSearcher."""
+    from shard_index import DEFAULT_SHARD_DIR, MANIFEST, ShardedSearcher
+    shards = Path(index_dir) / DEFAULT_SHARD_DIR
+    if (shards / MANIFEST).exists():
+        return ShardedSearcher(shards)
+    mm = Path(index_dir) / DEFAULT_MMAP_DIR
+    if (mm / "meta.json").exists():
+        return MmapSearcher(mm)
+    from search_tfidf import TfidfSearcher
+    return TfidfSearcher(index_dir)
+
+
+def searcher_files(index_dir: str = ".") -> list:
+    """open_searcher가 읽는 색인 파일 목록 (hot_reload.VersionedHandle 감시용).
+    meta.json/shards.json은 마지막에 쓰이므로 완성 표시로, X.data.npy는 같은 크기 재생성도 잡도록 넣는다."""
+    from search_tfidf import SEGMENT_DIR
+    from shard_index import DEFAULT_SHARD_DIR, MANIFEST
+    root = Path(index_dir)
+    shards, mm = root / DEFAULT_SHARD_DIR, root / DEFAULT_MMAP_DIR
+    return [root / "artifacts.pkl", *sorted((root / SEGMENT_DIR).glob("seg-*.pkl")),
+            mm / "meta.json", mm / "X.data.npy",
+            shards / MANIFEST, *sorted(shards.glob("shard-*/X.data.npy"))]
+
+
+def _bits(a) -> np.ndarray:
+    return np.ascontiguousarray(a, dtype=np.float64).view(np.int64)
+
+
+def verify(index_dir=".", mmap_dir=None, queries=None, limit=1000):
+    """sklearn 경로(TfidfSearcher: vec.transform, Q @ X.T)와 NumPy 런타임의 질의 벡터·점수를 비트 단위로 비교.
+    queries가 없으면 앞 limit개 사례의 사실관계/해설을 질의로 쓴다. 반환: (질의 수, 불일치 질의 수)."""
+    from search_tfidf import TfidfSearcher, BATCH_CHUNK
+    ref = TfidfSearcher(index_dir)
+    _check_idf(ref.vec)
+    mm = MmapSearcher(mmap_dir or Path(index_dir) / DEFAULT_MMAP_DIR)
+    if len(ref.rows) != len(mm.rows):
+        raise ValueError(f"row count differs: {len(ref.rows)} vs {len(mm.rows)} (re-run conversion)")
+    if queries is None:
+        queries = [_cell(r.get(k)) for r in ref.rows[:limit] for k in ("fact", "rationale")]
+    bad = 0
+    for s in range(0, len(queries), BATCH_CHUNK):
+        chunk = queries[s:s + BATCH_CHUNK]
+        A = ref.transform(chunk).tocsr()
+        A.sort_indices()
+        B = mm.transform(chunk)
+        sa, sb = (A @ ref.X.T).toarray(), mm.T.scores(B)
+        for i in range(len(chunk)):
+            (ca, va), (cb, vb) = (A.indices[A.indptr[i]:A.indptr[i + 1]], A.data[A.indptr[i]:A.indptr[i + 1]]), B.row(i)
+            if not (np.array_equal(ca, cb) and np.array_equal(_bits(va), _bits(vb))
+                    and np.array_equal(_bits(sa[i]), _bits(sb[i]))):
+                bad += 1
+    return len(queries), bad
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--indexdir", default=".", help="artifacts.pkl 위치")
+    ap.add_argument("--outdir", default=None, help=f"기본값: <indexdir>/{DEFAULT_MMAP_DIR}")
+    ap.add_argument("--verify", action="store_true",
+                    help="변환 대신 sklearn 경로와 NumPy 런타임의 질의 벡터·점수가 비트 단위로 같은지 검사")
+    ap.add_argument("--queries", default=None, help="--verify 질의 파일 (한 줄에 하나, 기본: 사례 본문)")
+    args = ap.parse_args()
+    if args.verify:
+        queries = None
+        if args.queries:
+            with open(args.queries, encoding="utf-8") as f:
+                queries = [l.rstrip("\n") for l in f if l.strip()]
+        n, bad = verify(args.indexdir, args.outdir, queries)
+        print(f"verified {n} queries: {bad} mismatches")
+        raise SystemExit(1 if bad else 0)
+    meta = convert_artifacts(args.indexdir, args.outdir)
+    print(f"exported {meta['n_docs']} docs / {meta['n_terms']} terms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# query_runtime.py
+"""NumPy만 쓰는 TF-IDF 질의 런타임.
+
+mmap 색인(mmap_index.py)에 저장된 분석기 설정/어휘/IDF/문서 행렬만으로 질의를 변환하고 점수화한다.
+sklearn/scipy는 색인 빌드와 검증(mmap_index.py --verify)에서만 불러온다.
+
+- build_analyzer: sklearn VectorizerMixin.build_analyzer와 같은 전처리 → 토큰화 → n-gram 순서.
+- transform: TfidfVectorizer.transform과 같은 연산 순서(정렬된 열 순서로 빈도 → sublinear → ×idf →
+  앞에서부터 제곱합을 누적한 L2 정규화)라서 결과가 비트 단위로 같다.
+- TermMatrix: 문서 행렬의 열(어휘)별 posting. 질의어를 열 번호 순으로 더하므로
+  scipy의 Q @ X.T (csr_matmat)와 덧셈 순서가 같아 점수도 비트 단위로 같다.
+"""
+from __future__ import annotations
+import math
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+_WHITE_SPACES = re.compile(r"\s\s+")
+
+
+def strip_accents_unicode(s: str) -> str:
+    try:
+        s.encode("ASCII", errors="strict")
+        return s
+    except UnicodeEncodeError:
+        normalized = unicodedata.normalize("NFKD", s)
+        return "".join([c for c in normalized if not unicodedata.combining(c)])
+
+
+def strip_accents_ascii(s: str) -> str:
+    return unicodedata.normalize("NFKD", s).encode("ASCII", "ignore").decode("ASCII")
+
+
+def _stop_list(stop_words) -> Optional[frozenset]:
+    if stop_words is None:
+        return None
+    if stop_words == "english":
+        # 영어 기본 불용어 목록은 sklearn에만 있으므로 이 경우만 불러온다
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        return ENGLISH_STOP_WORDS
+    if isinstance(stop_words, str):
+        raise ValueError(f"not a built-in stop list: {stop_words}")
+    return frozenset(stop_words)
+
+
+def _word_ngrams(tokens: List[str], ngram_range, stop_words=None) -> List[str]:
+    if stop_words is not None:
+        tokens = [w for w in tokens if w not in stop_words]
+    min_n, max_n = ngram_range
+    if max_n != 1:
+        original = tokens
+        if min_n == 1:
+            tokens = list(original)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, len(original) + 1)):
+            for i in range(len(original) - n + 1):
+                tokens.append(" ".join(original[i:i + n]))
+    return tokens
+
+
+def _char_ngrams(text: str, ngram_range) -> List[str]:
+    text = _WHITE_SPACES.sub(" ", text)
+    min_n, max_n = ngram_range
+    if min_n == 1:
+        ngrams = list(text)
+        min_n += 1
+    else:
+        ngrams = []
+    for n in range(min_n, min(max_n + 1, len(text) + 1)):
+        for i in range(len(text) - n + 1):
+            ngrams.append(text[i:i + n])
+    return ngrams
+
+
+def _char_wb_ngrams(text: str, ngram_range) -> List[str]:
+    text = _WHITE_SPACES.sub(" ", text)
+    min_n, max_n = ngram_range
+    ngrams = []
+    for w in text.split():
+        w = " " + w + " "
+        for n in range(min_n, max_n + 1):
+            offset = 0
+            ngrams.append(w[offset:offset + n])
+            while offset + n < len(w):
+                offset += 1
+                ngrams.append(w[offset:offset + n])
+            if offset == 0:  # 짧은 단어(len < n)는 한 번만
+                break
+    return ngrams
+
+
+def build_analyzer(cfg: Dict) -> Callable[[str], List[str]]:
+    """mmap meta.json의 analyzer 설정 → 텍스트를 색인어 목록으로 바꾸는 함수."""
+    if cfg["analyzer"] == "korean":
+        from tokenizer import KoreanTokenizer
+        return KoreanTokenizer(**cfg["tokenizer"])
+    accents = {None: None, "ascii": strip_accents_ascii, "unicode": strip_accents_unicode}
+    if cfg["strip_accents"] not in accents:
+        raise ValueError(f"Invalid value for strip_accents: {cfg['strip_accents']}")
+    strip, lower = accents[cfg["strip_accents"]], cfg["lowercase"]
+    ngram_range = tuple(cfg["ngram_range"])
+
+    def preprocess(doc: str) -> str:
+        if lower:
+            doc = doc.lower()
+        return strip(doc) if strip is not None else doc
+
+    if cfg["analyzer"] == "char":
+        return lambda doc: _char_ngrams(preprocess(doc), ngram_range)
+    if cfg["analyzer"] == "char_wb":
+        return lambda doc: _char_wb_ngrams(preprocess(doc), ngram_range)
+    if cfg["analyzer"] != "word":
+        raise ValueError(f"Unsupported analyzer: {cfg['analyzer']}")
+    token_pattern = re.compile(cfg["token_pattern"])
+    if token_pattern.groups > 1:
+        raise ValueError("More than 1 capturing group in token pattern.")
+    stop_words = _stop_list(cfg["stop_words"])
+    return lambda doc: _word_ngrams(token_pattern.findall(preprocess(doc)), ngram_range, stop_words)
+
+
+class SparseRows:
+    """질의 벡터용 최소 CSR (data/indices/indptr). AnswerCache 등은 tocsr()/indices/data만 쓴다."""
+    def __init__(self, data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, n_cols: int):
+        self.data, self.indices, self.indptr = data, indices, indptr
+        self.shape = (len(indptr) - 1, n_cols)
+
+    def tocsr(self) -> "SparseRows":
+        return self
+
+    def row(self, i: int):
+        """i번째 행의 (열 번호, 값)."""
+        a, b = self.indptr[i], self.indptr[i + 1]
+        return self.indices[a:b], self.data[a:b]
+
+    def __getitem__(self, sl: slice) -> "SparseRows":
+        start, stop, _ = sl.indices(self.shape[0])
+        a, b = self.indptr[start], self.indptr[stop]
+        return SparseRows(self.data[a:b], self.indices[a:b], self.indptr[start:stop + 1] - a, self.shape[1])
+
+    def to_scipy(self):
+        import scipy.sparse as sp
+        return sp.csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+
+def transform(texts: Sequence[str], analyze: Callable, term_id: Callable[[str], int],
+              cfg: Dict, idf: np.ndarray, n_terms: int) -> SparseRows:
+    """TfidfVectorizer.transform과 비트 단위로 같은 L2 정규화 TF-IDF 행."""
+    data: List[np.ndarray] = []
+    indices: List[np.ndarray] = []
+    indptr = [0]
+    for t in texts:
+        counts: Dict[int, int] = {}
+        for tok in analyze(t):
+            j = term_id(tok)
+            if j >= 0:
+                counts[j] = counts.get(j, 0) + 1
+        cols = np.asarray(sorted(counts), dtype=np.int32)
+        vals = np.asarray([counts[j] for j in cols.tolist()], dtype=np.float64)
+        if cfg["binary"]:
+            vals[:] = 1.0
+        if cfg["sublinear_tf"]:
+            np.log(vals, vals)
+            vals += 1.0
+        if cfg["use_idf"]:
+            vals *= idf[cols]
+        if cfg["norm"] == "l2":
+            # sklearn inplace_csr_row_normalize_l2와 같이 앞에서부터 순서대로 누적 (np.dot은 순서가 다름)
+            s = 0.0
+            for v in vals.tolist():
+                s += v * v
+            if s != 0.0:
+                vals /= math.sqrt(s)
+        elif cfg["norm"] is not None:
+            raise ValueError(f"Unsupported norm: {cfg['norm']}")
+        data.append(vals)
+        indices.append(cols)
+        indptr.append(indptr[-1] + len(cols))
+    return SparseRows(np.concatenate(data) if data else np.empty(0, np.float64),
+                      np.concatenate(indices) if indices else np.empty(0, np.int32),
+                      np.asarray(indptr, dtype=np.int64), n_terms)
+
+
+def term_major(data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, n_terms: int):
+    """CSR 문서 행렬 → 열별 posting (ptr, 문서 번호, 값). 같은 열 안에서는 문서 번호 오름차순."""
+    indices = np.asarray(indices)
+    order = np.argsort(indices, kind="stable")
+    docs = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))[order]
+    ptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_terms), out=ptr[1:])
+    return ptr, docs, np.asarray(data)[order]
+
+
+class TermMatrix:
+    """열(어휘)별 posting 위에서 term-at-a-time으로 질의 점수를 누적."""
+    def __init__(self, ptr: np.ndarray, docs: np.ndarray, data: np.ndarray, n_docs: int):
+        self.ptr, self.docs, self.data, self.n_docs = ptr, docs, data, n_docs
+
+    def scores(self, Q: SparseRows) -> np.ndarray:
+        """(질의 수, 문서 수) 코사인 점수 (= scipy (Q @ X.T).toarray())."""
+        out = np.zeros((Q.shape[0], self.n_docs), dtype=np.float64)
+        for qi in range(Q.shape[0]):
+            row = out[qi]
+            cols, vals = Q.row(qi)
+            for j, w in zip(cols.tolist(), vals.tolist()):
+                a, b = self.ptr[j], self.ptr[j + 1]
+                if a != b:
+                    docs = self.docs[a:b]
+                    row[docs] += w * self.data[a:b]
+        return out
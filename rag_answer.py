@@ -1,8 +1,17 @@
 # rag_answer.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Callable
+from collections import OrderedDict
+import asyncio
 import os
+import re
+import threading
+import time
+import unicodedata
+import weakref
+from tracing import span, observe, enabled as tracing_enabled
+from context_pack import ContextPacker, PackedContext, row_text
 
 # ===== Safety notes =====
 DISCLAIMER = (
@@ -28,49 +37,266 @@ class RetrievedCase:
     fact: str
     source_url: str
     score: float
+    clause: str = ""
+    snippet: str = ""  # 사실관계/해설 중 질의어가 가장 많이 모인 구간 (없으면 fact 사용)
+    doc: int = -1      # 색인 행 번호 (사전 계산된 MinHash 서명 조회용)
+    text: str = ""     # 중복 판정 텍스트 (소분류+사실관계+해설 전체, context_pack.row_text)
+
+_WS = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 질의 정규화: NFKC, 소문자, 공백 정리."""
+    return _WS.sub(" ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+class RetrievalCache:
+    """정규화된 질의 → 검색 결과(row dict) LRU/TTL 캐시.
+
+    - 더 큰 topk로 저장된 결과가 있으면 작은 topk 요청은 잘라서 응답한다.
+    - 색인 버전(searcher.version)이 바뀌면 저장된 항목을 모두 버린다.
+    """
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (topk, rows, stored_at)
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._data.clear()
+            self._version = version
+
+    def get(self, query: str, topk: int, version=None) -> Optional[List[dict]]:
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            ent = self._data.get(key)
+            if ent is not None and self.ttl is not None and time.monotonic() - ent[2] > self.ttl:
+                del self._data[key]
+                ent = None
+            if ent is None or ent[0] < topk:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return ent[1][:topk]
+
+    def put(self, query: str, topk: int, rows: List[dict], version=None):
+        key = normalize_query(query)
+        with self._lock:
+            self._check_version(version)
+            ent = self._data.get(key)
+            if ent is not None and ent[0] > topk and (self.ttl is None or time.monotonic() - ent[2] <= self.ttl):
+                return  # 이미 더 큰 결과가 있음
+            self._data[key] = (topk, list(rows), time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "size": len(self._data), "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "version": self._version,
+        }
+
+def _text(v) -> str:
+    # artifacts.pkl의 빈 칸은 NaN(float)으로 들어 있음
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    return str(v)
 
 class Retriever:
-    """TF-IDF 기반 상위 사례 조회. (v1의 search_tfidf와 동일 동작)"""
-    def __init__(self, tfidf_searcher):
+    """TF-IDF 기반 상위 사례 조회. (v1의 search_tfidf와 동일 동작)
+    cache(RetrievalCache)를 주면 같은 질의의 재검색을 생략한다."""
+    def __init__(self, tfidf_searcher, cache: Optional[RetrievalCache] = None):
         self.searcher = tfidf_searcher
+        self.cache = cache
+
+    def _query(self, query: str, topk: int, article: Optional[str]) -> List[dict]:
+        if article:
+            return self.searcher.query(query, topk=topk, filters={"article": article})
+        return self.searcher.query(query, topk=topk)
+
+    def search(self, query: str, topk: int = 5, article: Optional[str] = None) -> List[dict]:
+        """searcher 결과 row dict 그대로 (캐시 경유).
+        article("공직선거법 §93", "§58–§60")을 주면 해당 조문 사례 안에서만 top-k를 고른다."""
+        if self.cache is None:
+            return self._query(query, topk, article)
+        version = getattr(self.searcher, "version", None)
+        key = f"{query}\x00{article}" if article else query
+        rows = self.cache.get(key, topk, version)
+        if rows is None:
+            rows = self._query(query, topk, article)
+            self.cache.put(key, topk, rows, version)
+        return rows
 
-    def retrieve(self, query: str, topk: int = 5) -> List[RetrievedCase]:
-        rows = self.searcher.query(query, topk=topk)
-        out = []
-        for r in rows:
-            out.append(RetrievedCase(
-                id=r.get("id",""), law=r.get("law",""), article=r.get("article",""),
-                penalty=r.get("penalty",""), fact=r.get("fact",""),
-                source_url=r.get("source_url",""), score=float(r.get("score",0.0))
-            ))
+    def _case(self, r: dict) -> RetrievedCase:
+        doc = int(r.get("doc", -1))
+        rows = getattr(self.searcher, "rows", None)
+        return RetrievedCase(
+            id=_text(r.get("id","")), law=_text(r.get("law","")), article=_text(r.get("article","")),
+            penalty=_text(r.get("penalty","")), fact=_text(r.get("fact","")),
+            source_url=_text(r.get("source_url","")), score=float(r.get("score",0.0)),
+            clause=_text(r.get("clause","")), snippet=_text(r.get("snippet","")),
+            doc=doc, text=row_text(rows[doc]) if rows is not None and 0 <= doc < len(rows) else "",
+        )
+
+    def retrieve(self, query: str, topk: int = 5, article: Optional[str] = None) -> List[RetrievedCase]:
+        with span("retrieve"):
+            rows = self.search(query, topk, article)
+        return [self._case(r) for r in rows]
+
+    def search_batch(self, queries: List[str], topk: int = 5, article: Optional[str] = None) -> List[List[dict]]:
+        """search의 배치판: 캐시에 없는 질의만 모아 searcher.query_batch 한 번으로 점수화."""
+        queries = list(queries)
+        filters = {"article": article} if article else None
+        version = getattr(self.searcher, "version", None)
+        keys = [f"{q}\x00{article}" if article else q for q in queries]
+        out = [self.cache.get(k, topk, version) if self.cache is not None else None for k in keys]
+        miss = [i for i, rows in enumerate(out) if rows is None]
+        if miss:
+            res = self.searcher.query_batch([queries[i] for i in miss], topk, filters)
+            for i, rows in zip(miss, res):
+                out[i] = rows
+                if self.cache is not None:
+                    self.cache.put(keys[i], topk, rows, version)
+        return out
+
+    def retrieve_batch(self, queries: List[str], topk: int = 5,
+                       article: Optional[str] = None) -> List[List[RetrievedCase]]:
+        with span("retrieve"):
+            res = self.search_batch(queries, topk, article)
+        return [[self._case(r) for r in rows] for rows in res]
+
+    def related(self, case: RetrievedCase, topk: int = 5) -> List[RetrievedCase]:
+        """같은 조문(법률, 조, 의N)을 인용한 다른 사례 (조문 색인 조회, 행 순서)."""
+        with span("retrieve.related"):
+            pos = self.searcher.articles.related_to(f"{case.clause} {case.law} {case.article}")
+            out = []
+            for i in pos:
+                r = self.searcher.format_row(len(out) + 1, int(i), 0.0)
+                if _text(r.get("id")) == case.id and _text(r.get("fact")) == case.fact:
+                    continue  # 기준 사례 자신
+                out.append(self._case(r))
+                if len(out) >= topk:
+                    break
         return out
 
+# ===== LLM 클라이언트 풀 =====
+# RAGAnswerer는 Streamlit 재실행마다 새로 만들어지므로, 연결(HTTP keep-alive)을 재사용하도록
+# 클라이언트와 동시 실행 제한(semaphore)은 프로세스 단위로 공유한다.
+LLM_MAX_CONCURRENCY = int(os.environ.get("RAG_LLM_CONCURRENCY", "4"))
+
+_client_lock = threading.Lock()
+_clients: Dict[tuple, Any] = {}
+_sync_slots: Dict[int, threading.BoundedSemaphore] = {}
+# 루프 → {n: Semaphore}. 루프가 사라지면 항목도 사라지도록 루프 객체를 약한 키로 (id()는 재사용됨)
+_async_slots: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def _default_client_factory(is_async: bool, base_url: Optional[str]):
+    from openai import OpenAI, AsyncOpenAI  # type: ignore
+    cls = AsyncOpenAI if is_async else OpenAI
+    return cls(base_url=base_url) if base_url else cls()
+
+def get_llm_client(is_async: bool = False, base_url: Optional[str] = None,
+                   factory: Optional[Callable] = None):
+    """(동기/비동기, base_url, factory)별로 한 번만 만든 클라이언트를 돌려준다."""
+    factory = factory or _default_client_factory
+    key = (is_async, base_url, factory)
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory(is_async, base_url)
+        return client
+
+def _sync_slot(n: int) -> threading.BoundedSemaphore:
+    with _client_lock:
+        sem = _sync_slots.get(n)
+        if sem is None:
+            sem = _sync_slots[n] = threading.BoundedSemaphore(n)
+        return sem
+
+def _async_slot(n: int) -> asyncio.Semaphore:
+    # asyncio.Semaphore는 이벤트 루프에 묶이므로 루프별로 따로 둔다
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        slots = _async_slots.get(loop)
+        if slots is None:
+            slots = _async_slots[loop] = {}
+        sem = slots.get(n)
+        if sem is None:
+            sem = slots[n] = asyncio.Semaphore(n)
+        return sem
+
+def _delta_text(chunk) -> str:
+    if not getattr(chunk, "choices", None):
+        return ""
+    return chunk.choices[0].delta.content or ""
+
 class RAGAnswerer:
-    def __init__(self, backend: str = "none", model: str = "", temperature: float = 0.2):
+    """사례 기반 안내 생성.
+
+    backend="openai"일 때 base_url(또는 OPENAI_BASE_URL)로 OpenAI 호환 서버를 지정할 수 있고,
+    client_factory(is_async, base_url)를 넘기면 로컬 스텁 서버/가짜 클라이언트로 대체된다.
+    LLM 프롬프트에는 packer(ContextPacker)가 중복을 빼고 토큰 예산 안에서 고른 사례만 넣는다.
+    """
+    def __init__(self, backend: str = "none", model: str = "", temperature: float = 0.2,
+                 base_url: Optional[str] = None, client_factory: Optional[Callable] = None,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, packer: Optional[ContextPacker] = None):
         self.backend = backend
         self.model = model
         self.temperature = temperature
+        self.base_url = base_url
+        self.client_factory = client_factory
+        self.max_concurrency = max_concurrency
+        self.packer = packer or ContextPacker()
         self.has_openai = False
         if backend == "openai":
-            try:
-                from openai import OpenAI  # type: ignore
-                self._OpenAI = OpenAI
+            if client_factory is not None:
                 self.has_openai = True
-            except Exception:
-                self.has_openai = False
+            else:
+                try:
+                    import openai  # type: ignore  # noqa: F401
+                    self.has_openai = True
+                except Exception:
+                    self.has_openai = False
+
+    @property
+    def uses_llm(self) -> bool:
+        return self.backend == "openai" and self.has_openai
+
+    @staticmethod
+    def _format_block(c: RetrievedCase) -> str:
+        return (
+            f"[사례ID] {c.id}\n"
+            f"[조문] {c.law} {c.article}\n"
+            f"[제재] {c.penalty}\n"
+            f"[요지] {c.fact}\n"
+            f"[출처] {c.source_url}\n"
+        )
 
     def _format_context(self, cases: List[RetrievedCase]) -> str:
-        blocks = []
-        for c in cases:
-            block = (
-                f"[사례ID] {c.id}\n"
-                f"[조문] {c.law} {c.article}\n"
-                f"[제재] {c.penalty}\n"
-                f"[요지] {c.fact}\n"
-                f"[출처] {c.source_url}\n"
-            )
-            blocks.append(block)
-        return "\n---\n".join(blocks)
+        return "\n---\n".join(self._format_block(c) for c in cases)
+
+    def pack(self, cases: List[RetrievedCase]) -> PackedContext:
+        """프롬프트에 들어갈 사례 (중복 제거 + 토큰 예산). dropped에 뺀 사례와 이유."""
+        with span("rag.pack"):
+            return self.packer.pack(cases, self._format_block)
+
+    @staticmethod
+    def context_info(packed: PackedContext) -> Dict[str, Any]:
+        return {"context_ids": packed.used_ids, "context_ranks": packed.ranks,
+                "dropped": packed.dropped, "context_tokens": packed.tokens}
 
     def _build_prompt(self, user_query: str, cases: List[RetrievedCase]) -> str:
         ctx = self._format_context(cases)
@@ -84,42 +310,119 @@ class RAGAnswerer:
         )
         return prompt
 
+    def _messages(self, user_query: str, cases: List[RetrievedCase]) -> List[Dict[str, str]]:
+        # 이미 패킹된 목록이면 그대로 통과한다 (중복 없음, 예산 이내)
+        cases = self.pack(cases).cases
+        with span("rag.build_prompt"):
+            prompt = self._build_prompt(user_query, cases)
+        return [
+            {"role":"system","content": SYSTEM_INSTRUCTION},
+            {"role":"user","content": prompt}
+        ]
+
+    def _request(self, user_query: str, cases: List[RetrievedCase], stream: bool = False) -> Dict[str, Any]:
+        # gpt-4o-mini 등 경량 모델 권장
+        return dict(model=self.model or "gpt-4o-mini", messages=self._messages(user_query, cases),
+                    temperature=self.temperature, stream=stream)
+
+    def _template(self, cases: List[RetrievedCase]) -> Dict[str, Any]:
+        bullets = []
+        for c in cases:
+            bullets.append(f"- {c.law} {c.article} / {c.id} — {c.penalty}")
+        guidance = (
+            "• 유사 사례를 참고할 때, 시기(선거일 전/후), 매체(온라인/오프라인), 대상(선거구민/지지자),\n"
+            "  금품/물품 제공 여부를 반드시 구체화해 내부 검토를 진행하세요.\n"
+            "• 문안은 사실관계 확인 후 표현을 완곡화하고, 공표/배포 시 금지기간 여부를 재확인하세요.\n"
+        )
+        return {
+            "mode": "template",
+            "summary": "유사 사례 기반 참고 안내입니다.",
+            "guidance": guidance,
+            "citations": bullets,
+            "disclaimer": DISCLAIMER,
+        }
+
+    @staticmethod
+    def _template_text(out: Dict[str, Any]) -> str:
+        return (f"**요약**: {out['summary']}\n\n**가이드**:\n{out['guidance']}\n"
+                "**인용/출처**:\n" + "\n".join(out["citations"]))
+
     def answer(self, user_query: str, cases: List[RetrievedCase]) -> Dict[str, Any]:
+        """결과 dict에 context_ids(프롬프트/인용에 쓴 사례ID)와 dropped(뺀 사례와 이유)를 함께 담는다."""
+        packed = self.pack(cases)
+        cases = packed.cases
         # 0) LLM 비사용 템플릿(기본)
         if self.backend == "none" or (self.backend == "openai" and not self.has_openai):
-            bullets = []
-            for c in cases:
-                bullets.append(f"- {c.law} {c.article} / {c.id} — {c.penalty}")
-            guidance = (
-                "• 유사 사례를 참고할 때, 시기(선거일 전/후), 매체(온라인/오프라인), 대상(선거구민/지지자),\n"
-                "  금품/물품 제공 여부를 반드시 구체화해 내부 검토를 진행하세요.\n"
-                "• 문안은 사실관계 확인 후 표현을 완곡화하고, 공표/배포 시 금지기간 여부를 재확인하세요.\n"
-            )
-            return {
-                "mode": "template",
-                "summary": "유사 사례 기반 참고 안내입니다.",
-                "guidance": guidance,
-                "citations": bullets,
-                "disclaimer": DISCLAIMER,
-            }
+            return {**self._template(cases), **self.context_info(packed)}
 
-        # 1) OpenAI 백엔드
-        if self.backend == "openai" and self.has_openai:
-            client = self._OpenAI()
-            prompt = self._build_prompt(user_query, cases)
-            msgs = [
-                {"role":"system","content": SYSTEM_INSTRUCTION},
-                {"role":"user","content": prompt}
-            ]
-            # gpt-4o-mini 등 경량 모델 권장
-            model_name = self.model or "gpt-4o-mini"
-            resp = client.chat.completions.create(model=model_name, messages=msgs, temperature=self.temperature)
+        # 1) OpenAI 백엔드 (풀링된 클라이언트 + 동시 실행 제한)
+        if self.uses_llm:
+            client = get_llm_client(False, self.base_url, self.client_factory)
+            req = self._request(user_query, cases)
+            with _sync_slot(self.max_concurrency), span("rag.llm"):
+                resp = client.chat.completions.create(**req)
             text = resp.choices[0].message.content.strip()
             return {
                 "mode": "openai",
                 "answer": text,
                 "disclaimer": DISCLAIMER,
+                **self.context_info(packed),
             }
 
         # 2) (확장) 로컬 LLM 백엔드 — 필요 시 추가 구현
         raise NotImplementedError("Backend not implemented: " + self.backend)
+
+    def answer_stream(self, user_query: str, cases: List[RetrievedCase]) -> Iterator[str]:
+        """답변 텍스트를 토큰(청크) 단위로 내보내는 동기 제너레이터 (st.write_stream 용).
+        뺀 사례 목록이 필요하면 호출 측에서 pack(cases)을 먼저 부르고 그 cases를 넘긴다."""
+        if not self.uses_llm:
+            if self.backend not in ("none", "openai"):
+                raise NotImplementedError("Backend not implemented: " + self.backend)
+            yield self._template_text(self._template(self.pack(cases).cases))
+            return
+        client = get_llm_client(False, self.base_url, self.client_factory)
+        req = self._request(user_query, cases, stream=True)
+        with _sync_slot(self.max_concurrency), span("rag.llm"):
+            t0, first = time.perf_counter(), tracing_enabled()
+            stream = client.chat.completions.create(**req)
+            for chunk in stream:
+                text = _delta_text(chunk)
+                if text:
+                    if first:
+                        observe("rag.llm_first_token", time.perf_counter() - t0)
+                        first = False
+                    yield text
+
+    async def astream(self, user_query: str, cases: List[RetrievedCase]) -> AsyncIterator[str]:
+        """answer_stream의 asyncio 판. 동시 요청 수는 루프별 semaphore로 제한."""
+        if not self.uses_llm:
+            if self.backend not in ("none", "openai"):
+                raise NotImplementedError("Backend not implemented: " + self.backend)
+            yield self._template_text(self._template(self.pack(cases).cases))
+            return
+        client = get_llm_client(True, self.base_url, self.client_factory)
+        req = self._request(user_query, cases, stream=True)
+        async with _async_slot(self.max_concurrency):
+            with span("rag.llm"):
+                t0, first = time.perf_counter(), tracing_enabled()
+                stream = await client.chat.completions.create(**req)
+                async for chunk in stream:
+                    text = _delta_text(chunk)
+                    if text:
+                        if first:
+                            observe("rag.llm_first_token", time.perf_counter() - t0)
+                            first = False
+                        yield text
+
+    async def aanswer(self, user_query: str, cases: List[RetrievedCase]) -> Dict[str, Any]:
+        """answer의 asyncio 판 (스트림을 모아 같은 형식의 dict 반환)."""
+        if not self.uses_llm:
+            return self.answer(user_query, cases)
+        packed = self.pack(cases)
+        parts = [t async for t in self.astream(user_query, packed.cases)]
+        return {
+            "mode": "openai",
+            "answer": "".join(parts).strip(),
+            "disclaimer": DISCLAIMER,
+            **self.context_info(packed),
+        }
@@ -0,0 +1,71 @@
+# report_html.py
+import html
+from string import Template
+from tracing import span
+from snippets import Highlighter
+
+# 보고서 틀은 모듈 로드 때 한 번만 만들고, 보고서마다 자리만 채운다 (일괄 내보내기에서도 재사용)
+_PAGE = Template("""
+    <html><head><meta charset='utf-8'><style>
+    body{font-family:Pretendard,Arial,sans-serif;max-width:900px;margin:40px auto;line-height:1.6;}
+    h1{color:#0a67b5;}
+    .box{border:1px solid #e5e7eb;border-radius:12px;padding:16px;margin:12px 0;}
+    .muted{color:#64748b;font-size:12px}
+    .snippet{color:#334155;font-size:14px}
+    mark{background:#fef08a;padding:0 1px}
+    </style></head><body>
+    <h1>선거법 RAG 안내 (보고서)</h1>
+    <p class='muted'>생성시각: $generated_at</p>
+    <div class='box'><b>입력</b><br>$query</div>
+    $llm_html
+    $advice_html
+    <div class='box'><b>인용/출처</b><ul>$cases_html</ul>$dropped_html</div>
+    <p class='muted'>※ 본 보고서는 법률 자문이 아니며, 사례/판례/선관위 자료 기반 참고 안내입니다.</p>
+    </body></html>
+    """)
+
+def _case_li(c, hl=None):
+    src = f'<a href="{html.escape(c.source_url)}" target="_blank">원문</a>' if c.source_url else ""
+    text = getattr(c, "snippet", "") or c.fact
+    # 질의어 강조 요지 (hl이 없거나 질의어가 없으면 escape만)
+    fact = (hl or Highlighter()).snippet(text, None).html() if text else ""
+    fact = f"<div class='snippet'>{fact}</div>" if fact else ""
+    return f"<li><b>{html.escape(c.id)}</b> — {html.escape(c.law)} {html.escape(c.article)} / {html.escape(c.penalty)} {src}{fact}</li>"
+
+def _dropped_html(dropped):
+    if not dropped:
+        return ""
+    why = {"duplicate": "중복", "budget": "분량 초과"}
+    items = ", ".join(
+        f"{d['rank']}. {html.escape(d['id'])}({why.get(d['reason'], d['reason'])}"
+        + (f" · {d['duplicate_of']}번과 유사" if d.get("duplicate_of") else "") + ")"
+        for d in dropped)
+    return f"<p class='muted'>답변 근거에서 제외된 검색 사례: {items}</p>"
+
+def make_report(query, out, cases, generated_at):
+    """답변 dict(템플릿/LLM) → build_html 입력 (앱과 일괄 내보내기가 같은 형식을 쓴다).
+    out에 context_ranks가 있으면 실제 프롬프트에 들어간 사례만 인용하고, 뺀 사례는 dropped로 따로 적는다."""
+    if "context_ranks" in out:
+        cases = [cases[r - 1] for r in out["context_ranks"] if 0 < r <= len(cases)]
+    rep = {"query": query, "cases": cases, "dropped": out.get("dropped", []), "generated_at": generated_at}
+    if out.get("mode") == "template":
+        rep.update(advice=out["guidance"], citations=out["citations"])
+    else:
+        rep["llm_answer"] = out.get("answer", "")
+    return rep
+
+def build_html(rep):
+    """RAG 안내 보고서 HTML (rep: query/advice|llm_answer/cases/generated_at)"""
+    with span("report.build_html"):
+        return _build_html(rep)
+
+def _build_html(rep):
+    hl = Highlighter(rep.get("query", ""))
+    cases_html = "\n".join(_case_li(c, hl) for c in rep["cases"])
+    llm_html = ('<div class="box"><b>LLM 답변</b><br>' + rep.get('llm_answer', '').replace('\n', '<br>') + '</div>') if rep.get('llm_answer') else ''
+    advice_html = ('<div class="box"><b>가이드</b><br>' + rep.get('advice', '').replace('\n', '<br>') + '</div>') if rep.get('advice') else ''
+    return _PAGE.substitute(
+        generated_at=rep['generated_at'], query=html.escape(rep['query']),
+        llm_html=llm_html, advice_html=advice_html, cases_html=cases_html,
+        dropped_html=_dropped_html(rep.get("dropped")),
+    )
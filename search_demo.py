@@ -1,44 +1,218 @@
 
-import argparse, pickle, numpy as np
-import pandas as pd
+import argparse, json, os, pickle, sys, numpy as np
+import multiprocessing as mp
+from itertools import islice
 from pathlib import Path
+from bm25 import query_terms
+from dense_index import DENSE_DIR, DenseIndex, embed_texts
+from snippets import Highlighter
 
 def load_artifacts(indir):
     with open(Path(indir)/"artifacts.pkl", "rb") as f:
         return pickle.load(f)
 
+def _hit(rank, score, row, hl):
+    # 요지는 앞 140자 대신 사실관계/해설 중 질의어가 가장 많이 모인 구간
+    return {"rank":rank,"score":score,"id":row.get("id",""),
+            "law":row.get("law",""),"article":row.get("article",""),
+            "penalty":row.get("penalty",""),"fact":hl.best((row.get("fact"), row.get("rationale")), 140).plain()}
+
 def tfidf_query(obj, query, topk=5):
     vec = obj["vectorizer"]
     nn = obj["nn"]
     qv = vec.transform([query])
     dists, idxs = nn.kneighbors(qv, n_neighbors=topk)
     idxs = idxs[0]; dists = dists[0]
-    out = []
+    out, hl = [], Highlighter(query)
     for rank, (i,d) in enumerate(zip(idxs, dists), start=1):
-        row = obj["rows"][i]
-        out.append({"rank":rank,"score":1-float(d),"id":row.get("id",""),
-                    "law":row.get("law",""),"article":row.get("article",""),
-                    "penalty":row.get("penalty",""),"fact":row.get("fact","")[:140]})
+        out.append(_hit(rank, 1-float(d), obj["rows"][i], hl))
+    return out
+
+def open_batch_searcher(indir):
+    """배치 모드 검색기: indir가 index_mmap/index_shards 자체면 그 색인을, 아니면 open_searcher
+    (샤드 → mmap → artifacts.pkl + segments/ 순). 문서 행렬 정규화는 색인을 열 때 한 번만 한다."""
+    indir = Path(indir)
+    if (indir/"shards.json").exists():
+        from shard_index import ShardedSearcher
+        return ShardedSearcher(indir)
+    if (indir/"meta.json").exists():
+        from mmap_index import MmapSearcher
+        return MmapSearcher(indir)
+    from mmap_index import open_searcher
+    return open_searcher(indir)
+
+def _row_hit(r):
+    """searcher 결과 dict → _hit과 같은 필드 (요지는 searcher가 고른 snippet)."""
+    return {**{k: r.get(k, "") for k in ("rank", "score", "id", "law", "article", "penalty")},
+            "fact": r.get("snippet", r.get("fact", ""))}
+
+def tfidf_query_batch(searcher, queries, topk=5):
+    """tfidf_query의 배치판: searcher.query_batch로 질의를 한 번에 변환하고 희소 행렬곱으로 점수화."""
+    return [[_row_hit(r) for r in rows] for rows in searcher.query_batch(list(queries), topk)]
+
+def bm25_query(obj, query, topk=5):
+    """backend="bm25" 색인: posting list 위에서 MaxScore로 top-k만 점수화."""
+    hits = obj["bm25"].search(query_terms(obj["vectorizer"], query), topk)
+    out, hl = [], Highlighter(query)
+    for rank, (i, score) in enumerate(hits, start=1):
+        out.append(_hit(rank, score, obj["rows"][i], hl))
+    return out
+
+def _dense_path(obj, indir):
+    path = Path(indir)/obj.get("dense_dir", DENSE_DIR)
+    if not (path/"meta.json").exists():
+        if "matrix" in obj:  # 행렬만 저장된 예전 색인 (변환은 빌드 쪽에서)
+            raise SystemExit(f"No dense index at {path}; convert it first: "
+                             f"python build_index.py --outdir {indir} --convert-dense")
+        raise SystemExit(f"No dense index at {path}.")
+    return path
+
+def dense_query(obj, indir, query, topk=5, query_vector=None, nprobe=8):
+    """openai/sbert 색인: 양자화 mmap 벡터를 블록 단위로 점수화 (IVF가 있으면 nprobe개 리스트만).
+    질의 임베딩은 .npy(query_vector)에서 읽거나 색인에 기록된 로컬 모델로 계산한다."""
+    path = _dense_path(obj, indir)
+    if query_vector is not None:
+        qv = np.load(query_vector)
+    elif obj.get("model"):
+        qv = embed_texts([query], obj["model"])
+    else:
+        raise SystemExit("This index has no local query model; pass --query-vector (.npy).")
+    hits = DenseIndex(path).search(qv, topk, nprobe)[0]
+    out, hl = [], Highlighter(query)
+    for rank, (i, score) in enumerate(hits, start=1):
+        out.append(_hit(rank, score, obj["rows"][i], hl))
     return out
 
+def load_batch_index(indir):
+    """배치 모드 색인: TF-IDF/BM25는 검색기(open_batch_searcher), 임베딩 색인은 artifacts dict."""
+    try:
+        return open_batch_searcher(indir)
+    except ValueError:  # TfidfSearcher는 TF-IDF/BM25 색인만 연다
+        obj = load_artifacts(indir)
+        _dense_path(obj, indir)  # worker를 띄우기 전에 dense/ 가 있는지 확인
+        return obj
+
+def query_batch(index, indir, queries, topk=5, nprobe=8):
+    """백엔드별 배치 검색 (index: load_batch_index의 반환값). 반환: 질의 순서대로 결과 리스트."""
+    if not isinstance(index, dict):
+        return tfidf_query_batch(index, queries, topk)
+    obj = index
+    if not obj.get("model"):
+        raise SystemExit("Batch mode needs a local query model for embedding indexes.")
+    hits = DenseIndex(_dense_path(obj, indir)).search(embed_texts(queries, obj["model"]), topk, nprobe)
+    res = []
+    for q, qh in zip(queries, hits):
+        hl = Highlighter(q)
+        res.append([_hit(rank, score, obj["rows"][i], hl) for rank, (i, score) in enumerate(qh, start=1)])
+    return res
+
+# ===== 배치 모드 =====
+# 부모가 색인을 한 번 읽고 fork 하면 worker는 같은 메모리(copy-on-write)를 그대로 쓴다.
+# fork가 없는 플랫폼(spawn)에서는 worker마다 initializer로 한 번씩 읽는다.
+_worker = {}
+
+def _init_worker(indir, topk, nprobe, index=None):
+    _worker.update(index=index if index is not None else load_batch_index(indir), indir=indir, topk=topk, nprobe=nprobe)
+
+def _clean(v):
+    # artifacts.pkl의 빈 칸(NaN)은 JSON으로 표현할 수 없으므로 빈 문자열로
+    if isinstance(v, float) and v != v:
+        return ""
+    return v
+
+def _run_chunk(chunk):
+    """[(입력 줄, 질의, id)] → JSONL 줄 목록 (같은 순서)."""
+    w = _worker
+    res = query_batch(w["index"], w["indir"], [q for _, q, _ in chunk], w["topk"], w["nprobe"])
+    lines = []
+    for (_, q, qid), rows in zip(chunk, res):
+        rec = {"query": q, "results": [{k: _clean(v) for k, v in r.items()} for r in rows]}
+        if qid is not None:
+            rec = {"id": qid, **rec}
+        lines.append(json.dumps(rec, ensure_ascii=False))
+    return lines
+
+def read_batch(f):
+    """JSONL({"query": ..., "id": ...}) 또는 한 줄에 질의 하나 → (줄 번호, 질의, id) 생성기."""
+    for n, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            obj = json.loads(line)
+            yield n, str(obj.get("query") or ""), obj.get("id")
+        else:
+            yield n, line, None
+
+def _chunks(it, size):
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def run_batch(indir, src, out, topk=5, nprobe=8, workers=None, chunk=64):
+    """src의 질의를 chunk개씩 worker에 나눠 검색하고 결과를 입력 순서대로 out에 한 줄씩 쓴다."""
+    index = load_batch_index(indir)
+    chunks = _chunks(read_batch(src), chunk)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(indir, topk, nprobe, index)
+        results = map(_run_chunk, chunks)
+        pool = None
+    else:
+        if "fork" in mp.get_all_start_methods():
+            _init_worker(indir, topk, nprobe, index)
+            pool = mp.get_context("fork").Pool(workers)
+        else:
+            pool = mp.Pool(workers, initializer=_init_worker, initargs=(indir, topk, nprobe))
+        # imap은 입력 순서대로 결과를 내므로 앞 청크가 끝나는 대로 바로 쓸 수 있다
+        results = pool.imap(_run_chunk, chunks)
+    try:
+        for lines in results:
+            out.write("\n".join(lines) + "\n")
+            out.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--query", required=True)
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--query")
+    mode.add_argument("--batch", metavar="FILE", help="질의 JSONL/텍스트 파일 ('-' = stdin), 결과는 stdout에 JSONL")
     ap.add_argument("--topk", type=int, default=5)
     ap.add_argument("--indexdir", default="./index")
+    ap.add_argument("--query-vector", default=None, help="임베딩 백엔드용 질의 임베딩 .npy")
+    ap.add_argument("--nprobe", type=int, default=8, help="IVF 색인에서 훑을 리스트 수")
+    ap.add_argument("--workers", type=int, default=None, help="배치 모드 프로세스 수 (기본: CPU 수)")
+    ap.add_argument("--chunk", type=int, default=64, help="배치 모드에서 worker에 한 번에 넘길 질의 수")
     args = ap.parse_args()
-    obj = load_artifacts(args.indexdir)
-    if obj["backend"]=="tfidf":
+    if args.batch:
+        src = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8-sig")
+        with src:
+            run_batch(args.indexdir, src, sys.stdout, args.topk, args.nprobe, args.workers, args.chunk)
+        return
+    # index_mmap / index_shards 디렉터리를 주면 pickle/sklearn 없이 NumPy 런타임으로 검색
+    indir = Path(args.indexdir)
+    obj = None if (indir/"meta.json").exists() or (indir/"shards.json").exists() else load_artifacts(args.indexdir)
+    if obj is None:
+        if (indir/"shards.json").exists():
+            from shard_index import ShardedSearcher as Searcher
+        else:
+            from mmap_index import MmapSearcher as Searcher
+        res = [dict(r, fact=r["snippet"]) for r in Searcher(args.indexdir).query(args.query, args.topk)]
+    elif obj["backend"]=="tfidf":
         res = tfidf_query(obj, args.query, args.topk)
+    elif obj["backend"]=="bm25":
+        res = bm25_query(obj, args.query, args.topk)
     else:
-        # cosine via matrix
-        from sklearn.metrics.pairwise import cosine_similarity
-        # NOTE: For openai/sbert branch, we didn't store vectorizer; use matrix
-        # Not implemented here for brevity.
-        raise SystemExit("Only tfidf demo implemented in search_demo.")
+        # openai/sbert: vectorizer 없이 임베딩 행렬만 저장됨
+        res = dense_query(obj, args.indexdir, args.query, args.topk, args.query_vector, args.nprobe)
     for r in res:
         print(f"{r['rank']:>2}. {r['id']} | {r['law']} {r['article']} | score={r['score']:.3f}")
-        print(f"    {r['fact']}...")
+        print(f"    {r['fact']}")
 
 if __name__ == "__main__":
     main()
@@ -1,33 +1,203 @@
 # search_tfidf.py
 from pathlib import Path
+import hashlib
 import pickle
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
+import numpy as np
+from tracing import span
+from bm25 import query_terms
+from facets import FacetIndex
+from statutes import ArticleIndex
+from snippets import Highlighter
+
+SEGMENT_DIR = "segments"  # build_index.py --append 로 추가된 증분 세그먼트 위치
+BATCH_CHUNK = 256  # 배치 질의 시 한 번에 점수화할 질의 수 (질의 수 × 문서 수 밀집 행렬 크기 제한)
+
+
+def topk_indices(scores: np.ndarray, topk: int) -> np.ndarray:
+    """(질의 수, 문서 수) 점수 행렬에서 행별 상위 k개 열 번호를 점수 내림차순으로 반환.
+    argpartition으로 후보만 고른 뒤 k개만 정렬한다."""
+    k = min(topk, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+def index_version(paths) -> str:
+    """색인 파일들의 (이름, 크기, mtime)으로 만든 짧은 버전 문자열. 파일이 바뀌면 달라진다."""
+    h = hashlib.sha1()
+    for p in sorted(Path(p) for p in paths):
+        st = p.stat()
+        h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:16]
+
 
 class TfidfSearcher:
     def __init__(self, index_dir: str = "."):
+        with span("searcher.load"):
+            self._load(index_dir)
+
+    def _load(self, index_dir):
+        # artifacts.pkl(sklearn 객체) 경로에서만 sklearn/scipy를 불러온다 (topk_indices 등만 쓰는 곳은 NumPy만)
+        import scipy.sparse as sp
+        from sklearn.preprocessing import normalize
         with open(Path(index_dir) / "artifacts.pkl", "rb") as f:
             obj = pickle.load(f)
-        if obj.get("backend") != "tfidf":
-            raise ValueError("This helper supports only TF-IDF backend.")
-        self.vec: TfidfVectorizer = obj["vectorizer"]
-        self.nn: NearestNeighbors = obj["nn"]
-        self.rows = obj["rows"]
-
-    def query(self, text: str, topk: int = 10):
-        qv = self.vec.transform([text])
-        dists, idxs = self.nn.kneighbors(qv, n_neighbors=topk)
-        out = []
+        self.backend = obj.get("backend")
+        if self.backend not in ("tfidf", "bm25"):
+            raise ValueError("This helper supports only TF-IDF/BM25 backends.")
+        self.vec = obj["vectorizer"]
+        self.rows = list(obj["rows"])
+        if self.backend == "bm25":
+            # posting list 색인 (bm25.py). 세그먼트/NearestNeighbors는 쓰지 않는다
+            self.bm25 = obj["bm25"]
+            self.analyzer = self.vec.build_analyzer()  # 질의마다 다시 만들지 않도록 한 번만
+            self.nn, self.X, self.n_segments = None, None, 0
+            self.version = index_version([Path(index_dir) / "artifacts.pkl"])
+            return
+        self.nn = obj["nn"]
+        # 배치 질의용 문서 행렬 (L2 정규화 → 내적 = 코사인 유사도)
+        mats = [self.nn._fit_X]
+        self.n_segments = 0
+        seg_paths = sorted((Path(index_dir) / SEGMENT_DIR).glob("seg-*.pkl"))
+        self.version = index_version([Path(index_dir) / "artifacts.pkl", *seg_paths])
+        for p in seg_paths:
+            with open(p, "rb") as f:
+                seg = pickle.load(f)
+            mats.append(seg["matrix"])
+            self.rows.extend(seg["rows"])
+            self.n_segments += 1
+        self.X = normalize(sp.vstack(mats, format="csr"), norm="l2").tocsr()
+
+    def transform(self, texts):
+        """질의 텍스트 → L2 정규화된 TF-IDF 희소 행렬 (bm25 백엔드는 정규화된 빈도 벡터)."""
+        with span("search.transform"):
+            if self.backend == "bm25":
+                from sklearn.preprocessing import normalize
+                return normalize(self.vec.transform(list(texts)), norm="l2")
+            return self.vec.transform(list(texts))
+
+    def format_row(self, rank: int, i: int, score: float, hl=None) -> dict:
+        """hl(질의 Highlighter)을 주면 사실관계/해설 중 질의어가 가장 많이 모인 구간을 "snippet"으로 덧붙인다."""
+        row = self.rows[i]
+        out = {
+            "rank": rank,
+            "score": round(score, 3),
+            "id": row.get("id", ""),
+            "law": row.get("law", ""),
+            "article": row.get("article", ""),
+            "penalty": row.get("penalty", ""),
+            "fact": (row.get("fact", "") or "")[:180],
+            "source_url": row.get("source_url", ""),
+            "clause": row.get("clause", ""),
+            "doc": int(i),
+        }
+        if hl is not None:
+            out["snippet"] = hl.best((row.get("fact"), row.get("rationale"))).plain()
+        return out
+
+    @property
+    def facets(self) -> FacetIndex:
+        """대분류/소분류/위반여부/법조항 비트맵 (첫 필터 질의 때 한 번 생성)."""
+        if getattr(self, "_facets", None) is None:
+            self._facets = FacetIndex.from_rows(self.rows)
+        return self._facets
+
+    @property
+    def articles(self) -> ArticleIndex:
+        """(법률, 조, 의N) 조문 색인 (첫 조문 질의 때 한 번 생성)."""
+        if getattr(self, "_articles", None) is None:
+            self._articles = ArticleIndex.from_rows(self.rows)
+        return self._articles
+
+    @property
+    def signatures(self) -> np.ndarray:
+        """행별 MinHash 서명 (n, K) — 컨텍스트 패킹의 중복 판정용 (첫 사용 때 한 번 계산)."""
+        if getattr(self, "_signatures", None) is None:
+            from context_pack import minhash_rows, row_text
+            self._signatures = minhash_rows([row_text(r) for r in self.rows])
+        return self._signatures
+
+    @property
+    def completer(self):
+        """검색어 자동 완성 (어휘 + 소분류/법조항, 문서 빈도 가중치, 첫 사용 때 한 번 생성)."""
+        if getattr(self, "_completer", None) is None:
+            from autocomplete import Completer
+            vocab = self.vec.vocabulary_
+            if self.backend == "bm25":
+                df = np.diff(self.bm25.ptr)
+            else:
+                df = np.bincount(self.X.indices, minlength=len(vocab))
+            terms = sorted(vocab, key=vocab.get)
+            self._completer = Completer.from_rows(self.rows, terms, df)
+        return self._completer
+
+    def _allowed(self, filters):
+        """facet/조문 필터 → 허용 행 마스크(bool). 필터가 없으면 None.
+        filters["article"]는 조문 질의("공직선거법 §93", "§58–§60")이고 나머지 키는 facet 이름."""
+        if not filters or not any(filters.values()):
+            return None
+        with span("search.facets"):
+            filters = dict(filters)
+            article = filters.pop("article", None)
+            allowed = self.facets.to_bool(self.facets.mask(filters))
+            if article:
+                allowed &= self.articles.mask(article)
+            return allowed
+
+    def _query_bm25(self, text: str, topk: int, allowed=None):
+        with span("search.transform"):
+            terms = query_terms(self.vec, text, self.analyzer)
+        with span("search.bm25"):
+            hits = self.bm25.search(terms, topk, allowed)
+        hl = Highlighter(text)
+        return [self.format_row(rank, i, score, hl) for rank, (i, score) in enumerate(hits, start=1)]
+
+    def query(self, text: str, topk: int = 10, filters=None):
+        """filters: {"대분류": [...], "위반여부": ["❌"], "article": "§58–§60"} — top-k 전에 적용."""
+        if self.backend == "bm25":
+            return self._query_bm25(text, topk, self._allowed(filters))
+        if self.n_segments or filters:
+            # 세그먼트/필터는 NearestNeighbors로 처리할 수 없으므로 병합된 행렬로 점수화
+            return self.query_batch([text], topk, filters)[0]
+        qv = self.transform([text])
+        with span("search.kneighbors"):
+            dists, idxs = self.nn.kneighbors(qv, n_neighbors=topk)
+        out, hl = [], Highlighter(text)
         for rank, (i, d) in enumerate(zip(idxs[0], dists[0]), start=1):
-            row = self.rows[i]
-            out.append({
-                "rank": rank,
-                "score": round(1 - float(d), 3),
-                "id": row.get("id", ""),
-                "law": row.get("law", ""),
-                "article": row.get("article", ""),
-                "penalty": row.get("penalty", ""),
-                "fact": (row.get("fact", "") or "")[:180],
-                "source_url": row.get("source_url", ""),
-            })
+            out.append(self.format_row(rank, i, 1 - float(d), hl))
+        return out
+
+    def query_batch(self, texts, topk: int = 10, filters=None):
+        """여러 질의를 한 번에 변환·점수화. 반환: 질의별 `query`와 같은 형식의 dict 리스트."""
+        texts = list(texts)
+        if not texts:
+            return []
+        allowed = self._allowed(filters)
+        if self.backend == "bm25":
+            return [self._query_bm25(t, topk, allowed) for t in texts]
+        X, pos = self.X, None
+        if allowed is not None:
+            # 허용된 행만 남긴 부분 행렬로 점수화
+            pos = np.flatnonzero(allowed)
+            X = self.X[pos]
+            if not len(pos):
+                return [[] for _ in texts]
+        Q = self.transform(texts)
+        out = []
+        for s in range(0, len(texts), BATCH_CHUNK):
+            with span("search.score"):
+                scores = (Q[s:s + BATCH_CHUNK] @ X.T).toarray()
+                top = topk_indices(scores, topk)
+            for qi in range(top.shape[0]):
+                hl = Highlighter(texts[s + qi])
+                out.append([
+                    self.format_row(rank, i if pos is None else int(pos[i]), float(scores[qi, i]), hl)
+                    for rank, i in enumerate(top[qi], start=1)
+                ])
         return out
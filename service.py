@@ -0,0 +1,317 @@
+# service.py
+"""UI 없는 검색/답변 HTTP(JSON) 서비스.
+
+    python service.py --indexdir . --port 8080 --workers 4
+
+엔드포인트:
+    POST /search        {"query": "...", "topk": 5}
+    POST /search_batch  {"queries": ["...", ...], "topk": 5}
+    POST /answer        {"query": "...", "topk": 5, "backend": "none|openai", "model": ""}
+    POST /complete      {"prefix": "...", "topk": 10}   검색어 자동 완성 (어휘/소분류/법조항)
+    GET  /healthz, GET /metrics (Prometheus 텍스트, RAG_TRACE=1일 때 값이 채워짐)
+
+부모 프로세스가 색인을 한 번 읽고 소켓을 연 뒤 worker를 fork 하므로, 색인 메모리는
+copy-on-write(또는 index_mmap/의 OS 페이지 캐시)로 공유된다. 각 worker는 asyncio 루프에서
+요청을 받고, 검색은 스레드 풀에서 돌려 타임아웃을 걸 수 있게 한다.
+동시 처리 수(--max-inflight)를 넘는 요청은 대기열(--max-queue)까지만 받고 나머지는 503으로 돌려보낸다.
+타임아웃(504)으로 응답한 요청도 스레드 풀 작업이 끝날 때까지는 처리 슬롯을 차지한다.
+부모 프로세스는 죽은 worker를 다시 fork 한다.
+"""
+import argparse, asyncio, json, os, signal, socket, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import asdict
+from http import HTTPStatus
+
+from mmap_index import open_searcher
+from rag_answer import Retriever, RetrievalCache, RAGAnswerer
+from context_pack import ContextPacker
+from autocomplete import DEFAULT_COMPLETIONS
+from tracing import trace_request, export_prometheus
+
+MAX_BODY = 1 << 20          # 요청 본문 최대 1MB
+MAX_BATCH = 1000            # /search_batch 최대 질의 수
+MAX_TOPK = 100
+HEADER_TIMEOUT = 10.0       # 요청 헤더/본문 수신 제한 (초)
+RESPAWN_DELAY = 1.0         # 죽은 worker를 다시 띄우기 전 대기 (초, 바로 죽는 worker의 fork 반복 방지)
+
+_JOBS: ContextVar = ContextVar("service_jobs", default=None)  # 현재 요청이 스레드 풀에 넣은 작업들
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _clean(v):
+    # artifacts.pkl 의 NaN 칸은 JSON으로 표현할 수 없으므로 빈 문자열로
+    if isinstance(v, float) and v != v:
+        return ""
+    return v
+
+
+def _rows_json(rows):
+    return [{k: _clean(v) for k, v in r.items()} for r in rows]
+
+
+def _topk(body, default: int = 5) -> int:
+    try:
+        k = int(body.get("topk", default))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "topk must be an integer")
+    if not 1 <= k <= MAX_TOPK:
+        raise HTTPError(400, f"topk must be between 1 and {MAX_TOPK}")
+    return k
+
+
+def _query(body, key="query") -> str:
+    q = body.get(key)
+    if not isinstance(q, str) or not q.strip():
+        raise HTTPError(400, f"'{key}' must be a non-empty string")
+    return q
+
+
+class App:
+    def __init__(self, searcher, max_inflight: int = 8, max_queue: int = 64, timeout: float = 30.0):
+        self.searcher = searcher
+        self.retriever = Retriever(searcher, cache=RetrievalCache(maxsize=1024))
+        self.packer = ContextPacker(signatures=searcher.signatures)
+        self.timeout = timeout
+        self.max_queue = max_queue
+        self._slots = None
+        self._max_inflight = max_inflight
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_inflight, thread_name_prefix="service")
+
+    async def _run(self, fn, *args):
+        """스레드 풀에서 fn 실행. 작업은 dispatch()가 기억해 두었다가 끝난 뒤에 슬롯을 돌려준다."""
+        job = self._executor.submit(fn, *args)
+        jobs = _JOBS.get()
+        if jobs is not None:
+            jobs.append(job)
+        return await asyncio.wrap_future(job)
+
+    # ----- 엔드포인트 -----
+    async def search(self, body):
+        q, k = _query(body), _topk(body)
+        rows = await self._run(self.retriever.search, q, k)
+        return {"query": q, "results": _rows_json(rows)}
+
+    async def search_batch(self, body):
+        qs, k = body.get("queries"), _topk(body)
+        if not isinstance(qs, list) or not qs or not all(isinstance(q, str) for q in qs):
+            raise HTTPError(400, "'queries' must be a non-empty list of strings")
+        if len(qs) > MAX_BATCH:
+            raise HTTPError(413, f"at most {MAX_BATCH} queries per batch")
+        res = await self._run(self.searcher.query_batch, qs, k)
+        return {"results": [_rows_json(rows) for rows in res]}
+
+    async def answer(self, body):
+        q, k = _query(body), _topk(body)
+        backend = body.get("backend", "none")
+        if backend not in ("none", "openai"):
+            raise HTTPError(400, "backend must be 'none' or 'openai'")
+        cases = await self._run(self.retriever.retrieve, q, k)
+        out = await RAGAnswerer(backend=backend, model=body.get("model", ""),
+                                 packer=self.packer).aanswer(q, cases)
+        # text(중복 판정용 전체 텍스트)는 응답에 싣지 않는다
+        return {"query": q, "cases": [{k: v for k, v in asdict(c).items() if k != "text"} for c in cases], **out}
+
+    async def complete(self, body):
+        prefix, k = body.get("prefix"), _topk(body, DEFAULT_COMPLETIONS)
+        if not isinstance(prefix, str):
+            raise HTTPError(400, "'prefix' must be a string")
+        # 정렬 배열 이진 탐색이라 키 입력마다 불러도 되므로 스레드 풀을 거치지 않는다
+        return {"prefix": prefix, "completions": [c._asdict() for c in self.searcher.completer.complete(prefix, k)]}
+
+    ROUTES = {"/search": "search", "/search_batch": "search_batch", "/answer": "answer", "/complete": "complete"}
+
+    # ----- 디스패치 (backpressure + timeout) -----
+    async def dispatch(self, method: str, path: str, body: bytes):
+        if method == "GET" and path == "/healthz":
+            return 200, {"status": "ok", "pid": os.getpid(),
+                         "index_version": getattr(self.searcher, "version", None)}
+        if method == "GET" and path == "/metrics":
+            return 200, export_prometheus()
+        name = self.ROUTES.get(path)
+        if name is None:
+            raise HTTPError(404, "not found")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "invalid JSON body")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "JSON body must be an object")
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_inflight)
+        if self._pending >= self._max_inflight + self.max_queue:
+            raise HTTPError(503, "server busy")
+        self._pending += 1
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            self._pending -= 1
+            raise
+        jobs = []
+        token = _JOBS.set(jobs)
+        try:
+            with trace_request(path):
+                try:
+                    return 200, await asyncio.wait_for(getattr(self, name)(payload), self.timeout)
+                except asyncio.TimeoutError:
+                    raise HTTPError(504, "request timed out")
+        finally:
+            _JOBS.reset(token)
+            # 기다리기를 그만둬도(504) 실행 중인 스레드는 멈추지 않으므로, 끝날 때까지 슬롯을 잡아 둔다
+            running = [asyncio.wrap_future(j) for j in jobs if not j.done()]
+            if running:
+                asyncio.ensure_future(asyncio.wait(running)).add_done_callback(lambda _: self._free())
+            else:
+                self._free()
+
+    def _free(self):
+        self._slots.release()
+        self._pending -= 1
+
+    # ----- HTTP/1.1 최소 구현 -----
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._send(writer, 400, {"error": "bad request line"}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+                try:
+                    try:
+                        length = int(headers.get("content-length", "0") or 0)
+                    except ValueError:
+                        raise HTTPError(400, "invalid Content-Length")
+                    if length < 0 or length > MAX_BODY:
+                        raise HTTPError(413, "request body too large")
+                    body = await asyncio.wait_for(reader.readexactly(length), HEADER_TIMEOUT) if length else b""
+                    status, data = await self.dispatch(method.upper(), target.split("?", 1)[0], body)
+                except HTTPError as e:
+                    status, data = e.status, {"error": str(e)}
+                    keep_alive = keep_alive and e.status < 500 and e.status != 413
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except Exception as e:  # 처리 중 예기치 못한 오류
+                    status, data, keep_alive = 500, {"error": type(e).__name__}, False
+                await self._send(writer, status, data, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _send(writer, status: int, data, keep_alive: bool):
+        if isinstance(data, str):
+            payload, ctype = data.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            payload, ctype = json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {ctype}\r\nContent-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + payload)
+        await writer.drain()
+
+
+async def _serve(app: App, sock: socket.socket):
+    server = await asyncio.start_server(app.handle, sock=sock, backlog=1024)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    async with server:
+        await stop.wait()
+
+
+def serve(searcher, host="127.0.0.1", port=8080, workers=1, **app_kw):
+    """소켓을 열고 workers개 프로세스로 fork 해서 같은 소켓/색인으로 요청을 받는다."""
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.setblocking(False)
+    if workers <= 1 or not hasattr(os, "fork"):
+        asyncio.run(_serve(App(searcher, **app_kw), sock))
+        return
+    children = set()
+    stopping = False
+
+    def _spawn():
+        pid = os.fork()
+        if pid == 0:  # worker
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                asyncio.run(_serve(App(searcher, **app_kw), sock))
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def _stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    for _ in range(workers):
+        _spawn()
+    # 죽은 worker는 다시 띄운다 (종료 신호를 받은 뒤에는 모두 끝나기만 기다림)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"worker {pid} exited (status {status}); respawning", file=sys.stderr)
+            time.sleep(RESPAWN_DELAY)
+            if not stopping:
+                _spawn()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--indexdir", default=".")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--max-inflight", type=int, default=8, help="worker당 동시 처리 요청 수")
+    ap.add_argument("--max-queue", type=int, default=64, help="worker당 대기 요청 수 (초과 시 503)")
+    ap.add_argument("--timeout", type=float, default=30.0, help="요청 처리 제한 시간 (초, 초과 시 504)")
+    args = ap.parse_args()
+    searcher = open_searcher(args.indexdir)  # fork 전에 한 번만 로드
+    searcher.completer  # 자동 완성 배열도 fork 전에 만들어 worker들이 공유
+    print(f"serving on http://{args.host}:{args.port} ({args.workers} workers)", file=sys.stderr)
+    serve(searcher, args.host, args.port, args.workers,
+          max_inflight=args.max_inflight, max_queue=args.max_queue, timeout=args.timeout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# shard_index.py
+"""샤드 색인: 말뭉치를 N개 mmap 색인으로 나눠 병렬 검색하고 상위 k를 합친다.
+
+레이아웃 (<outdir>/, 기본 index_shards/):
+    shards.json                   포맷, 샤드 이름, 샤드별 시작 행 번호(offsets)
+    vocab.* / idf.npy             전역 어휘와 IDF (모든 샤드가 공유)
+    shard-000/ ...                mmap_index.py 레이아웃의 문서 행렬/행/서명 (meta.json의 vocab_dir="..")
+
+문서 벡터는 전역 IDF로 가중한 뒤 행마다 L2 정규화하므로 샤드로 잘라도 비트 그대로이고,
+질의 벡터도 전역 어휘/IDF로 한 번만 만든다. 샤드마다 같은 TermMatrix TAAT로 점수를 내므로
+문서별 점수는 단일 색인과 비트 단위로 같다. 샤드별 상위 k(점수 내림차순, 같으면 문서 번호 순)를
+heapq.merge로 k-way 병합한다 (점수가 같은 행이 k번째 경계에 걸치면 고르는 행은 다를 수 있음).
+
+    python shard_index.py --indexdir . --shards 4          # artifacts.pkl → index_shards/
+    python shard_index.py --indexdir . --verify            # 단일 mmap 색인과 top-k 점수 비교
+"""
+import argparse, heapq, json, os
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from mmap_index import (MmapIndex, MmapSearcher, DEFAULT_MMAP_DIR, write_json,
+                        export_docs, export_vocab, vocab_completer)
+from tracing import span
+
+SHARD_FORMAT = "tfidf-shards"
+SHARD_FORMAT_VERSION = 1
+DEFAULT_SHARD_DIR = "index_shards"
+MANIFEST = "shards.json"
+
+
+def shard_bounds(n_docs: int, n_shards: int):
+    """행 0..n_docs를 연속 구간 n_shards개로 고르게 나눈 경계 (길이 n_shards + 1)."""
+    n_shards = max(1, min(n_shards, n_docs or 1))
+    return [n_docs * s // n_shards for s in range(n_shards + 1)]
+
+
+def export_shards(vec, X, rows, outdir, n_shards: int, normalized=False):
+    """학습된 TfidfVectorizer와 전체 문서 행렬을 전역 어휘/IDF 하나 + 샤드 N개로 저장."""
+    import scipy.sparse as sp
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    cfg = export_vocab(vec, outdir)
+    X = sp.csr_matrix(X)
+    bounds = shard_bounds(X.shape[0], n_shards)
+    names = []
+    for s in range(len(bounds) - 1):
+        a, b = bounds[s], bounds[s + 1]
+        name = f"shard-{s:03d}"
+        # 행 정규화는 행마다 독립이므로 샤드별로 해도 단일 색인과 같은 비트
+        export_docs(X[a:b], rows[a:b], outdir / name, cfg, normalized=normalized, vocab_dir="..")
+        names.append(name)
+    manifest = {
+        "format": SHARD_FORMAT, "version": SHARD_FORMAT_VERSION,
+        "n_docs": int(X.shape[0]), "n_terms": int(X.shape[1]),
+        "shards": names, "offsets": bounds,
+    }
+    write_json(outdir / MANIFEST, manifest)  # shards.json이 마지막에 생겨야 완성된 색인
+    return manifest
+
+
+def convert_artifacts(index_dir=".", n_shards=4, outdir=None):
+    """기존 artifacts.pkl (+ segments)을 샤드 레이아웃으로 변환."""
+    from search_tfidf import TfidfSearcher
+    s = TfidfSearcher(index_dir)
+    if s.backend != "tfidf":
+        raise ValueError("Only TF-IDF indexes can be sharded.")
+    return export_shards(s.vec, s.X, s.rows, outdir or Path(index_dir) / DEFAULT_SHARD_DIR,
+                         n_shards, normalized=True)
+
+
+def shard_top(T, offset: int, Q, topk: int, pos=None):
+    """한 샤드의 질의별 상위 k → (전역 문서 번호, 점수) 배열 (q, k'). 점수 내림차순, 같으면 문서 번호 순.
+    pos: 필터를 통과한 샤드 안 행 번호 (None이면 전부)."""
+    from search_tfidf import topk_indices
+    scores = T.scores(Q)
+    if pos is not None:
+        scores = scores[:, pos]
+    top = topk_indices(scores, topk)
+    sc = np.take_along_axis(scores, top, axis=1)
+    docs = (top if pos is None else pos[top]).astype(np.int64) + offset
+    order = np.lexsort((docs, -sc), axis=1)
+    return np.take_along_axis(docs, order, axis=1), np.take_along_axis(sc, order, axis=1)
+
+
+def merge_topk(parts, topk: int):
+    """샤드별 정렬된 [(문서, 점수)] 목록들 → 힙 k-way 병합으로 전체 상위 k."""
+    return list(islice(heapq.merge(*parts, key=lambda t: (-t[1], t[0])), topk))
+
+
+# ----- 프로세스 모드 worker (샤드는 mmap이라 worker마다 열어도 페이지 캐시를 공유) -----
+_worker = {}
+
+def _init_worker(paths):
+    _worker.update(paths=paths, T={})
+
+def _run_shard(task):
+    s, offset, Q, topk, pos = task
+    T = _worker["T"].get(s)
+    if T is None:
+        T = _worker["T"][s] = MmapIndex(_worker["paths"][s]).term_matrix()
+    return shard_top(T, offset, Q, topk, pos)
+
+
+class ShardRows:
+    """샤드별 RowStore를 전역 행 번호로 인덱싱하는 보기."""
+    def __init__(self, stores, offsets):
+        self.stores = stores
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def locate(self, i: int):
+        """전역 행 번호 → (샤드 번호, 샤드 안 행 번호)."""
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        s = int(np.searchsorted(self.offsets, i, side="right")) - 1
+        return s, i - int(self.offsets[s])
+
+    def __getitem__(self, i: int) -> dict:
+        s, j = self.locate(i)
+        return self.stores[s][j]
+
+    def field(self, i: int, name: str, default=""):
+        s, j = self.locate(i)
+        return self.stores[s].field(j, name, default)
+
+
+class ShardedSearcher:
+    """샤드 색인 위에서 MmapSearcher와 같은 query/query_batch 인터페이스.
+
+    workers: 동시에 검색할 샤드 수 (기본: min(샤드 수, CPU 수)).
+    processes=True면 스레드 대신 프로세스 풀에서 샤드를 검색한다 (GIL을 잡는 구간이 길 때).
+    """
+    def __init__(self, index_dir: str = DEFAULT_SHARD_DIR, workers=None, processes=False):
+        with span("searcher.load"):
+            self._load(index_dir)
+        self.workers = workers or min(len(self.shards), os.cpu_count() or 1)
+        self.processes = processes
+        self._pool = None
+
+    def _load(self, index_dir):
+        self.path = Path(index_dir)
+        self.manifest = json.loads((self.path / MANIFEST).read_text(encoding="utf-8"))
+        if self.manifest.get("format") != SHARD_FORMAT:
+            raise ValueError(f"Not a {SHARD_FORMAT} index: {self.path}")
+        if self.manifest.get("version", 0) > SHARD_FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard index version: {self.manifest.get('version')}")
+        self.shards = [MmapSearcher(self.path / name) for name in self.manifest["shards"]]
+        self.offsets = [int(o) for o in self.manifest["offsets"]]
+        self.rows = ShardRows([s.rows for s in self.shards], self.offsets)
+        from search_tfidf import index_version
+        self.version = index_version([self.path / MANIFEST, *(s.index.path / "X.data.npy" for s in self.shards)])
+
+    def close(self):
+        if self._pool is not None:
+            if self.processes:
+                self._pool.close()
+                self._pool.join()
+            else:
+                self._pool.shutdown()
+            self._pool = None
+
+    def transform(self, texts):
+        """질의 → 전역 어휘/IDF의 L2 정규화 TF-IDF 행 (모든 샤드가 같은 어휘를 공유하므로 한 번만)."""
+        return self.shards[0].transform(texts)
+
+    def format_row(self, rank: int, i: int, score: float, hl=None) -> dict:
+        """전역 행 번호 i의 결과 dict (doc도 전역 번호)."""
+        s, j = self.rows.locate(int(i))
+        out = self.shards[s].format_row(rank, j, score, hl)
+        out["doc"] = int(i)
+        return out
+
+    @property
+    def facets(self):
+        if getattr(self, "_facets", None) is None:
+            from facets import FacetIndex
+            self._facets = FacetIndex.from_rows(self.rows)
+        return self._facets
+
+    @property
+    def articles(self):
+        if getattr(self, "_articles", None) is None:
+            from statutes import ArticleIndex
+            self._articles = ArticleIndex.from_rows(self.rows)
+        return self._articles
+
+    @property
+    def signatures(self):
+        """샤드별 MinHash 서명을 전역 행 순서로 이어 붙인 배열."""
+        if getattr(self, "_signatures", None) is None:
+            self._signatures = np.concatenate([np.asarray(s.signatures) for s in self.shards])
+        return self._signatures
+
+    @property
+    def completer(self):
+        """검색어 자동 완성. 어휘는 전역 공유이므로 문서 빈도만 샤드별로 더한다."""
+        if getattr(self, "_completer", None) is None:
+            df = sum(np.diff(s.T.ptr) for s in self.shards)
+            self._completer = vocab_completer(self.shards[0].index, df, self.rows)
+        return self._completer
+
+    def _allowed(self, filters):
+        """MmapSearcher._allowed와 같은 facet/조문 필터 마스크 (전역 행 기준)."""
+        if not filters or not any(filters.values()):
+            return None
+        with span("search.facets"):
+            filters = dict(filters)
+            article = filters.pop("article", None)
+            allowed = self.facets.to_bool(self.facets.mask(filters))
+            if article:
+                allowed &= self.articles.mask(article)
+            return allowed
+
+    def _map(self, tasks):
+        if self.workers <= 1 or len(tasks) <= 1:
+            return [self._run_local(t) for t in tasks]
+        if self._pool is None:
+            if self.processes:
+                paths = [str(s.index.path) for s in self.shards]
+                ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else mp
+                self._pool = ctx.Pool(self.workers, initializer=_init_worker, initargs=(paths,))
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="shard")
+        if self.processes:
+            return self._pool.map(_run_shard, tasks)
+        return list(self._pool.map(self._run_local, tasks))
+
+    def _run_local(self, task):
+        s, offset, Q, topk, pos = task
+        return shard_top(self.shards[s].T, offset, Q, topk, pos)
+
+    def query(self, text: str, topk: int = 10, filters=None):
+        return self.query_batch([text], topk, filters)[0]
+
+    def query_batch(self, texts, topk: int = 10, filters=None):
+        from search_tfidf import BATCH_CHUNK
+        from snippets import Highlighter
+        texts = list(texts)
+        if not texts:
+            return []
+        allowed = self._allowed(filters)
+        pos = [None] * len(self.shards)
+        if allowed is not None:
+            pos = [np.flatnonzero(allowed[a:b]) for a, b in zip(self.offsets, self.offsets[1:])]
+        live = [s for s in range(len(self.shards)) if pos[s] is None or len(pos[s])]
+        if not live:
+            return [[] for _ in texts]
+        Q = self.transform(texts)
+        out = []
+        for c in range(0, len(texts), BATCH_CHUNK):
+            q = Q[c:c + BATCH_CHUNK]
+            with span("search.score"):
+                res = self._map([(s, self.offsets[s], q, topk, pos[s]) for s in live])
+            with span("search.merge"):
+                for qi in range(q.shape[0]):
+                    parts = [list(zip(docs[qi].tolist(), sc[qi].tolist())) for docs, sc in res]
+                    hl = Highlighter(texts[c + qi])
+                    out.append([self.format_row(rank, i, score, hl)
+                                for rank, (i, score) in enumerate(merge_topk(parts, topk), start=1)])
+        return out
+
+
+def verify(index_dir=".", shard_dir=None, mmap_dir=None, queries=None, limit=1000, topk=10):
+    """단일 mmap 색인과 샤드 색인의 질의별 top-k 점수를 비트 단위로 비교.
+    반환: (질의 수, 점수 불일치 질의 수, 문서 불일치 질의 수). 문서 불일치는 동점 경계에서만 생길 수 있다."""
+    from search_tfidf import topk_indices
+    from mmap_index import _bits, _cell
+    ref = MmapSearcher(mmap_dir or Path(index_dir) / DEFAULT_MMAP_DIR)
+    sh = ShardedSearcher(shard_dir or Path(index_dir) / DEFAULT_SHARD_DIR)
+    if len(ref.rows) != len(sh.rows):
+        raise ValueError(f"row count differs: {len(ref.rows)} vs {len(sh.rows)} (re-run conversion)")
+    if queries is None:
+        queries = [_cell(ref.rows.field(i, k)) for i in range(min(limit, len(ref.rows))) for k in ("fact", "rationale")]
+    Q = ref.transform(queries)
+    bad_score = bad_doc = 0
+    for c in range(0, len(queries), 256):
+        q = Q[c:c + 256]
+        scores = ref.T.scores(q)
+        top = topk_indices(scores, topk)
+        res = sh._map([(s, sh.offsets[s], q, topk, None) for s in range(len(sh.shards))])
+        for qi in range(q.shape[0]):
+            merged = merge_topk([list(zip(d[qi].tolist(), v[qi].tolist())) for d, v in res], topk)
+            a = scores[qi, top[qi]]
+            b = np.asarray([v for _, v in merged], dtype=np.float64)
+            if not np.array_equal(_bits(a), _bits(b)):
+                bad_score += 1
+            elif sorted(top[qi].tolist()) != sorted(i for i, _ in merged):
+                bad_doc += 1
+    sh.close()
+    return len(queries), bad_score, bad_doc
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--indexdir", default=".", help="artifacts.pkl 위치")
+    ap.add_argument("--outdir", default=None, help=f"기본값: <indexdir>/{DEFAULT_SHARD_DIR}")
+    ap.add_argument("--shards", type=int, default=4)
+    ap.add_argument("--verify", action="store_true",
+                    help=f"변환 대신 <indexdir>/{DEFAULT_MMAP_DIR}(단일 색인)과 top-k 점수가 비트 단위로 같은지 검사")
+    ap.add_argument("--queries", default=None, help="--verify 질의 파일 (한 줄에 하나, 기본: 사례 본문)")
+    args = ap.parse_args()
+    if args.verify:
+        queries = None
+        if args.queries:
+            with open(args.queries, encoding="utf-8") as f:
+                queries = [l.rstrip("\n") for l in f if l.strip()]
+        n, bad, ties = verify(args.indexdir, args.outdir, queries=queries)
+        print(f"verified {n} queries: {bad} score mismatches, {ties} tie-order differences")
+        raise SystemExit(1 if bad else 0)
+    m = convert_artifacts(args.indexdir, args.shards, args.outdir)
+    print(f"exported {m['n_docs']} docs / {m['n_terms']} terms into {len(m['shards'])} shards")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# snippets.py
+"""질의 중심 요약문(snippet)과 키워드 강조.
+
+- Matcher: 질의어/키워드 전체로 Aho-Corasick 오토마톤을 만들어 텍스트를 한 번만 훑는다.
+  키워드 수와 상관없이 텍스트 길이에 선형 (+ 일치 수).
+- best_window: 일치 위치 목록 위를 두 포인터로 훑어, 고정 폭 안에 서로 다른 질의어가
+  가장 많이(긴 질의어일수록 가중) 들어가는 구간을 고른다.
+- Highlighter: 질의 → Matcher를 한 번 만들고 snippet/HTML/Markdown 렌더링을 제공.
+  사례 목록(Streamlit)과 HTML 보고서가 같은 구간/강조를 쓴다.
+"""
+from __future__ import annotations
+import html
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+SNIPPET_WIDTH = 180
+ELLIPSIS = "…"
+
+_TOKEN = re.compile(r"[0-9A-Za-z가-힣§]+")
+# 질의어 끝의 조사 (긴 것부터). 떼고 남은 말이 2글자 이상일 때만 뗀다
+_JOSA = ("에서는", "에서", "으로", "에게", "까지", "부터", "이나", "과", "와", "을", "를",
+         "이", "가", "은", "는", "에", "의", "로", "도", "만")
+_MD_SPECIAL = re.compile(r"([\\`*_\[\]<>#|~$])")
+
+
+def query_patterns(query: str, min_len: int = 2) -> List[str]:
+    """자유 질의 → 강조할 질의어 목록 (조사 제거, 중복 제거, 순서 유지)."""
+    out: List[str] = []
+    for tok in _TOKEN.findall(query or ""):
+        tok = tok.lower()
+        for j in _JOSA:
+            if tok.endswith(j) and len(tok) - len(j) >= 2:
+                tok = tok[:-len(j)]
+                break
+        if len(tok) >= min_len and tok not in out:
+            out.append(tok)
+    return out
+
+
+def _lower(ch: str) -> str:
+    # 위치가 어긋나지 않도록 한 글자가 여러 글자로 바뀌는 경우('İ' 등)는 그대로 둔다
+    c = ch.lower()
+    return c if len(c) == 1 else ch
+
+
+class Matcher:
+    """대소문자 무시 Aho-Corasick 다중 패턴 매처."""
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        for p in patterns:
+            p = "".join(_lower(c) for c in (p or "").strip())
+            if p and p not in self.patterns:
+                self.patterns.append(p)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[int]] = [[]]
+        for pid, p in enumerate(self.patterns):
+            s = 0
+            for c in p:
+                nxt = self._goto[s].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[s][c] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                s = nxt
+            self._out[s].append(pid)
+        # 실패 링크 (BFS)
+        self._fail = [0] * len(self._goto)
+        q = deque(self._goto[0].values())
+        while q:
+            s = q.popleft()
+            for c, t in self._goto[s].items():
+                q.append(t)
+                f = self._fail[s]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[t] = self._goto[f].get(c, 0)
+                self._out[t] = self._out[t] + self._out[self._fail[t]]
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """(시작, 끝, 패턴 번호) — 끝 위치 순. 겹치는 일치도 모두 낸다."""
+        goto, fail, out, pats = self._goto, self._fail, self._out, self.patterns
+        low = text.lower()
+        if len(low) != len(text):
+            low = "".join(_lower(c) for c in text)
+        s = 0
+        for i, c in enumerate(low):
+            while s and c not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(c, 0)
+            for pid in out[s]:
+                yield i + 1 - len(pats[pid]), i + 1, pid
+
+
+def best_window(matches: Sequence[Tuple[int, int, int]], n: int, width: int,
+                weights: Sequence[float]) -> Tuple[int, int]:
+    """길이 n 텍스트에서 폭 width 구간 (시작, 끝). matches는 시작 위치 순."""
+    if n <= width:
+        return 0, n
+    if not matches:
+        return 0, width
+    counts: Dict[int, int] = {}
+    score, best, best_i, best_j = 0.0, -1.0, 0, 1
+    j = 0
+    for i, (s, _, _) in enumerate(matches):
+        j = max(j, i)
+        while j < len(matches) and matches[j][1] <= s + width:
+            pid = matches[j][2]
+            score += weights[pid] if not counts.get(pid) else 0.1  # 같은 질의어 반복은 조금만
+            counts[pid] = counts.get(pid, 0) + 1
+            j += 1
+        if j > i and score > best:
+            best, best_i, best_j = score, i, j
+        if j > i:  # matches[i]를 창에서 뺀다
+            pid = matches[i][2]
+            counts[pid] -= 1
+            score -= weights[pid] if not counts[pid] else 0.1
+    # 고른 일치들이 가운데 오도록 여유를 앞뒤로 나눈다
+    lo = matches[best_i][0]
+    hi = max(e for _, e, _ in matches[best_i:best_j])
+    start = max(0, lo - (width - (hi - lo)) // 2)
+    end = min(n, start + width)
+    return max(0, end - width), end
+
+
+def _merge_spans(spans: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    for s, e in sorted(spans):
+        if out and s <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], e))
+        else:
+            out.append((s, e))
+    return out
+
+
+@dataclass
+class Snippet:
+    text: str
+    spans: List[Tuple[int, int]] = field(default_factory=list)  # text 안의 강조 구간
+    head: bool = False  # 앞이 잘렸는지
+    tail: bool = False  # 뒤가 잘렸는지
+    score: float = 0.0  # 구간 안의 서로 다른 질의어 가중치 합
+
+    def plain(self) -> str:
+        return (ELLIPSIS if self.head else "") + self.text + (ELLIPSIS if self.tail else "")
+
+    def html(self, tag: str = "mark") -> str:
+        parts, pos = [], 0
+        for s, e in self.spans:
+            parts.append(html.escape(self.text[pos:s]))
+            parts.append(f"<{tag}>{html.escape(self.text[s:e])}</{tag}>")
+            pos = e
+        parts.append(html.escape(self.text[pos:]))
+        return (ELLIPSIS if self.head else "") + "".join(parts) + (ELLIPSIS if self.tail else "")
+
+    def markdown(self) -> str:
+        esc = lambda t: _MD_SPECIAL.sub(r"\\\1", t)
+        parts, pos = [], 0
+        for s, e in self.spans:
+            parts.append(esc(self.text[pos:s]))
+            parts.append(f"**{esc(self.text[s:e])}**")
+            pos = e
+        parts.append(esc(self.text[pos:]))
+        return (ELLIPSIS if self.head else "") + "".join(parts) + (ELLIPSIS if self.tail else "")
+
+
+class Highlighter:
+    """질의(자유 텍스트)와 키워드 목록으로 한 번 만들어 여러 사례에 재사용한다."""
+    def __init__(self, query: str = "", keywords: Sequence[str] = ()):
+        self.matcher = Matcher([*query_patterns(query), *keywords])
+        self.weights = [float(len(p)) for p in self.matcher.patterns]
+
+    def __bool__(self):
+        return bool(self.matcher)
+
+    def snippet(self, text, width: Optional[int] = SNIPPET_WIDTH) -> Snippet:
+        """질의어가 가장 많이 모인 width 글자 구간과 그 안의 강조 구간. width=None이면 전체."""
+        text = text if isinstance(text, str) else ""
+        matches = sorted(self.matcher.finditer(text)) if self.matcher else []
+        if width is None:
+            start, end = 0, len(text)
+        else:
+            start, end = best_window(matches, len(text), width, self.weights)
+        inside = [(s, e, p) for s, e, p in matches if s >= start and e <= end]
+        return Snippet(
+            text=text[start:end],
+            spans=_merge_spans((s - start, e - start) for s, e, _ in inside),
+            head=start > 0, tail=end < len(text),
+            score=sum(self.weights[p] for p in {p for _, _, p in inside}),
+        )
+
+    def best(self, texts: Sequence, width: int = SNIPPET_WIDTH) -> Snippet:
+        """여러 필드(사실관계, 해설 …) 중 점수가 가장 높은 snippet (같으면 앞 필드)."""
+        best = None
+        for t in texts:
+            sn = self.snippet(t, width)
+            if best is None or sn.score > best.score:
+                best = sn
+        return best or Snippet("")
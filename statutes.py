@@ -0,0 +1,173 @@
+# statutes.py
+"""법조항 인용 파서와 조문 색인.
+
+"공직선거법 §82의7", "제60조의3", "§58, §254" 같은 자유 텍스트를 (법률, 조, 의N) 키로 정규화한다.
+키는 튜플이므로 정렬 순서가 곧 조문 순서이고(§93 < §93의2 < §930), 부분문자열 검사와 달리
+§93으로 §930이 걸리지 않는다.
+
+ArticleIndex는 키 → 행 번호 해시와 정렬된 키 배열을 함께 두어
+정확 조회(O(1))와 범위 조회(§58–§60, 이진 탐색)를 지원한다.
+"""
+from __future__ import annotations
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 약칭 → 법률명
+LAW_ALIASES = {
+    "공선법": "공직선거법",
+    "선거법": "공직선거법",
+    "정자법": "정치자금법",
+}
+
+_MAX_SUB = 10 ** 6  # 범위 상한용 (§60 까지 → §60의N 포함)
+
+_CITE_RE = re.compile(
+    r"(?P<law>[가-힣A-Za-z]+법)?\s*(?:제\s*(?P<a1>\d+)\s*조|§\s*(?P<a2>\d+))(?:\s*의\s*(?P<sub>\d+))?"
+)
+# "§58–§60", "제58조~제60조", "§58-60", "58조-60조", "제58조부터 제60조까지"
+# 앞쪽 끝에는 제/§/조 표시가 있어야 한다 (표시 없는 "20-30"은 조문 범위가 아님)
+_RANGE_RE = re.compile(
+    r"(?P<law>[가-힣A-Za-z]+법)?\s*(?=[제§]|\d+\s*조)(?:제\s*|§\s*)?(?P<lo>\d+)\s*조?(?:\s*의\s*(?P<losub>\d+))?"
+    r"\s*(?:[-–~〜]|부터)\s*(?:제\s*|§\s*)?(?P<hi>\d+)\s*조?(?:\s*의\s*(?P<hisub>\d+))?\s*(?:까지)?"
+)
+
+
+class ArticleKey(NamedTuple):
+    law: str      # 법률명 ("" = 미상)
+    article: int  # 조
+    sub: int      # 의N (없으면 0)
+
+
+def _law(name: Optional[str]) -> str:
+    return LAW_ALIASES.get(name, name) if name else ""
+
+
+def parse_citations(text, default_law: str = "") -> List[ArticleKey]:
+    """텍스트 안의 조문 인용 → 키 목록 (순서 유지, 중복 제거).
+    법률명이 생략된 조문은 앞 인용(없으면 default_law)의 법률명을 따른다.
+
+    >>> parse_citations("공직선거법 §58, 제254조")
+    [ArticleKey(law='공직선거법', article=58, sub=0), ArticleKey(law='공직선거법', article=254, sub=0)]
+    """
+    if not isinstance(text, str) or not text.strip():
+        return []
+    out: List[ArticleKey] = []
+    law = _law(default_law)
+    for m in _CITE_RE.finditer(text):
+        law = _law(m.group("law")) or law
+        key = ArticleKey(law, int(m.group("a1") or m.group("a2")), int(m.group("sub") or 0))
+        if key not in out:
+            out.append(key)
+    return out
+
+
+def format_key(key: ArticleKey) -> str:
+    """ArticleKey → "공직선거법 §60의3"."""
+    sub = f"의{key.sub}" if key.sub else ""
+    return f"{key.law} §{key.article}{sub}".strip()
+
+
+def parse_article_query(text: str) -> List[Tuple[ArticleKey, ArticleKey]]:
+    """조문 질의 → 포함 범위 [(하한, 상한)] 목록 (질의에 나온 순서, 중복 제거).
+
+    "§93" 은 §93 한 조만, "§58–§60" 은 §58부터 §60의N까지, "§60의3" 은 그 조만.
+    범위와 단일 조문을 섞어 여러 개 쓸 수 있다("§58–§60, §93, §250~§252").
+    법률명이 생략된 항목은 앞 항목의 법률명을 따르고, 처음부터 없으면 law="" 로 두어
+    ArticleIndex가 모든 법률에 적용한다.
+    """
+    text = text or ""
+    found = []  # (위치, 법률명, (하한 조, 의N), (상한 조, 의N))
+    for m in _RANGE_RE.finditer(text):
+        a, b = sorted([(int(m.group("lo")), m.group("losub")), (int(m.group("hi")), m.group("hisub"))],
+                      key=lambda e: (e[0], int(e[1] or 0)))
+        # 상한에 의N이 없으면 그 조의 가지 조문(§60의3 등)까지 포함
+        found.append((m.start(), m.group("law"), (a[0], int(a[1] or 0)), (b[0], int(b[1] or _MAX_SUB))))
+    # 범위를 지운(같은 길이 공백) 나머지에서 단일 조문
+    rest = _RANGE_RE.sub(lambda m: " " * len(m.group()), text)
+    for m in _CITE_RE.finditer(rest):
+        key = (int(m.group("a1") or m.group("a2")), int(m.group("sub") or 0))
+        found.append((m.start(), m.group("law"), key, key))
+    out: List[Tuple[ArticleKey, ArticleKey]] = []
+    law = ""
+    for _, name, lo, hi in sorted(found, key=lambda e: e[0]):
+        law = _law(name) or law
+        pair = (ArticleKey(law, *lo), ArticleKey(law, *hi))
+        if pair not in out:
+            out.append(pair)
+    return out
+
+
+def row_citation_text(row) -> str:
+    """rows 항목에서 인용 텍스트 (clause + law/article 필드)."""
+    parts = []
+    for k in ("clause", "law", "article"):
+        v = row.get(k) if hasattr(row, "get") else None
+        if isinstance(v, str) and v.strip():
+            parts.append(v)
+    return " ".join(parts)
+
+
+class ArticleIndex:
+    def __init__(self, texts: Sequence[str]):
+        """texts[i] = i번째 행의 인용 텍스트."""
+        self.n = len(texts)
+        postings: Dict[ArticleKey, List[int]] = {}
+        self.row_keys: List[List[ArticleKey]] = []
+        for i, t in enumerate(texts):
+            keys = parse_citations(t)
+            self.row_keys.append(keys)
+            for k in keys:
+                postings.setdefault(k, []).append(i)
+        self.postings = {k: np.asarray(v, dtype=np.int32) for k, v in postings.items()}
+        self.keys = sorted(self.postings)                  # 범위 조회용
+        self.laws = sorted({k.law for k in self.keys})
+
+    @classmethod
+    def from_rows(cls, rows) -> "ArticleIndex":
+        return cls([row_citation_text(rows[i]) for i in range(len(rows))])
+
+    def exact(self, key: ArticleKey) -> np.ndarray:
+        """한 조문의 행 번호 (오름차순)."""
+        if not key.law:
+            return self._union(self.postings.get(key._replace(law=law)) for law in self.laws)
+        return self.postings.get(key, np.empty(0, dtype=np.int32))
+
+    def range(self, lo: ArticleKey, hi: ArticleKey) -> np.ndarray:
+        """lo ≤ 키 ≤ hi 인 조문의 행 번호. 법률명이 없으면 모든 법률에 적용."""
+        laws = [lo.law] if lo.law else self.laws
+        found = []
+        for law in laws:
+            a = bisect_left(self.keys, lo._replace(law=law))
+            b = bisect_right(self.keys, hi._replace(law=law))
+            found.extend(self.postings[k] for k in self.keys[a:b])
+        return self._union(found)
+
+    def lookup(self, query: str) -> np.ndarray:
+        """조문 질의 문자열("공직선거법 §93", "§58–§60", "§82의7, §86") → 행 번호."""
+        return self._union(self.exact(lo) if lo == hi else self.range(lo, hi)
+                           for lo, hi in parse_article_query(query))
+
+    def mask(self, query: str) -> np.ndarray:
+        """lookup 결과를 행 수 길이 bool 마스크로 (facet 필터와 AND 용)."""
+        m = np.zeros(self.n, dtype=bool)
+        m[self.lookup(query)] = True
+        return m
+
+    def related(self, i: int) -> np.ndarray:
+        """i번째 행과 같은 조문을 인용한 다른 행들."""
+        pos = self._union(self.postings[k] for k in self.row_keys[i])
+        return pos[pos != i]
+
+    def related_to(self, citation: str) -> np.ndarray:
+        """인용 텍스트(예: RetrievedCase의 law/article)와 같은 조문을 가진 행들."""
+        return self._union(self.exact(k) for k in parse_citations(citation))
+
+    @staticmethod
+    def _union(arrays: Iterable[Optional[np.ndarray]]) -> np.ndarray:
+        arrays = [a for a in arrays if a is not None and len(a)]
+        if not arrays:
+            return np.empty(0, dtype=np.int32)
+        return arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
@@ -1,7 +1,14 @@
 # streamlit_rag_app_v2.py
 import streamlit as st
-from search_tfidf import TfidfSearcher
-from rag_answer import Retriever, RAGAnswerer, DISCLAIMER
+from mmap_index import open_searcher, searcher_files
+from hot_reload import VersionedHandle
+from rag_answer import Retriever, RetrievalCache, RAGAnswerer, DISCLAIMER
+from context_pack import ContextPacker, DEFAULT_TOKEN_BUDGET
+from answer_cache import AnswerCache, CachedAnswerer
+from report_html import build_html, make_report
+from snippets import Highlighter
+from tracing import trace_request, enabled as tracing_enabled, export_prometheus, export_json
+from contextlib import nullcontext
 from datetime import datetime
 
 st.set_page_config(page_title="선거법 RAG 안내 데모", page_icon="🗳️", layout="wide")
@@ -15,101 +22,150 @@ with st.sidebar:
     backend = st.selectbox("답변 백엔드", ["none","openai"], index=0, help="'none'은 LLM 없이 템플릿 요약")
     model = st.text_input("OpenAI 모델명", value="gpt-4o-mini")
     topk = st.slider("참고 사례 수", 3, 15, 6)
+    article_filter = st.text_input("조문 필터", value="", placeholder="예: 공직선거법 §93, §58–§60",
+                                   help="해당 조문을 인용한 사례 안에서만 검색")
+    cache_threshold = st.slider("답변 캐시 유사도 기준", 0.5, 1.0, 0.9, 0.01,
+                                help="같은 사례가 검색되고 질문 유사도가 기준 이상이면 이전 LLM 답변을 재사용")
+    token_budget = st.slider("컨텍스트 토큰 예산", 500, 8000, DEFAULT_TOKEN_BUDGET, 250,
+                             help="LLM 프롬프트에 넣을 사례 분량 상한 (점수 순으로 채우고 거의 같은 사례는 뺌)")
+
+def load_searcher():
+    searcher = open_searcher(index_dir=".")
+    searcher.completer  # 자동 완성 배열도 교체 전에 만들어 둔다
+    return searcher
 
 @st.cache_resource(show_spinner=True)
-def get_searcher():
-    return TfidfSearcher(index_dir=".")
-
-searcher = get_searcher()
-retriever = Retriever(searcher)
-
-user_query = st.text_area("문안/행사 계획/질문", height=140, placeholder="예: 선거일 20일 전, 지역축제에서 현수막과 유인물을 배포하려 합니다. 허용 범위가 궁금합니다.")
-
-col1, col2 = st.columns([1,1])
-with col1:
-    run = st.button("검색 + RAG 안내 생성")
-with col2:
-    clear = st.button("초기화")
-    if clear:
-        st.experimental_rerun()
-
-if run and not user_query:
-    st.warning("질문 또는 문안을 입력하세요.")
-
-report_block = None
-if run and user_query:
-    with st.spinner("사례 검색 중…"):
-        cases = retriever.retrieve(user_query, topk=topk)
-    st.subheader("참고 사례")
-    for i, c in enumerate(cases, start=1):
-        with st.container(border=True):
-            st.markdown(f"**{i}. {c.id}** · {c.law} {c.article} · {c.penalty} · score={c.score}")
-            st.markdown(f"요지: {c.fact}…")
-            if c.source_url:
-                st.markdown(f"[출처]({c.source_url})")
-
-    with st.spinner("RAG 안내 생성 중…"):
-        answerer = RAGAnswerer(backend=backend, model=model)
-        out = answerer.answer(user_query, cases)
-
-    st.subheader("안내 결과")
-    if out.get("mode") == "template":
-        st.markdown("**요약**: " + out["summary"])
-        st.markdown("**가이드**:\n" + out["guidance"])
-        st.markdown("**인용/출처**:\n" + "\n".join(out["citations"]))
-        st.info(DISCLAIMER)
-        # Report payload
-        report_block = {
-            "query": user_query,
-            "advice": out["guidance"],
-            "citations": out["citations"],
-            "cases": cases,
-            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
-    else:
-        st.markdown(out.get("answer","(응답 없음)"))
-        st.info(DISCLAIMER)
-        report_block = {
-            "query": user_query,
-            "llm_answer": out.get("answer",""),
-            "cases": cases,
-            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M")
-        }
-
-# ===== Report (HTML download) =====
-if report_block:
-    import html
-    def build_html(rep):
-        def case_li(c):
-            src = f'<a href="{html.escape(c.source_url)}" target="_blank">원문</a>' if c.source_url else ""
-            return f"<li><b>{html.escape(c.id)}</b> — {html.escape(c.law)} {html.escape(c.article)} / {html.escape(c.penalty)} {src}</li>"
-        cases_html = "\n".join(case_li(c) for c in rep["cases"])
-        body = f"""
-        <html><head><meta charset='utf-8'><style>
-        body{{font-family:Pretendard,Arial,sans-serif;max-width:900px;margin:40px auto;line-height:1.6;}}
-        h1{{color:#0a67b5;}}
-        .box{{border:1px solid #e5e7eb;border-radius:12px;padding:16px;margin:12px 0;}}
-        .muted{{color:#64748b;font-size:12px}}
-        </style></head><body>
-        <h1>선거법 RAG 안내 (보고서)</h1>
-        <p class='muted'>생성시각: {rep['generated_at']}</p>
-        <div class='box'><b>입력</b><br>{html.escape(rep['query'])}</div>
-        {('<div class="box"><b>LLM 답변</b><br>'+rep.get('llm_answer','').replace('\n','<br>')+'</div>') if rep.get('llm_answer') else ''}
-        {('<div class="box"><b>가이드</b><br>'+rep.get('advice','').replace('\n','<br>')+'</div>') if rep.get('advice') else ''}
-        <div class='box'><b>인용/출처</b><ul>{cases_html}</ul></div>
-        <p class='muted'>※ 본 보고서는 법률 자문이 아니며, 사례/판례/선관위 자료 기반 참고 안내입니다.</p>
-        </body></html>
-        """
-        return body
-
-    html_blob = build_html(report_block)
-    st.download_button(
-        label="리포트 저장 (HTML)",
-        data=html_blob.encode("utf-8"),
-        file_name="electionlaw_rag_report.html",
-        mime="text/html"
-    )
-    st.caption("※ HTML을 열어 브라우저 인쇄 → PDF 저장을 권장합니다.")
+def get_searcher_handle():
+    # index_mmap/ 이 있으면 mmap 색인을 공유해서 쓰고, 없으면 artifacts.pkl 로드.
+    # 색인 파일이 바뀌면 백그라운드에서 새 버전을 읽어 교체 (진행 중인 실행은 빌린 옛 버전으로 끝남)
+    return VersionedHandle(load_searcher, lambda: searcher_files("."), interval=30)
+
+@st.cache_resource
+def get_retrieval_cache():
+    # 세션/재실행 간 공유되는 검색 결과 캐시 (색인 버전이 바뀌면 자동 무효화)
+    return RetrievalCache(maxsize=512, ttl=1800)
+
+@st.cache_resource
+def get_answer_cache():
+    # LLM 답변 의미 캐시 (로컬 SQLite, 프로세스 내 공유). 질의 벡터/유사도 기준은 실행마다 CachedAnswerer가 넘긴다
+    return AnswerCache()
+
+handle = get_searcher_handle()
+lease = handle.acquire()  # 이번 실행 동안 쓸 색인 버전 (스크립트 끝의 finally에서 반납)
+searcher = lease.obj
+try:
+    answer_cache = get_answer_cache()
+    retrieval_cache = get_retrieval_cache()
+    retriever = Retriever(searcher, cache=retrieval_cache)
+
+    def apply_completion():
+        # 자동 완성 선택 → 질문의 마지막 단어를 바꾼다
+        picked = st.session_state.get("query_completion")
+        if picked:
+            text = st.session_state.get("user_query", "")
+            st.session_state["user_query"] = text[:len(text) - len(text.split()[-1])] + picked if text.split() else picked
+            st.session_state["query_completion"] = None
+
+    user_query = st.text_area("문안/행사 계획/질문", height=140, key="user_query", placeholder="예: 선거일 20일 전, 지역축제에서 현수막과 유인물을 배포하려 합니다. 허용 범위가 궁금합니다.")
+    # 입력 중인 마지막 단어의 자동 완성 (어휘/소분류/법조항, 사례 수 순)
+    if user_query and not user_query[-1].isspace():
+        completions = searcher.completer.complete(user_query.split()[-1])
+        if completions:
+            st.pills("자동 완성", [c.text for c in completions], key="query_completion",
+                     on_change=apply_completion, label_visibility="collapsed")
+
+    col1, col2 = st.columns([1,1])
+    with col1:
+        run = st.button("검색 + RAG 안내 생성")
+    with col2:
+        clear = st.button("초기화")
+        if clear:
+            st.experimental_rerun()
+
+    if run and not user_query:
+        st.warning("질문 또는 문안을 입력하세요.")
+
+    # 요청 단위 구간 계측 (RAG_TRACE=1일 때만 기록)
+    with (trace_request("rag_app") if run and user_query else nullcontext()):
+        report_block = None
+        if run and user_query:
+            with st.spinner("사례 검색 중…"):
+                cases = retriever.retrieve(user_query, topk=topk, article=article_filter.strip() or None)
+            if article_filter.strip() and not cases:
+                st.info(f"'{article_filter}' 조문을 인용한 사례가 없습니다.")
+            st.subheader("참고 사례")
+            hl = Highlighter(user_query)
+            for i, c in enumerate(cases, start=1):
+                with st.container(border=True):
+                    st.markdown(f"**{i}. {c.id}** · {c.law} {c.article} · {c.penalty} · score={c.score}")
+                    st.markdown(f"요지: {hl.snippet(c.snippet or c.fact, None).markdown()}")
+                    if c.source_url:
+                        st.markdown(f"[출처]({c.source_url})")
+                    related = retriever.related(c, topk=5)
+                    if related:
+                        with st.expander(f"같은 조문 사례 ({c.clause or c.law + ' ' + c.article})"):
+                            for r in related:
+                                st.markdown(f"- {r.id} · {r.clause or r.law + ' ' + r.article} — {r.fact}")
+
+            packer = ContextPacker(budget=token_budget, signatures=searcher.signatures)
+            answerer = CachedAnswerer(RAGAnswerer(backend=backend, model=model, packer=packer), answer_cache,
+                                      threshold=cache_threshold, searcher=searcher)
+            st.subheader("안내 결과")
+            out = answerer.lookup(user_query, cases)
+            streamed = out is None and answerer.answerer.uses_llm
+            if out is not None:
+                st.caption(f"※ 유사 질문(유사도 {out['similarity']})의 저장된 답변입니다.")
+            elif streamed:
+                # LLM 응답은 토큰 단위로 바로 그려서 첫 토큰까지의 지연만 체감되게 한다
+                packed = answerer.answerer.pack(cases)
+                text = st.write_stream(answerer.answerer.answer_stream(user_query, packed.cases))
+                out = {"mode": "openai", "answer": (text or "").strip(), "disclaimer": DISCLAIMER,
+                       **answerer.answerer.context_info(packed)}
+                answerer.store(user_query, cases, out)
+            else:
+                with st.spinner("RAG 안내 생성 중…"):
+                    out = answerer.answer(user_query, cases)
+            if out.get("dropped"):
+                why = {"duplicate": "중복", "budget": "토큰 예산 초과"}
+                st.caption("※ 답변 근거에서 제외: " + ", ".join(
+                    f"{d['rank']}. {d['id']} ({why.get(d['reason'], d['reason'])})" for d in out["dropped"]))
+
+            if out.get("mode") == "template":
+                st.markdown("**요약**: " + out["summary"])
+                st.markdown("**가이드**:\n" + out["guidance"])
+                st.markdown("**인용/출처**:\n" + "\n".join(out["citations"]))
+                st.info(DISCLAIMER)
+            else:
+                if not streamed:
+                    st.markdown(out.get("answer","(응답 없음)"))
+                st.info(DISCLAIMER)
+            # Report payload
+            report_block = make_report(user_query, out, cases, datetime.now().strftime("%Y-%m-%d %H:%M"))
+
+        # ===== Report (HTML download) =====
+        if report_block:
+            html_blob = build_html(report_block)
+            st.download_button(
+                label="리포트 저장 (HTML)",
+                data=html_blob.encode("utf-8"),
+                file_name="electionlaw_rag_report.html",
+                mime="text/html"
+            )
+            st.caption("※ HTML을 열어 브라우저 인쇄 → PDF 저장을 권장합니다.")
+
+    with st.sidebar:
+        cs = retrieval_cache.stats()
+        st.caption(f"검색 캐시: hit {cs['hits']} · miss {cs['misses']} · {cs['size']}건 (hit rate {cs['hit_rate']})")
+        hs = handle.status()
+        st.caption(f"색인 버전 {lease.version}" + (" · 새 버전 읽는 중" if hs["loading"] else "")
+                   + (f" · 갱신 실패: {hs['error']}" if hs["error"] else ""))
+        if tracing_enabled():
+            with st.expander("성능 지표 (구간별 지연)"):
+                st.code(export_prometheus(), language="text")
+                st.download_button("JSON 내보내기", data=export_json().encode("utf-8"),
+                                   file_name="rag_metrics.json", mime="application/json")
+finally:
+    lease.release()
 
 st.markdown("---")
 st.caption("© 학습·연구용. 법률 자문 아님. 정치적 중립을 지키며 출처를 명확히 표기합니다.")
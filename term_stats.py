@@ -0,0 +1,154 @@
+# term_stats.py
+"""추천 키워드용 단어 빈도 통계 (전체 + 대분류별).
+
+색인 빌드 때 term_stats.json 으로 저장하고, --append 로 사례가 추가되면 새 사례만 세어 더한다.
+빈도는 불용어를 빼지 않은 원래 값으로 두고 불용어는 순위를 만들 때만 적용하므로,
+불용어 목록을 바꿔도 다시 셀 필요가 없다. 순위는 갱신/로드 시 한 번 정렬해 두므로
+top(N)은 앞에서 N개를 자르는 것뿐이다.
+
+순위는 Counter.most_common과 같이 빈도 내림차순, 같으면 코퍼스에 처음 나온 순서다.
+sources에는 통계를 센 입력 CSV들의 내용 해시(sha1)를 순서대로 남겨, 앱이 자기 CSV와 같은 데이터로
+만든 통계인지 확인할 수 있게 한다 (해시를 모르는 예전 파일은 빈 목록).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+TERM_STATS_FILE = "term_stats.json"
+FORMAT_VERSION = 1
+
+STOP_WORDS = {'이', '그', '저', '것', '수', '등', '및', '의', '을', '를', '이다', '있다', '하다'}
+
+# 추천 키워드 대상: 2글자 이상 한글 단어
+_WORD = re.compile(r"[가-힣]{2,}")
+
+# 검색 대상 텍스트 필드 (V1.2 앱 TARGET_COLUMNS = 대분류, 소분류, 사실관계, 해설)
+TEXT_FIELDS = ("category", "sub_category", "fact", "rationale")
+FACET_FIELD = "category"  # 대분류
+_HASH_BLOCK = 1 << 20
+
+
+def file_sha1(path) -> str:
+    """파일 내용 sha1 (1MiB 블록 단위로 읽음). sources에 남기는 입력 CSV 해시."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_stopwords(path) -> List[str]:
+    """한 줄에 하나씩 적은 불용어 파일 (# 주석, 빈 줄 무시)."""
+    with open(path, encoding="utf-8") as f:
+        return [w.strip() for w in f if w.strip() and not w.lstrip().startswith("#")]
+
+
+def words(text) -> List[str]:
+    return _WORD.findall(str(text).lower())
+
+
+def _rank(counter: Counter, stopwords) -> List[str]:
+    # sorted는 안정 정렬이므로 빈도가 같으면 처음 나온 순서 유지 (most_common과 동일)
+    return [w for w, _ in sorted(counter.items(), key=lambda kv: -kv[1]) if w not in stopwords]
+
+
+class TermStats:
+    def __init__(self, stopwords: Optional[Iterable[str]] = None):
+        self.stopwords = frozenset(STOP_WORDS if stopwords is None else stopwords)
+        self.n_docs = 0
+        self.sources: List[str] = []  # 센 입력 CSV들의 sha1 (모르면 빈 목록)
+        self.total: Counter = Counter()
+        self.by_facet: Dict[str, Counter] = {}
+        self._ranked: List[str] = []
+        self._ranked_facet: Dict[str, List[str]] = {}
+
+    # ----- 갱신 -----
+    def add(self, texts: Sequence[str], facets: Optional[Sequence] = None) -> "TermStats":
+        """새 문서들의 단어를 더하고 순위를 다시 만든다. facets[i] = i번째 문서의 대분류."""
+        touched = set()
+        for i, t in enumerate(texts):
+            ws = words(t)
+            self.total.update(ws)
+            f = facets[i] if facets is not None else None
+            if isinstance(f, str) and f.strip():
+                self.by_facet.setdefault(f, Counter()).update(ws)
+                touched.add(f)
+        self.n_docs += len(texts)
+        self._rerank(touched)
+        return self
+
+    def add_rows(self, rows: Sequence[dict]) -> "TermStats":
+        """artifacts rows(dict) 추가."""
+        return self.add([row_text(r) for r in rows], [r.get(FACET_FIELD) for r in rows])
+
+    def set_stopwords(self, stopwords: Iterable[str]):
+        self.stopwords = frozenset(stopwords)
+        self._rerank(self.by_facet)
+
+    def _rerank(self, facets: Iterable[str]):
+        self._ranked = _rank(self.total, self.stopwords)
+        for f in facets:
+            self._ranked_facet[f] = _rank(self.by_facet[f], self.stopwords)
+
+    # ----- 조회 -----
+    def top(self, n: int = 25, facet: Optional[str] = None) -> List[str]:
+        """빈도 상위 n개 단어 (facet을 주면 그 대분류 안에서)."""
+        ranked = self._ranked if facet is None else self._ranked_facet.get(facet, [])
+        return ranked[:n]
+
+    def count(self, word: str, facet: Optional[str] = None) -> int:
+        c = self.total if facet is None else self.by_facet.get(facet, Counter())
+        return c.get(word, 0)
+
+    @property
+    def facets(self) -> List[str]:
+        return list(self.by_facet)
+
+    # ----- 생성/저장 -----
+    @classmethod
+    def from_frame(cls, df, stopwords=None, columns=("대분류", "소분류", "사실관계", "해설"),
+                   facet_column="대분류") -> "TermStats":
+        """CSV 컬럼 그대로의 DataFrame (V1.2 앱 build_target_text와 같은 텍스트)."""
+        target = df[columns[0]].astype(str)
+        for col in columns[1:]:
+            target = target + " " + df[col].astype(str)
+        return cls(stopwords).add(target.tolist(), df[facet_column].tolist())
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[dict], stopwords=None) -> "TermStats":
+        return cls(stopwords).add_rows(rows)
+
+    def save(self, path):
+        path = Path(path)
+        obj = {"format": "term-stats", "version": FORMAT_VERSION, "n_docs": self.n_docs,
+               "sources": self.sources, "stopwords": sorted(self.stopwords), "total": dict(self.total),
+               "by_facet": {f: dict(c) for f, c in self.by_facet.items()}}
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, stopwords: Optional[Iterable[str]] = None) -> "TermStats":
+        """저장된 통계. stopwords를 주면 저장 당시 목록 대신 그것으로 순위를 만든다."""
+        with open(path, encoding="utf-8") as f:
+            obj = json.load(f)
+        if obj.get("format") != "term-stats" or obj.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(f"Unsupported term stats file: {path}")
+        st = cls(obj["stopwords"] if stopwords is None else stopwords)
+        st.n_docs = obj["n_docs"]
+        st.sources = list(obj.get("sources", []))
+        st.total = Counter(obj["total"])
+        st.by_facet = {f: Counter(c) for f, c in obj["by_facet"].items()}
+        st._rerank(st.by_facet)
+        return st
+
+
+def row_text(row: dict) -> str:
+    """rows 항목 → 검색 대상 텍스트 (빈 칸은 한글 단어가 없는 'nan'/'None'이 되어 무시됨)."""
+    return " ".join(str(row.get(k)) for k in TEXT_FIELDS)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from bm25 import BM25Index
+
+
+def _index(seed, n_docs=300, n_terms=60):
+    rng = np.random.default_rng(seed)
+    # 흔한 term과 드문 term이 섞이도록 열마다 밀도를 다르게
+    density = rng.uniform(0.005, 0.5, n_terms)
+    counts = (rng.random((n_docs, n_terms)) < density) * rng.integers(1, 5, (n_docs, n_terms))
+    return BM25Index(sp.csr_matrix(counts)), rng
+
+
+def _exhaustive(index, weights, topk, allowed=None):
+    scores = index.score_all(weights)
+    docs = np.flatnonzero(scores > 0)
+    if allowed is not None:
+        docs = docs[allowed[docs]]
+    order = np.lexsort((docs, -scores[docs]))[:topk]
+    return docs[order], scores[docs[order]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("topk", [1, 5, 20])
+@pytest.mark.parametrize("filtered", [False, True])
+def test_maxscore_matches_exhaustive_scoring(seed, topk, filtered):
+    index, rng = _index(seed)
+    allowed = rng.random(index.n_docs) < 0.4 if filtered else None
+    for _ in range(20):
+        terms = rng.choice(index.n_terms, size=rng.integers(1, 8), replace=False)
+        weights = {int(t): float(rng.integers(1, 3)) for t in terms}
+        hits = index.search(weights, topk, allowed)
+        docs, scores = _exhaustive(index, weights, topk, allowed)
+        got = np.array([s for _, s in hits])
+        assert np.allclose(got, scores)
+        full = index.score_all(weights)
+        assert np.allclose(full[[d for d, _ in hits]], got)
+        if allowed is not None:
+            assert all(allowed[d] for d, _ in hits)
+
+
+def test_empty_query_and_zero_k():
+    index, _ = _index(0)
+    assert index.search({}, 5) == []
+    assert index.search({0: 1.0}, 0) == []
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from fuzzy_index import FuzzyIndex, best_end, max_distance, to_jamo
+
+TEXTS = [
+    "선거일 전 180일부터 현수막을 게시한 행위",
+    "예비후보자가 선거구민에게 명함을 배부한 행위",
+    "현수멁 무단 설치",
+    "현 수 막",
+    "",
+    "지역축제에서 유인물을 배포하고 지지를 호소",
+    "괜찮은 닭갈비 식당에서 식사 제공",
+    "SNS election 2024 비방 글 게시 " * 5,  # 자모 63자 초과 행
+]
+
+
+def _substring_distance(pattern, text):
+    """pattern과 text 부분 문자열의 최소 편집거리 (시작/끝 자유 DP, 기준값)."""
+    prev = [0] * (len(text) + 1)
+    for i, c in enumerate(pattern, start=1):
+        cur = [i] + [0] * len(text)
+        for j, t in enumerate(text, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (c != t))
+        prev = cur
+    return min(prev)
+
+
+@pytest.mark.parametrize("keyword", ["현수막", "현수먹", "명함배부", "선거구민", "닭갈비", "괜찬은", "election", "ㅎ", "비방글게시" * 14])
+@pytest.mark.parametrize("k", [0, 1, 2, 3])
+def test_vectorized_verify_matches_scalar_myers(keyword, k):
+    index = FuzzyIndex(TEXTS)
+    p = to_jamo(keyword.lower())
+    rows = np.arange(len(TEXTS))
+    dist, end = index.verify(p, rows, k)
+    for i in rows:
+        jamo = to_jamo(index.texts[i])
+        assert (dist[i], end[i]) == best_end(p, jamo, k)
+        assert min(dist[i], k + 1) == min(_substring_distance(p, jamo), k + 1)
+
+
+@pytest.mark.parametrize("keyword", ["현수막", "현수먹", "명함", "유인물배포", "닭갈비"])
+def test_candidates_keep_every_verified_row(keyword):
+    index = FuzzyIndex(TEXTS)
+    p = to_jamo(keyword)
+    k = max_distance(len(p))
+    dist, _ = index.verify(p, np.arange(len(TEXTS)), k)
+    assert set(np.flatnonzero(dist <= k)) <= set(index.candidates(p, k).tolist())
+
+
+def test_search_ranks_exact_rows_first():
+    hits = FuzzyIndex(TEXTS).search(["현수막"])
+    assert hits.positions.tolist()[:1] == [0]
+    assert 2 in hits.positions.tolist()
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from keyword_index import KeywordIndex
+
+TEXTS = [
+    "선거일 전 180일부터 현수막을 게시한 행위",
+    "예비후보자가 선거구민에게 명함을 배부한 행위",
+    "SNS에 후보자 비방 글을 게시 (Election 2024)",
+    "현수막",
+    "",
+    "문자메시지 a.b 발송, 100% 동의",
+    "현 수막 게시",
+]
+
+
+@pytest.mark.parametrize("keywords", [
+    ["현수막"], ["현수막", "게시"], ["현"], ["election"], ["ELECTION", "sns"], ["a.b"], ["100%"],
+    ["없는말"], ["행위", "배부", "명함"], ["막 게"], [" "], ["후보자|문자"], ["수막", "현수"],
+])
+def test_search_matches_str_contains(keywords):
+    s = pd.Series(TEXTS).str.lower()
+    mask = pd.Series(True, index=s.index)
+    for k in keywords:
+        mask &= s.str.contains(k.lower(), regex=True)
+    assert KeywordIndex(TEXTS).search(keywords).tolist() == mask[mask].index.tolist()
+
+
+def test_no_keywords_returns_nothing():
+    assert KeywordIndex(TEXTS).search([]).tolist() == []
@@ -0,0 +1,71 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_index import build_full, build_segment
+from mmap_index import MmapSearcher, _bits, convert_artifacts, verify
+from search_tfidf import TfidfSearcher
+
+FACTS = [
+    "선거일 전 180일부터 현수막을 게시한 행위",
+    "예비후보자가 선거구민에게 명함을 배부한 행위",
+    "지역축제에서 유인물을 배포하고 지지를 호소한 행위",
+    "선거운동 기간 중 문자메시지를 대량 발송한 행위",
+    "정당 후원회가 기부를 받은 행위 Election 2024",
+    "의정활동 보고서를 선거일 90일 전에 배부한 행위",
+    "현수막 게시 및 명함 배부를 함께 한 행위",
+    "SNS에 후보자 비방 글을 게시한 행위",
+]
+QUERIES = ["현수막 게시", "명함 배부 선거구민", "문자메시지", "ELECTION 2024 기부", "없는단어", "", "현수막 현수막 명함"]
+
+
+def _csv(path, facts, start=0):
+    pd.DataFrame({
+        "대분류": ["공직선거법" if i % 2 else "정치자금법" for i in range(len(facts))],
+        "소분류": [f"소분류{(start + i) % 3}" for i in range(len(facts))],
+        "사실관계": facts,
+        "법조항": ["공직선거법 §93" for _ in facts],
+        "위반여부": ["위반" for _ in facts],
+        "해설": ["해설 " + f for f in facts],
+    }).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(params=["word", "regex"])
+def index_dir(tmp_path, request):
+    build_full([_csv(tmp_path / "a.csv", FACTS[:6])], tmp_path, tokenizer=request.param)
+    build_segment([_csv(tmp_path / "b.csv", FACTS[6:], start=6)], tmp_path)  # 세그먼트 경로도 함께
+    convert_artifacts(tmp_path)
+    return tmp_path
+
+
+def test_query_vectors_and_scores_match_sklearn_bit_for_bit(index_dir):
+    ref, mm = TfidfSearcher(index_dir), MmapSearcher(index_dir / "index_mmap")
+    assert len(ref.rows) == len(mm.rows) == len(FACTS)
+    A = ref.transform(QUERIES).tocsr()
+    A.sort_indices()
+    B = mm.transform(QUERIES)
+    sa, sb = (A @ ref.X.T).toarray(), mm.T.scores(B)
+    for i in range(len(QUERIES)):
+        cols, vals = B.row(i)
+        assert np.array_equal(A.indices[A.indptr[i]:A.indptr[i + 1]], cols)
+        assert np.array_equal(_bits(A.data[A.indptr[i]:A.indptr[i + 1]]), _bits(vals))
+        assert np.array_equal(_bits(sa[i]), _bits(sb[i]))
+
+
+def test_verify_reports_no_mismatches(index_dir):
+    n, bad = verify(index_dir, queries=QUERIES)
+    assert (n, bad) == (len(QUERIES), 0)
+
+
+def test_query_path_does_not_import_sklearn(index_dir):
+    code = ("import sys; from mmap_index import MmapSearcher; "
+            f"s = MmapSearcher({str(index_dir / 'index_mmap')!r}); s.query('현수막 게시', topk=3); "
+            "print(sorted(m for m in ('sklearn', 'pandas', 'scipy') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).resolve().parent.parent,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
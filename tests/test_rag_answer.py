@@ -0,0 +1,132 @@
+import asyncio
+import gc
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import rag_answer
+from rag_answer import DISCLAIMER, RAGAnswerer, RetrievedCase
+
+CASES = [
+    RetrievedCase("C-1", "공직선거법", "§93", "과태료", "선거일 전 현수막 게시", "", 0.9),
+    RetrievedCase("C-2", "공직선거법", "§254", "고발", "사전선거운동 문자 발송", "", 0.7),
+]
+TOKENS = ["현수막은 ", "게시 기간을 ", "확인하세요."]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """OpenAI 호환 /chat/completions 스텁 (stream=true면 SSE로 TOKENS를 하나씩)."""
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append((self.path, body))
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, t in enumerate(TOKENS):
+                chunk = {"id": "s", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": t}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        payload = json.dumps({
+            "id": "s", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(TOKENS)}}],
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url(monkeypatch):
+    pytest.importorskip("openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    _StubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def test_answer_via_stub_server(stub_url):
+    out = RAGAnswerer(backend="openai", model="stub", base_url=stub_url).answer("현수막", CASES)
+    assert out["mode"] == "openai"
+    assert out["answer"] == "".join(TOKENS)
+    assert out["context_ids"] == ["C-1", "C-2"]
+    path, body = _StubHandler.requests[-1]
+    assert path.endswith("/chat/completions")
+    assert body["model"] == "stub" and not body.get("stream")
+    assert "C-1" in body["messages"][1]["content"]
+
+
+def test_answer_stream_via_stub_server(stub_url):
+    r = RAGAnswerer(backend="openai", model="stub", base_url=stub_url)
+    assert list(r.answer_stream("현수막", CASES)) == TOKENS
+    assert _StubHandler.requests[-1][1]["stream"] is True
+
+
+def test_aanswer_via_stub_server(stub_url):
+    r = RAGAnswerer(backend="openai", model="stub", base_url=stub_url)
+    out = asyncio.run(r.aanswer("현수막", CASES))
+    assert out["answer"] == "".join(TOKENS)
+    assert out["disclaimer"] == DISCLAIMER
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **req):
+        self.calls.append(req)
+        msg = type("M", (), {"content": " 스텁 답변 "})()
+        return type("R", (), {"choices": [type("C", (), {"message": msg})()]})()
+
+
+class _FakeClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": _FakeCompletions()})()
+
+
+def test_client_factory_is_pooled():
+    made = []
+
+    def factory(is_async, base_url):
+        made.append((is_async, base_url))
+        return _FakeClient()
+
+    for _ in range(3):
+        out = RAGAnswerer(backend="openai", base_url="http://stub", client_factory=factory).answer("q", CASES)
+        assert out["answer"] == "스텁 답변"
+    assert made == [(False, "http://stub")]
+    client = rag_answer.get_llm_client(False, "http://stub", factory)
+    assert len(client.chat.completions.calls) == 3
+
+
+def test_template_backend_needs_no_client():
+    out = RAGAnswerer(backend="none").answer("q", CASES)
+    assert out["mode"] == "template"
+    assert len(out["citations"]) == 2
+
+
+def test_async_slots_follow_the_loop():
+    async def slots():
+        return rag_answer._async_slot(2), rag_answer._async_slot(2), rag_answer._async_slot(3)
+
+    a, b, c = asyncio.run(slots())
+    assert a is b and a is not c
+    gc.collect()
+    assert len(rag_answer._async_slots) == 0  # 닫힌 루프의 semaphore는 남지 않는다
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import mmap_index
+import shard_index
+from build_index import build_full
+from mmap_index import MmapSearcher, _bits
+from shard_index import ShardedSearcher, merge_topk
+from test_query_runtime import FACTS, QUERIES, _csv
+
+FILTERS = [None, {"article": "§93"}, {"소분류": ["소분류1"]}]
+
+
+@pytest.fixture(scope="module")
+def index_dir(tmp_path_factory):
+    root = tmp_path_factory.mktemp("index")
+    build_full([_csv(root / "a.csv", FACTS * 3)], root)  # 같은 사실관계가 반복돼 동점이 생긴다
+    mmap_index.convert_artifacts(root)
+    return root
+
+
+@pytest.mark.parametrize("n_shards", [1, 3, 100])
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("topk", [1, 4, 50])
+def test_sharded_topk_matches_single_index(index_dir, tmp_path, n_shards, filters, topk):
+    shard_index.convert_artifacts(index_dir, n_shards, tmp_path / "shards")
+    ref, sh = MmapSearcher(index_dir / "index_mmap"), ShardedSearcher(tmp_path / "shards", workers=2)
+    try:
+        scores = ref.T.scores(ref.transform(QUERIES))
+        allowed = ref._allowed(filters)
+        for qi, (a, b) in enumerate(zip(ref.query_batch(QUERIES, topk, filters), sh.query_batch(QUERIES, topk, filters))):
+            full = scores[qi] if allowed is None else np.where(allowed, scores[qi], -np.inf)
+            expect = np.sort(full[np.isfinite(full)])[::-1][:topk]
+            got = np.asarray([scores[qi, r["doc"]] for r in b])
+            # 점수는 비트 단위로 같고, 동점 안에서는 문서 번호 순
+            assert np.array_equal(_bits(got), _bits(expect))
+            assert [r["score"] for r in a] == [r["score"] for r in b]
+            assert all((-s, d) < (-t, e) for (s, d), (t, e) in zip(zip(got, [r["doc"] for r in b]),
+                                                                   zip(got[1:], [r["doc"] for r in b][1:])))
+            if allowed is not None:
+                assert all(allowed[r["doc"]] for r in b)
+            assert [r["id"] for r in b] == [ref.rows.field(r["doc"], "id") for r in b]
+    finally:
+        sh.close()
+
+
+def test_merge_topk_orders_by_score_then_doc():
+    parts = [[(0, 0.9), (4, 0.5)], [(2, 0.9), (3, 0.7)], [], [(1, 0.5)]]
+    assert merge_topk(parts, 4) == [(0, 0.9), (2, 0.9), (3, 0.7), (1, 0.5)]
+    assert merge_topk(parts, 0) == []
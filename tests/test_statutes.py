@@ -0,0 +1,61 @@
+import pytest
+
+from statutes import ArticleIndex, ArticleKey, parse_article_query, parse_citations
+
+CLAUSES = [
+    "공직선거법 §93",       # 0
+    "공직선거법 §930",      # 1
+    "공직선거법 §93의2",    # 2
+    "공직선거법 §58, §254",  # 3
+    "공직선거법 §60의3",    # 4
+    "공직선거법 §61",       # 5
+    "정치자금법 §60",       # 6
+    "공선법 제59조",        # 7
+    "",                     # 8
+]
+
+
+def K(law, article, sub=0):
+    return ArticleKey(law, article, sub)
+
+
+def test_parse_citations_normalizes_aliases_and_carries_law():
+    assert parse_citations("공선법 제60조의3, §254") == [K("공직선거법", 60, 3), K("공직선거법", 254)]
+    assert parse_citations("§93", default_law="정자법") == [K("정치자금법", 93)]
+    assert parse_citations(None) == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("§93", [(K("", 93), K("", 93))]),
+    ("공직선거법 §58–§60", [(K("공직선거법", 58), K("공직선거법", 60, 10 ** 6))]),
+    ("§60~§58", [(K("", 58), K("", 60, 10 ** 6))]),
+    ("제58조부터 제60조의2까지", [(K("", 58), K("", 60, 2))]),
+    ("58조-60조", [(K("", 58), K("", 60, 10 ** 6))]),
+    ("§58-60, §93, 정치자금법 §250~§252",
+     [(K("", 58), K("", 60, 10 ** 6)), (K("", 93), K("", 93)), (K("정치자금법", 250), K("정치자금법", 252, 10 ** 6))]),
+    ("20-30", []),
+    ("2024-2025년 §90", [(K("", 90), K("", 90))]),
+    ("", []),
+])
+def test_parse_article_query(query, expected):
+    assert parse_article_query(query) == expected
+
+
+@pytest.mark.parametrize("query, rows", [
+    ("§93", [0]),                     # §930, §93의2는 걸리지 않음
+    ("§93의2", [2]),
+    ("공직선거법 §58–§60", [3, 4, 7]),  # §60의3 포함, 다른 법률의 §60과 §61은 제외
+    ("§58–§60", [3, 4, 6, 7]),
+    ("§58–§60의2", [3, 6, 7]),
+    ("선거법 §254", [3]),
+    ("§61, §930", [1, 5]),
+    ("20-30", []),
+])
+def test_article_index_lookup_boundaries(query, rows):
+    assert ArticleIndex(CLAUSES).lookup(query).tolist() == rows
+
+
+def test_related_rows_share_an_article():
+    index = ArticleIndex(CLAUSES)
+    assert index.related(0).tolist() == []
+    assert index.related_to("공직선거법 §58").tolist() == [3]
@@ -0,0 +1,240 @@
+# tokenizer.py
+"""한국어 형태소 토크나이저 (konlpy, 정규식 fallback).
+
+- KoreanTokenizer는 TfidfVectorizer의 analyzer로 그대로 쓸 수 있는 callable이다
+  (형태소 1-gram + 인접 2-gram). 질의 쪽 분석 결과는 크기 제한 LRU로 memoize 한다.
+- 코퍼스는 색인 빌드 때 tokenize_corpus()로 프로세스 풀에서 한 번만 분석하고,
+  TokenCache(tokens.jsonl)에 텍스트 해시별로 저장해 다음 빌드/증분 추가에서 재사용한다
+  (빌드마다 한 번 읽고, 새로 분석한 레코드만 끝에 덧붙인다).
+- konlpy나 JVM/mecab이 없으면 sklearn 기본 패턴 `(?u)\\b\\w\\w+\\b` 정규식 분석으로 내려간다.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+TOKEN_CACHE_FILE = "tokens.jsonl"
+
+# 색인에 남길 품사 (조사/어미/구두점 등은 버림)
+KEEP_TAGS = {
+    "okt": {"Noun", "Verb", "Adjective", "Adverb", "Alpha", "Number", "Foreign"},
+    "mecab": {"NNG", "NNP", "NNB", "NR", "VV", "VA", "MAG", "SL", "SN", "SH", "XR"},
+}
+_REGEX = re.compile(r"(?u)\b\w\w+\b")
+
+
+def _load_tagger(backend: str):
+    """konlpy 태거 생성. 실패하면 (None, "regex")."""
+    order = ["mecab", "okt"] if backend == "auto" else [backend]
+    for name in order:
+        try:
+            if name == "mecab":
+                from konlpy.tag import Mecab  # type: ignore
+                tagger = Mecab()
+            elif name == "okt":
+                from konlpy.tag import Okt  # type: ignore
+                tagger = Okt()
+            else:
+                continue
+            tagger.pos("테스트")  # JVM/사전 로딩 확인
+            return tagger, name
+        except Exception:
+            continue
+    return None, "regex"
+
+
+class KoreanTokenizer:
+    def __init__(self, backend: str = "auto", ngram_range: Tuple[int, int] = (1, 2),
+                 stopwords: Optional[Sequence[str]] = None, cache_size: int = 4096,
+                 resolved: Optional[str] = None):
+        """resolved: 색인을 만들 때 실제로 쓰인 분석기 (저장된 설정에서 복원할 때). 주어지면 그 분석기만
+        쓰고, 이 환경에서 쓸 수 없으면 다른 분석기로 내려가지 않고 RuntimeError를 낸다."""
+        self.backend = backend
+        self.ngram_range = tuple(ngram_range)
+        self.stopwords = frozenset(stopwords or ())
+        self.cache_size = cache_size
+        self._tagger = None
+        self._expected = resolved
+        self._resolved = None
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if resolved is not None:
+            self.resolved_backend  # 로드 시점에 바로 확인
+
+    # pickle(artifacts.pkl, 프로세스 풀)에는 설정만 담고 태거/캐시는 다시 만든다
+    def __getstate__(self):
+        return self.config()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def config(self) -> Dict:
+        """저장/재생성용 설정. 실제로 쓰인 분석기(resolved)도 담아 다른 환경에서 조용히 바뀌지 않게 한다."""
+        return {"backend": self.backend, "resolved": self.resolved_backend,
+                "ngram_range": list(self.ngram_range), "stopwords": sorted(self.stopwords),
+                "cache_size": self.cache_size}
+
+    @property
+    def resolved_backend(self) -> str:
+        """실제로 쓰인 분석기 (mecab/okt/regex)."""
+        if self._resolved is None:
+            want = self._expected or self.backend
+            if want == "regex":
+                tagger, got = None, "regex"
+            else:
+                tagger, got = _load_tagger(want)
+            if self._expected is not None and got != self._expected:
+                raise RuntimeError(f"index was built with the {self._expected!r} tokenizer but it is not "
+                                   f"available here (got {got!r}); install it or rebuild the index")
+            self._tagger, self._resolved = tagger, got
+        return self._resolved
+
+    def tokenize(self, text: str) -> List[str]:
+        """형태소(또는 정규식) 토큰 목록."""
+        text = (text or "").lower()
+        backend = self.resolved_backend
+        if backend == "regex":
+            toks = _REGEX.findall(text)
+        else:
+            keep = KEEP_TAGS[backend]
+            pos = self._tagger.pos(text, stem=True) if backend == "okt" else self._tagger.pos(text)
+            toks = [w for w, tag in pos if tag in keep]
+        return [t for t in toks if t not in self.stopwords]
+
+    def terms(self, tokens: Sequence[str]) -> List[str]:
+        """토큰 → n-gram 색인어 (sklearn word analyzer와 같은 순서/공백 연결)."""
+        lo, hi = self.ngram_range
+        out = list(tokens) if lo == 1 else []
+        for n in range(max(lo, 2), hi + 1):
+            out.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return out
+
+    def __call__(self, text: str) -> List[str]:
+        """TfidfVectorizer analyzer. 같은 질의의 형태소 분석은 LRU로 재사용."""
+        with self._lock:
+            hit = self._cache.get(text)
+            if hit is not None:
+                self._cache.move_to_end(text)
+                return hit
+        res = self.terms(self.tokenize(text))
+        with self._lock:
+            self._cache[text] = res
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return res
+
+
+# ----- 빌드 시 병렬 분석 -----
+_worker_tok: Optional[KoreanTokenizer] = None
+
+
+def _init_worker(config):
+    global _worker_tok
+    _worker_tok = KoreanTokenizer(**config)
+
+
+def _tokenize_chunk(texts: List[str]) -> List[List[str]]:
+    return [_worker_tok.tokenize(t) for t in texts]
+
+
+def tokenize_corpus(texts: Sequence[str], tokenizer: KoreanTokenizer,
+                    processes: Optional[int] = None, chunksize: int = 512) -> List[List[str]]:
+    """코퍼스 전체를 프로세스 풀에서 형태소 분석 (입력 순서 유지)."""
+    texts = list(texts)
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(texts) <= chunksize:
+        return [tokenizer.tokenize(t) for t in texts]
+    chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+    out: List[List[str]] = []
+    with ProcessPoolExecutor(processes, initializer=_init_worker,
+                             initargs=(tokenizer.config(),)) as ex:
+        for part in ex.map(_tokenize_chunk, chunks):
+            out.extend(part)
+    return out
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """색인 옆에 저장되는 토큰 스트림 (텍스트 해시 → 토큰). 분석기 설정이 다르면 무효."""
+    def __init__(self, path, tokenizer: KoreanTokenizer):
+        self.path = Path(path)
+        self.signature = json.dumps(tokenizer.config(), sort_keys=True, ensure_ascii=False)
+        self.tokens: Dict[str, List[str]] = {}
+        self._new: List[str] = []  # 아직 파일에 없는 키 (save()가 끝에 덧붙임)
+        self._rewrite = True       # 파일이 없거나 설정이 달라 통째로 새로 써야 함
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("signature") == self.signature:
+                    self._rewrite = False
+                    for line in f:
+                        try:
+                            rec = json.loads(line)
+                        except ValueError:  # 덧붙이다 끊긴 마지막 줄
+                            self._rewrite = True
+                            break
+                        self.tokens[rec["h"]] = rec["t"]
+
+    def tokenize_all(self, texts: Sequence[str], tokenizer: KoreanTokenizer,
+                     processes: Optional[int] = None) -> List[List[str]]:
+        """캐시에 없는 텍스트만 병렬 분석하고, 전체 토큰 목록을 입력 순서대로 돌려준다."""
+        keys = [_text_key(t) for t in texts]
+        todo = {}
+        for k, t in zip(keys, texts):
+            if k not in self.tokens and k not in todo:
+                todo[k] = t
+        if todo:
+            for k, toks in zip(todo, tokenize_corpus(list(todo.values()), tokenizer, processes)):
+                self.tokens[k] = toks
+            self._new.extend(todo)
+        return [self.tokens[k] for k in keys]
+
+    def save(self):
+        """새로 분석한 레코드만 파일 끝에 덧붙인다 (처음이거나 설정이 바뀌었으면 통째로 씀)."""
+        if self._rewrite:
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"signature": self.signature}, ensure_ascii=False) + "\n")
+                for k, toks in self.tokens.items():
+                    f.write(json.dumps({"h": k, "t": toks}, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            self._rewrite = False
+        elif self._new:
+            with open(self.path, "a", encoding="utf-8") as f:
+                for k in self._new:
+                    f.write(json.dumps({"h": k, "t": self.tokens[k]}, ensure_ascii=False) + "\n")
+        self._new = []
+
+
+def _pretokenized(terms):
+    return terms
+
+
+def fit_transform_pretokenized(vec, term_lists: Iterable[List[str]], analyzer: KoreanTokenizer):
+    """미리 분석한 색인어 목록으로 TfidfVectorizer를 학습한 뒤 질의용 analyzer로 교체."""
+    vec.set_params(analyzer=_pretokenized)
+    with warnings.catch_warnings():
+        # n-gram은 analyzer가 직접 만들기 때문에 ngram_range 미사용 경고는 무시
+        warnings.filterwarnings("ignore", message=".*will not be used since 'analyzer' is callable")
+        X = vec.fit_transform(list(term_lists))
+    vec.set_params(analyzer=analyzer)
+    return X
+
+
+def transform_pretokenized(vec, term_lists: Iterable[List[str]]):
+    analyzer = vec.analyzer
+    vec.set_params(analyzer=_pretokenized)
+    try:
+        return vec.transform(list(term_lists))
+    finally:
+        vec.set_params(analyzer=analyzer)
@@ -0,0 +1,170 @@
+# tracing.py
+"""가벼운 구간(span) 계측.
+
+    from tracing import span, trace_request
+    with trace_request("질의"):
+        with span("search.transform"):
+            ...
+
+- RAG_TRACE=1 (또는 enable())일 때만 기록한다. 꺼져 있으면 span()은 공유 no-op 객체를 돌려주므로
+  비용은 함수 호출 한 번 수준이다.
+- 구간별 지연은 프로세스 내 히스토그램에 누적되어 Prometheus 텍스트(export_prometheus)로 내보낸다.
+- trace_request 블록 하나가 요청 하나이며, 끝날 때 구간 목록을 JSON 한 줄로 RAG_TRACE_FILE에 덧붙인다.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+# Prometheus 기본값에 가까운 초 단위 버킷
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.environ.get("RAG_TRACE", "") not in ("", "0")
+_trace_file = os.environ.get("RAG_TRACE_FILE", "")
+_lock = threading.Lock()
+_current = contextvars.ContextVar("rag_trace_request", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # 마지막 칸 = +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += seconds
+        self.count += 1
+
+
+_histograms = {}
+
+
+def enable(flag: bool = True, trace_file: str = None):
+    global _enabled, _trace_file
+    _enabled = flag
+    if trace_file is not None:
+        _trace_file = trace_file
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.observe(seconds)
+    req = _current.get()
+    if req is not None:
+        req["spans"].append({"name": name, "ms": round(seconds * 1000, 3)})
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+def span(name: str):
+    """`with span("이름"):` 블록의 소요 시간을 기록 (비활성 시 no-op)."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name)
+
+
+class _Request:
+    __slots__ = ("label", "rec", "token", "t0")
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self.rec = {"id": uuid.uuid4().hex[:12], "label": self.label,
+                    "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "spans": []}
+        self.token = _current.set(self.rec)
+        self.t0 = time.perf_counter()
+        return self.rec
+
+    def __exit__(self, *exc):
+        dur = time.perf_counter() - self.t0
+        _current.reset(self.token)
+        self.rec["total_ms"] = round(dur * 1000, 3)
+        observe("request", dur)
+        if _trace_file:
+            line = json.dumps(self.rec, ensure_ascii=False)
+            with _lock, open(_trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        return False
+
+
+def trace_request(label: str = ""):
+    """요청 단위 블록. 안쪽 span들이 한 JSON 레코드로 묶인다 (비활성 시 no-op)."""
+    if not _enabled:
+        return _NOOP
+    return _Request(label)
+
+
+def snapshot() -> dict:
+    """구간별 {count, sum_s, buckets} 사본 (JSON 직렬화 가능)."""
+    with _lock:
+        return {
+            name: {"count": h.count, "sum_s": round(h.total, 6),
+                   "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts))}
+            for name, h in _histograms.items()
+        }
+
+
+def export_prometheus(metric: str = "rag_span_seconds") -> str:
+    """Prometheus text exposition format (누적 버킷)."""
+    lines = [f"# HELP {metric} Latency of RAG pipeline stages.", f"# TYPE {metric} histogram"]
+    with _lock:
+        items = sorted((n, list(h.counts), h.total, h.count) for n, h in _histograms.items())
+    for name, counts, total, count in items:
+        acc = 0
+        for le, c in zip([repr(b) for b in BUCKETS] + ["+Inf"], counts):
+            acc += c
+            lines.append(f'{metric}_bucket{{span="{name}",le="{le}"}} {acc}')
+        lines.append(f'{metric}_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f'{metric}_count{{span="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def export_json() -> str:
+    return json.dumps(snapshot(), ensure_ascii=False)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
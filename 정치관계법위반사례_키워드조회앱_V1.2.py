@@ -1,7 +1,22 @@
+import html
+import os
+import threading
 import streamlit as st
 import pandas as pd
-import re
-from collections import Counter
+from keyword_index import KeywordIndex, split_keywords
+from fuzzy_index import FuzzyIndex
+from facets import FacetIndex
+from term_stats import TERM_STATS_FILE, TermStats, file_sha1, load_stopwords
+from snippets import Highlighter
+from hot_reload import VersionedHandle
+from autocomplete import SUB_CATEGORY, TERM, Completer
+
+# 사례 테이블 (바뀌면 백그라운드에서 다시 읽어 교체)
+CSV_FILE = "정치관계법_사례통합_요약테이블.csv"
+# 추천 키워드 불용어 (한 줄에 하나, 없으면 기본 목록)
+STOPWORDS_FILE = "stopwords.txt"
+# 키워드 위치 보기에서 요지를 보여줄 최대 사례 수
+HIGHLIGHT_ROWS = 50
 
 # 페이지 설정
 st.set_page_config(
@@ -176,66 +191,85 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# CSV 파일 불러오기
-@st.cache_data
+# 추천 키워드 통계
+def load_term_stats(df):
+    # 색인 빌드 때 저장된 term_stats.json이 이 CSV(내용 해시)로 만든 것이면 그대로 쓰고, 아니면 한 번 계산
+    stopwords = load_stopwords(STOPWORDS_FILE) if os.path.exists(STOPWORDS_FILE) else None
+    if os.path.exists(TERM_STATS_FILE):
+        stats = TermStats.load(TERM_STATS_FILE, stopwords)
+        if stats.sources == [file_sha1(CSV_FILE)] and stats.n_docs == len(df):
+            return stats
+    return TermStats.from_frame(df, stopwords)
+
+class CaseData:
+    """한 버전의 사례 테이블과 그 위의 색인들 (새 CSV가 배포되면 통째로 새로 만들어 교체)"""
+    def __init__(self, df):
+        self.df = df
+        self._fuzzy = None
+        self._lock = threading.Lock()
+        if df.empty:
+            return
+        # 키워드 역색인 / 대분류·소분류·위반여부·법조항 비트맵 / 추천 키워드 통계는 읽을 때 미리 생성
+        self.keyword_index = KeywordIndex.from_frame(df)
+        self.facet_index = FacetIndex.from_frame(df)
+        self.term_stats = load_term_stats(df)
+        # 키워드 자동 완성 (단어/소분류/법조항, 사례 수 가중치)
+        self.completer = Completer.from_frame(df)
+
+    @property
+    def fuzzy_index(self):
+        # 오타 허용 검색용 자모 n-gram 색인 (처음 켤 때 1회 생성)
+        with self._lock:
+            if self._fuzzy is None:
+                self._fuzzy = FuzzyIndex.from_frame(self.df)
+            return self._fuzzy
+
 def load_data():
     try:
-        df = pd.read_csv("정치관계법_사례통합_요약테이블.csv")
-        return df
+        return CaseData(pd.read_csv(CSV_FILE))
     except FileNotFoundError:
-        st.error("⚠️ CSV 파일을 찾을 수 없습니다. 파일 경로를 확인해주세요.")
-        return pd.DataFrame()
+        return CaseData(pd.DataFrame())
 
-df = load_data()
+# CSV 파일 불러오기 (프로세스 내 모든 세션이 공유, CSV/불용어/키워드 통계 파일이 바뀌면 새 버전으로 교체)
+@st.cache_resource
+def get_data_handle():
+    return VersionedHandle(load_data, lambda: [CSV_FILE, STOPWORDS_FILE, TERM_STATS_FILE], interval=30)
 
-# 키워드 추출 함수
-@st.cache_data
-def extract_keywords(text_series, top_n=25):
-    all_text = " ".join(text_series.dropna().astype(str)).lower()
-    words = re.findall(r"[가-힣]{2,}", all_text)
-    stop_words = {'이', '그', '저', '것', '수', '등', '및', '의', '을', '를', '이다', '있다', '하다'}
-    words = [w for w in words if w not in stop_words]
-    freq = Counter(words)
-    return [word for word, _ in freq.most_common(top_n)]
+lease = get_data_handle().acquire()  # 이번 실행 동안 쓸 데이터 버전 (스크립트 끝의 finally에서 반납)
+data = lease.obj
+df = data.df
+if df.empty:
+    st.error("⚠️ CSV 파일을 찾을 수 없습니다. 파일 경로를 확인해주세요.")
 
 # 다중 키워드 AND 검색 함수
 def search_multiple_keywords(df, keywords_string):
     """쉼표로 구분된 키워드들을 AND 조건으로 검색"""
-    keywords = [k.strip() for k in keywords_string.split(',') if k.strip()]
+    keywords = split_keywords(keywords_string)
     
     if not keywords:
-        return df[df.index < 0]  # 빈 DataFrame 반환
+        return df.iloc[:0], keywords  # 빈 DataFrame 반환
     
-    target_text = (
-        df['대분류'].astype(str) + " " +
-        df['소분류'].astype(str) + " " +
-        df['사실관계'].astype(str) + " " +
-        df['해설'].astype(str)
-    )
-    
-    # 모든 키워드를 포함하는 행만 필터링 (AND 조건)
-    mask = target_text.str.lower().str.contains(keywords[0].lower(), na=False)
-    
-    for keyword in keywords[1:]:
-        mask = mask & target_text.str.lower().str.contains(keyword.lower(), na=False)
-    
-    return df[mask], keywords
-
-# 키워드 준비
-if not df.empty:
-    if 'keywords' not in st.session_state:
-        keywords = extract_keywords(
-            df['대분류'].astype(str) + " " +
-            df['소분류'].astype(str) + " " +
-            df['사실관계'].astype(str) + " " +
-            df['해설'].astype(str)
-        )
-        st.session_state.keywords = keywords
-    else:
-        keywords = st.session_state.keywords
-
-    # 메인 헤더
-    st.markdown("""
+    # 모든 키워드를 포함하는 행만 필터링 (AND 조건, posting list 교집합)
+    return data.keyword_index.search_frame(df, keywords), keywords
+
+# 자동 완성 선택 → 입력창의 마지막 키워드를 바꾼다
+def apply_completion():
+    picked = st.session_state.get("keyword_completion")
+    if picked:
+        head = st.session_state.get("manual_input", "").rpartition(",")[0]
+        st.session_state["manual_input"] = f"{head},{picked}" if head.strip() else picked
+        st.session_state["keyword_completion"] = None
+
+# 오타 허용 AND 검색 함수
+def search_fuzzy(df, keywords):
+    """자모 편집거리로 비슷한 표기까지 AND 검색 (가까운 순). 키워드별로 실제 찾은 표기도 반환"""
+    result, hits = data.fuzzy_index.search_frame(df, keywords)
+    return result, hits.variants
+
+try:
+    if not df.empty:
+        # 메인 헤더
+        st.markdown("""
     <div class="main-header">
         <div class="main-title">⚖️ 정치관계법 위반·허용 사례 간편 조회 시스템</div>
         <div class="main-subtitle">제21대 대통령선거 정치관계법 사례예시집 기반</div>
@@ -244,8 +278,8 @@ if not df.empty:
     
     """, unsafe_allow_html=True)
 
-    # 위반 여부 가이드
-    st.markdown("""
+        # 위반 여부 가이드
+        st.markdown("""
     <div class="violation-guide">
         <div class="guide-title">📋 위반 여부 판단 기준</div>
         <div class="guide-item">
@@ -261,119 +295,182 @@ if not df.empty:
     </div>
     """, unsafe_allow_html=True)
 
-    # 검색 섹션
-    st.markdown("""
+        # 검색 섹션
+        st.markdown("""
     <div class="search-section">
         <div class="search-title">🔍 사례 검색</div>
     </div>
     """, unsafe_allow_html=True)
 
-    col1, col2 = st.columns([1, 1])
-
-    with col1:
-        st.markdown("**📌 추천 키워드에서 선택**")
-        selected = st.selectbox("키워드 선택", [""] + keywords, label_visibility="collapsed")
-
-    with col2:
-        st.markdown("**✏️ 직접 키워드 입력**")
-        manual_input = st.text_input("키워드 입력", label_visibility="collapsed", 
-                                   placeholder="키워드를 입력하세요 (여러 키워드는 쉼표로 구분, 예: 선거운동,홍보물)")
-
-    # 검색 처리
-    if selected:
-        # 단일 키워드 검색 (선택박스)
-        target_text = (
-            df['대분류'].astype(str) + " " +
-            df['소분류'].astype(str) + " " +
-            df['사실관계'].astype(str) + " " +
-            df['해설'].astype(str)
-        )
-        result = df[target_text.str.lower().str.contains(selected.lower(), na=False)]
-        search_keywords = [selected]
-        search_term = selected
+        # 분류 필터 (같은 항목 안은 OR, 항목 간은 AND)
+        facet_index = data.facet_index
+        with st.expander("🗂️ 분류 필터 (대분류 · 소분류 · 위반여부 · 법조항)"):
+            facet_cols = st.columns(len(facet_index.values))
+            facet_selection = {}
+            for fcol, facet in zip(facet_cols, facet_index.values):
+                with fcol:
+                    facet_selection[facet] = st.multiselect(facet, facet_index.values[facet])
+        has_facet = any(facet_selection.values())
+
+        # 키워드 준비 (대분류를 하나만 골랐으면 그 분류 안의 상위 키워드)
+        categories = facet_selection.get("대분류") or []
+        keywords = data.term_stats.top(25, categories[0] if len(categories) == 1 else None)
+
+        col1, col2 = st.columns([1, 1])
+
+        with col1:
+            st.markdown("**📌 추천 키워드에서 선택**")
+            selected = st.selectbox("키워드 선택", [""] + keywords, label_visibility="collapsed")
+
+        with col2:
+            st.markdown("**✏️ 직접 키워드 입력**")
+            manual_input = st.text_input("키워드 입력", label_visibility="collapsed", key="manual_input",
+                                       placeholder="키워드를 입력하세요 (여러 키워드는 쉼표로 구분, 예: 선거운동,홍보물)")
+            # 입력 중인 마지막 키워드의 자동 완성 (법조항은 위 분류 필터에서 고름)
+            last_keyword = manual_input.rpartition(",")[2]
+            completions = data.completer.complete(last_keyword, kinds=(TERM, SUB_CATEGORY)) if last_keyword.strip() else []
+            if completions:
+                st.pills("자동 완성", [c.text for c in completions], key="keyword_completion",
+                         on_change=apply_completion, label_visibility="collapsed")
+
+        fuzzy = st.checkbox("🪄 오타 허용 검색",
+                            help="자모 단위로 비슷한 표기도 찾습니다 (예: 현수멁 → 현수막). 정확히 일치하는 사례가 먼저 나옵니다.")
+
+        # 검색 처리
+        fuzzy_variants = {}
+        if selected:
+            # 단일 키워드 검색 (선택박스)
+            if fuzzy:
+                result, fuzzy_variants = search_fuzzy(df, [selected])
+            else:
+                result = data.keyword_index.search_frame(df, [selected])
+            search_keywords = [selected]
+            search_term = selected
         
-    elif manual_input:
-        # 다중 키워드 AND 검색 (직접 입력)
-        result, search_keywords = search_multiple_keywords(df, manual_input)
-        search_term = manual_input
-    else:
-        result = None
-        search_keywords = []
-        search_term = ""
-
-    if search_term and result is not None:
-        if not result.empty:
-            # 검색 결과 통계
-            if len(search_keywords) > 1:
-                keywords_display = " AND ".join([f"'{k}'" for k in search_keywords])
-                st.markdown(f"""
+        elif manual_input:
+            # 다중 키워드 AND 검색 (직접 입력)
+            if fuzzy:
+                search_keywords = split_keywords(manual_input)
+                result, fuzzy_variants = search_fuzzy(df, search_keywords)
+            else:
+                result, search_keywords = search_multiple_keywords(df, manual_input)
+            search_term = manual_input
+        else:
+            result = None
+            search_keywords = []
+            search_term = ""
+
+        # 키워드 결과와 분류 필터를 비트맵 AND로 결합하고, 결과 안의 분류별 건수를 함께 계산
+        facet_counts = None
+        if result is not None or has_facet:
+            mask = facet_index.mask(facet_selection)
+            if result is not None:
+                mask &= facet_index.positions_mask(df.index.get_indexer(result.index))
+            else:
+                search_term = " · ".join(v for vals in facet_selection.values() for v in vals)
+            if has_facet:
+                result = df.iloc[facet_index.positions(mask)]
+            facet_counts = facet_index.counts(mask)
+
+        if search_term and result is not None:
+            if not result.empty:
+                # 검색 결과 통계
+                if len(search_keywords) > 1:
+                    keywords_display = " AND ".join([f"'{k}'" for k in search_keywords])
+                    st.markdown(f"""
                 <div class="result-stats">
                     🎯 <strong>{keywords_display}</strong> 검색결과: 총 <strong>{len(result)}건</strong>의 사례가 검색되었습니다
                 </div>
                 """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
+                else:
+                    st.markdown(f"""
                 <div class="result-stats">
                     🎯 <strong>'{search_term}'</strong> 검색결과: 총 <strong>{len(result)}건</strong>의 사례가 검색되었습니다
                 </div>
                 """, unsafe_allow_html=True)
 
-            display_df = result[['대분류', '소분류', '사실관계', '법조항', '위반여부', '해설']].reset_index(drop=True)
-
-            def highlight_violation(val):
-                if '위반' in str(val):
-                    return 'background-color: #fef2f2; color: #dc2626; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
-                elif '허용' in str(val) or '가능' in str(val):
-                    return 'background-color: #f0fdf4; color: #059669; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
-                return ''
-
-            styled_df = display_df.style.applymap(highlight_violation, subset=['위반여부'])
-
-            st.dataframe(
-                styled_df, 
-                use_container_width=True,
-                height=400,
-                column_config={
-                    "대분류": st.column_config.TextColumn("대분류", width="medium"),
-                    "소분류": st.column_config.TextColumn("소분류", width="medium"),
-                    "사실관계": st.column_config.TextColumn("사실관계", width="large"),
-                    "법조항": st.column_config.TextColumn("법조항", width="medium"),
-                    "위반여부": st.column_config.TextColumn("위반여부", width="small"),
-                    "해설": st.column_config.TextColumn("해설", width="large")
-                }
-            )
+                # 오타 허용 검색: 입력과 다르게 찾은 표기
+                for kw, found in fuzzy_variants.items():
+                    if any(v != kw for v in found):
+                        st.caption(f"🪄 '{kw}' → " + " · ".join(f"{v} {n}건" for v, n in found.most_common(5)))
 
-        else:
-            if len(search_keywords) > 1:
-                keywords_display = " AND ".join([f"'{k}'" for k in search_keywords])
-                st.markdown(f"""
+                # 결과 안의 분류별 건수
+                for facet, counts in facet_counts.items():
+                    shown = " · ".join(f"{v} {n}건" for v, n in list(counts.items())[:8])
+                    more = f" 외 {len(counts) - 8}개" if len(counts) > 8 else ""
+                    st.caption(f"**{facet}**: {shown}{more}")
+
+                display_df = result[['대분류', '소분류', '사실관계', '법조항', '위반여부', '해설']].reset_index(drop=True)
+
+                def highlight_violation(val):
+                    if '위반' in str(val):
+                        return 'background-color: #fef2f2; color: #dc2626; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
+                    elif '허용' in str(val) or '가능' in str(val):
+                        return 'background-color: #f0fdf4; color: #059669; font-weight: 600; padding: 4px 8px; border-radius: 4px;'
+                    return ''
+
+                styled_df = display_df.style.applymap(highlight_violation, subset=['위반여부'])
+
+                st.dataframe(
+                    styled_df, 
+                    use_container_width=True,
+                    height=400,
+                    column_config={
+                        "대분류": st.column_config.TextColumn("대분류", width="medium"),
+                        "소분류": st.column_config.TextColumn("소분류", width="medium"),
+                        "사실관계": st.column_config.TextColumn("사실관계", width="large"),
+                        "법조항": st.column_config.TextColumn("법조항", width="medium"),
+                        "위반여부": st.column_config.TextColumn("위반여부", width="small"),
+                        "해설": st.column_config.TextColumn("해설", width="large")
+                    }
+                )
+
+                # 표 셀은 부분 강조가 안 되므로, 사실관계/해설에서 키워드가 모인 구간을 따로 강조해 보여준다
+                if search_keywords:
+                    hl = Highlighter(keywords=[*search_keywords, *(v for found in fuzzy_variants.values() for v in found)])
+                    with st.expander(f"🔦 키워드 위치 보기 (상위 {min(len(display_df), HIGHLIGHT_ROWS)}건)"):
+                        for _, row in display_df.head(HIGHLIGHT_ROWS).iterrows():
+                            fact, note = hl.snippet(row['사실관계']), hl.snippet(row['해설'])
+                            st.markdown(
+                                f"**{html.escape(str(row['소분류']))}** · {html.escape(str(row['위반여부']))}<br>"
+                                f"사실관계: {fact.html()}<br>"
+                                + (f"해설: {note.html()}" if note.spans else ""),
+                                unsafe_allow_html=True,
+                            )
+
+            else:
+                if len(search_keywords) > 1:
+                    keywords_display = " AND ".join([f"'{k}'" for k in search_keywords])
+                    st.markdown(f"""
                 <div style="background: #fef2f2; border: 1px solid #fecaca; padding: 1rem; border-radius: 6px; text-align: center; color: #dc2626;">
                     🔍 <strong>{keywords_display}</strong>를 모두 포함하는 검색 결과가 없습니다.<br>
                     다른 키워드 조합으로 다시 검색해보세요.
                 </div>
                 """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
+                else:
+                    st.markdown(f"""
                 <div style="background: #fef2f2; border: 1px solid #fecaca; padding: 1rem; border-radius: 6px; text-align: center; color: #dc2626;">
                     🔍 '<strong>{search_term}</strong>'에 대한 검색 결과가 없습니다.<br>
                     다른 키워드로 다시 검색해보세요.
                 </div>
                 """, unsafe_allow_html=True)
 
-    # 푸터
-    st.markdown("---")
+        # 푸터
+        st.markdown("---")
     
-    st.warning("⚠️ **중요 안내:** 이 검색 결과는 참고용입니다.")
+        st.warning("⚠️ **중요 안내:** 이 검색 결과는 참고용입니다.")
     
-    st.info("""
+        st.info("""
 📌 **정확한 위반 여부 판단은 선거관리위원회의 공식 유권해석을 받으시기 바랍니다.**
 
 이 서비스는 정치관계법 사례 검색을 위한 참고 도구로, 실제 법적 판단의 근거로 사용하실 수 없습니다.
 구체적인 사안에 대해서는 반드시 관련 기관에 문의하시기 바랍니다.
 """)
      
-    st.markdown("""
+        st.markdown("""
     <div class="footer-section">
         <div class="footer-title">🏛️ Data-Insight LAB by Carl <br> Email: datastory2025@gmail.com</div>
     </div>
     """, unsafe_allow_html=True)
+finally:
+    lease.release()